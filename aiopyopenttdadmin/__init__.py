@@ -1,3 +1,29 @@
-from .admin import Admin
 from pyopenttdadmin.enums import *
-from pyopenttdadmin import packet as openttdpacket
\ No newline at end of file
+
+# loaded on first access, so tools that only need part of the package start quickly
+_LAZY = {
+    "Admin": (".admin", "Admin"),
+    "Fleet": (".fleet", "Fleet"),
+    "CommandRouter": ("pyopenttdadmin.commands", "CommandRouter"),
+    "EncodedPacket": ("pyopenttdadmin.protocol", "EncodedPacket"),
+    "OverflowPolicy": ("pyopenttdadmin.packetqueue", "OverflowPolicy"),
+    "openttdpacket": ("pyopenttdadmin.packet", None),
+}
+
+# from ... import * still gets everything, it loads the lazy names
+__all__ = [name for name in globals() if not name.startswith("_")] + list(_LAZY)
+
+def __getattr__(name: str):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+    module, attribute = _LAZY[name]
+    value = importlib.import_module(module, __name__)
+    if attribute is not None:
+        value = getattr(value, attribute)
+    globals()[name] = value
+    return value
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY))
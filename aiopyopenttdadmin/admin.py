@@ -1,40 +1,189 @@
+from pyopenttdadmin.cmdnames import CommandNames
+from pyopenttdadmin.commands import CommandRouter
+from pyopenttdadmin.connection import ConnectionMetrics, ConnectionOptions, ReadSizer
+from pyopenttdadmin.console import ConsoleRouter
 from pyopenttdadmin.enums import *
+from pyopenttdadmin.gamescript import GameScriptCalls
 from pyopenttdadmin.packet import *
+from pyopenttdadmin.packetqueue import OverflowPolicy, PacketQueue
+from pyopenttdadmin.polls import POLL_ALL, PollScheduler
+from pyopenttdadmin.protocol import AdminProtocol, EncodedPacket
+from pyopenttdadmin.reconnect import Backoff
+from pyopenttdadmin.state import GameState
 
-from typing import Callable, Coroutine
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Coroutine, Iterable
 
 import asyncio
+import os
+import re
+import time
+import weakref
+
+if TYPE_CHECKING:
+    from pyopenttdadmin.ipacl import AccessAction, IPAccessList
+    from pyopenttdadmin.sharedstate import SharedStateWriter
+
+class _PollDriver:
+    """Sends the due polls of one PollScheduler, for every running Admin sharing it, from a single task."""
+    def __init__(self, polls: PollScheduler):
+        self.polls = polls
+        self.admins: set["Admin"] = set()
+        self._changed: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def attach(self, admin: "Admin"):
+        self.admins.add(admin)
+        if self._task is None or self._task.done():
+            self._changed = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def detach(self, admin: "Admin"):
+        self.admins.discard(admin)
+        if not self.admins and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def wake(self):
+        """Look at the deadlines again, after tasks were added."""
+        if self._changed is not None:
+            self._changed.set()
+
+    async def _run(self):
+        polls = self.polls
+        while True:
+            self._changed.clear()
+            deadline = polls.next_deadline()
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+                continue
+            except asyncio.TimeoutError:
+                pass
+
+            targets = set()
+            for task in polls.due(time.monotonic()):
+                admin = task.target
+                # polls of admins that are reconnecting or not running are skipped, the next one follows a period later
+                if admin in self.admins and admin._writer is not None and not admin._writer.is_closing():
+                    admin.protocol.send(AdminPollPacket(task.type, task.d1))
+                    targets.add(admin)
+            for admin in targets:
+                admin._write()
+
+_poll_drivers: "weakref.WeakKeyDictionary[PollScheduler, _PollDriver]" = weakref.WeakKeyDictionary()
+
+def _poll_driver(polls: PollScheduler) -> _PollDriver:
+    driver = _poll_drivers.get(polls)
+    if driver is None:
+        driver = _poll_drivers[polls] = _PollDriver(polls)
+    return driver
 
 class Admin:
     """This class is used to interact with an OpenTTD server using the admin port.
+    
+    It is an asyncio stream transport around AdminProtocol, which does the framing, encoding and dispatching.
 
     - ip (str): The IP address of the server.
     - port (int): The port of the server.
+    - max_queue (int): The number of framed packets kept in memory before overflow policies apply. Default is 1024.
+    - overflow_policies (dict[type[Packet], OverflowPolicy] | None): The overflow policy per packet class. Default is DEFAULT_OVERFLOW_POLICIES.
+    - auto_subscribe (bool): Subscribe to the update types needed by the registered handlers at login and whenever handlers change. Default is False.
+    - reconnect (bool | Backoff): Reconnect when the connection is lost, replaying the login and subscriptions and resyncing the state.
+        Pass a Backoff to tune the delays between attempts. Default is False.
+    - cmd_names_cache (str | os.PathLike | None): The directory to cache DoCommand names in, per server version. The names are polled
+        when they are not cached for the server version, admin.command_names resolves CmdLoggingPacket.cmd to a name.
+        Default is None, which polls them on every login.
+    - snapshot (str | os.PathLike | None): The file to keep a snapshot of admin.state in. It is loaded now, so the state can be queried before the server
+        has sent anything, and saved when the admin is closed or run returns. Default is None.
+    - options (ConnectionOptions | None): The socket options and read sizes. Default is None, which uses ConnectionOptions().
+    - polls (PollScheduler | None): The scheduler of the polls added with add_poll. Share one between admins to give them a single rate budget,
+        the admins sharing it must run in the same event loop, one task sends the polls of all of them. Default is None, which makes one for this admin.
     """
-    def __init__(self, ip: str = "127.0.0.1", port: int = 3977):
+    def __init__(self, ip: str = "127.0.0.1", port: int = 3977, max_queue: int = 1024, overflow_policies: dict[type[Packet], OverflowPolicy] | None = None, auto_subscribe: bool = False, reconnect: bool | Backoff = False, cmd_names_cache: str | os.PathLike | None = None, snapshot: str | os.PathLike | None = None, options: ConnectionOptions | None = None, polls: PollScheduler | None = None):
         self.ip = ip
         self.port = port
-        self._buffer = b""
-        self._packets = []
+        self.options = options or ConnectionOptions()
+        self.metrics = ConnectionMetrics()
+        self._sizer = ReadSizer(self.options.min_read, self.options.max_read)
+        self.backoff: Backoff | None = Backoff() if reconnect is True else reconnect or None
+        
+        self.protocol = AdminProtocol(max_queue, overflow_policies, auto_subscribe, cmd_names_cache)
+        self.queue: PacketQueue = self.protocol.queue
+        self.handlers: dict[type[Packet], list[Callable[[Admin, Packet], Coroutine]]] = self.protocol.handlers
+        self.subscriptions: dict[AdminUpdateType, AdminUpdateFrequency] = self.protocol.subscriptions
+        self.state: GameState = self.protocol.state
+        self.command_names: CommandNames = self.protocol.command_names
+        self.snapshot = snapshot
+        if snapshot is not None:
+            # provisional until the resync after login
+            self.state.load(snapshot)
+        self.commands = CommandRouter()
+        self.console = ConsoleRouter()
+        self.shared_state: "SharedStateWriter | None" = None
+        self._ip_acl: Callable[[Packet], None] | None = None
+        self.polls = polls if polls is not None else PollScheduler()
+        self.gamescript_calls = GameScriptCalls()
+        self.protocol.add_listener(self.gamescript_calls.listener)
+        self._ready = asyncio.Event()
+        self._room = asyncio.Event()
+        self._coalesce_task: asyncio.Task | None = None
 
         self._reader: asyncio.StreamReader | None = None
         self._writer: asyncio.StreamWriter | None = None
-
-        self.handlers: dict[PacketType, list[Callable[[Admin, Packet], Coroutine]]] = {}
     
     async def __aenter__(self):
         await self.connect()
         return self
     
     async def __aexit__(self, exc_type, exc_value, traceback):
+        self.save_snapshot()
+        if self.shared_state is not None:
+            self.shared_state.close()
+        
+        if self._coalesce_task is not None:
+            self._coalesce_task.cancel()
+        
         if self._writer is not None:
             if not self._writer.is_closing():
                 self._writer.close()
             
             await self._writer.wait_closed()
     
+    def publish_state(self, name: str | None = None, max_clients: int = 256, max_companies: int = 16) -> "SharedStateWriter":
+        """Publish the client and company tables of admin.state in shared memory, for SharedStateReader in other local processes.
+
+        The records a packet changes are rewritten as it arrives, the segment is removed when the admin is closed.
+
+        - name (str | None): The name of the segment. Default is None, which picks a free name.
+        - max_clients (int): The number of client records. Default is 256.
+        - max_companies (int): The number of company records. Default is 16.
+
+        Returns:
+        - SharedStateWriter: The writer, its name attribute is what readers attach to.
+        """
+        if self.shared_state is None:
+            from pyopenttdadmin.sharedstate import SharedStateWriter
+            self.shared_state = SharedStateWriter(name, max_clients, max_companies)
+            self.shared_state.publish(self.state)
+            self.protocol.add_listener(self.shared_state.listener(self.state))
+        return self.shared_state
+    
+    def save_snapshot(self) -> None:
+        """Save admin.state to the snapshot file, if there is one and the server has welcomed the admin."""
+        if self.snapshot is not None and self.state.welcome is not None:
+            self.state.save(self.snapshot)
+    
+    @property
+    def auto_subscribe(self) -> bool:
+        return self.protocol.auto_subscribe
+    
+    @auto_subscribe.setter
+    def auto_subscribe(self, value: bool):
+        self.protocol.auto_subscribe = value
+    
     async def connect(self):
-        self._reader, self._writer = await asyncio.open_connection(self.ip, self.port)
+        self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(self.ip, self.port), self.options.connect_timeout)
+        self.options.apply(self._writer.get_extra_info('socket'))
     
     async def login(self, name: str, password: str, version: int = 0):
         """Log in to the server.
@@ -46,22 +195,72 @@ class Admin:
         if self._writer is None:
             await self.connect()
         
-        packet = AdminJoinPacket(password, name, str(version))
-        await self._send(packet)
-    
-    async def _send(self, packet: Packet):
+        self.protocol.login(name, password, version)
+        await self._flush()
+
+    def _write(self):
+        """Write everything the protocol wants to send to the stream, without waiting for it to drain."""
         if self._writer is None:
             raise ValueError("Not connected to server.")
         
-        data = packet.to_bytes()
-        packet_type = packet.packet_type.value.to_bytes(1, 'little')
-        length = (len(data) + 3).to_bytes(2, 'little')
+        data = self.protocol.data_to_send()
+        if data:
+            self._writer.write(data)
+            self.metrics.writes += 1
+            self.metrics.bytes_sent += len(data)
 
-        self._writer.write(length + packet_type + data)
+    async def _flush(self):
+        """Write everything the protocol wants to send and wait for the stream to drain."""
+        self._write()
         await self._writer.drain()
     
+    async def _read(self) -> bool:
+        """Read from the stream into the protocol, with a read size that follows the traffic, and send what the protocol answers.
+
+        Returns:
+        - bool: False if the connection was closed.
+        """
+        data = await self._reader.read(self._sizer.size)
+        if not data:
+            return False
+        
+        self._sizer.update(len(data))
+        metrics = self.metrics
+        metrics.read_size = self._sizer.size
+        metrics.reads += 1
+        metrics.bytes_received += len(data)
+        self.protocol.receive_data(data)
+        metrics.packets = self.protocol.frames_received
+        # the protocol may answer received packets, e.g. with polls
+        self._write()
+        return True
+    
+    async def _reconnect(self):
+        """Reconnect with backoff and let the protocol replay the login and subscriptions."""
+        if self._writer is not None:
+            self._writer.close()
+        
+        for delay in self.backoff.delays():
+            await asyncio.sleep(delay)
+            try:
+                await self.connect()
+            except OSError:
+                continue
+            
+            self.protocol.reconnected()
+            await self._flush()
+            return
+        
+        raise ConnectionError("Could not reconnect to the server.")
+    
+    async def _send(self, packet: Packet):
+        self.protocol.send(packet)
+        await self._flush()
+    
     async def recv(self) -> list[Packet]:
         """Receive packets from the server.
+
+        Raises ConnectionError when the connection is closed.
         
         Returns:
         - list[Packet]: A list of packets received from the server.
@@ -69,49 +268,87 @@ class Admin:
         if self._reader is None:
             raise ValueError("Not connected to server.")
         
-        self._buffer += await self._reader.read(1024)
-
-        # buffer can be empty
-        if not self._buffer:
-            return []
-        
-        packets = self._packets
-        self._packets = []
+        # packets left in the buffer by the last read come first, the socket is only read once they are taken
+        packets = self.protocol.packets()
+        if not packets:
+            if not await self._read():
+                raise ConnectionResetError("Connection closed by the server.")
+            packets = self.protocol.packets()
+        return packets
+    
+    async def _read_loop(self):
+        """Read from the server into the queue until the connection is closed, pausing while the queue is blocked."""
+        protocol = self.protocol
+        try:
+            while True:
+                if protocol.queue:
+                    self._ready.set()
+                
+                if not protocol.wants_data:
+                    self._room.clear()
+                    await self._room.wait()
+                    continue
+                
+                if not await self._read():
+                    return
+        finally:
+            self._ready.set()
+    
+    async def stream(self, types: Iterable[type[Packet]] | None = None) -> AsyncIterator[Packet]:
+        """Yield packets from the server as soon as they are framed.
 
-        fetched = 1
-        while True:
-            if len(self._buffer) < 2:
-                return packets
-            
-            packet_len = int.from_bytes(self._buffer[0:2], 'little')
-            if len(self._buffer) < packet_len:
-                if fetched > 5:
-                    # only keep fetching 5 times on incomplete data
-                    return packets
-
-                # more data is available
-                self._buffer += await self._reader.read(1024)
-                fetched += 1
-                continue
-            
-            packets.append(Packet.create_packet(self._buffer[2: packet_len]))
-            self._buffer = self._buffer[packet_len:]
+        A background task keeps reading into the queue while packets are consumed, the overflow policies of the queue
+        decide what is dropped when the consumer falls behind. Reading pauses when the queue is blocked.
+        Packets that do not match types are discarded without being handled.
+        The generator returns after a ShutdownPacket or when the connection is closed, unless reconnecting is enabled.
 
-            # no data available
-            if not self._buffer:
-                return packets
+        - types (Iterable[type[Packet]] | None): The packet classes to yield. Default is None, which yields every packet.
+        """
+        if self._reader is None:
+            raise ValueError("Not connected to server.")
         
+        wanted = None if types is None else frozenset(types)
+        protocol = self.protocol
+        reader = asyncio.create_task(self._read_loop())
+        try:
+            while True:
+                packet = protocol.next_packet()
+                if packet is None:
+                    if reader.done():
+                        try:
+                            # raises the exception of the reader, if any
+                            reader.result()
+                        except ConnectionError:
+                            if self.backoff is None:
+                                raise
+                        
+                        if self.backoff is None:
+                            return
+                        
+                        await self._reconnect()
+                        reader = asyncio.create_task(self._read_loop())
+                        continue
+                    
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                
+                self._room.set()
+                if wanted is None or type(packet) in wanted:
+                    yield packet
+                
+                if isinstance(packet, ShutdownPacket) and self.backoff is None:
+                    return
+        finally:
+            reader.cancel()
+    
     async def _rcon(self, command: str):
-        packet = AdminRconPacket(command)
-        await self._send(packet)
+        self.protocol.rcon(command)
+        await self._flush()
     
     async def _chat(self, message: str, action: Actions = Actions.CHAT, desttype: ChatDestTypes = ChatDestTypes.BROADCAST, id: int = 0):
-        packet = AdminChatPacket(message, action, desttype, id)
-        await self._send(packet)
-    
-    async def _subscribe(self, type: AdminUpdateType, frequency: AdminUpdateFrequency = AdminUpdateFrequency.AUTOMATIC):
-        packet = AdminSubscribePacket(type, frequency)
-        await self._send(packet)
+        self.protocol.chat(message, action, desttype, id)
+        await self._flush()
     
     async def send_rcon(
         self,
@@ -143,7 +380,7 @@ class Admin:
         - message (str): The message to send.
         - id (int): The company ID.
         """
-        await self._chat(message, desttype=ChatDestTypes.TEAM, id=id)
+        await self._chat(message, action=Actions.CHAT_COMPANY, desttype=ChatDestTypes.TEAM, id=id)
     
     async def send_private(
         self,
@@ -155,7 +392,56 @@ class Admin:
         - message (str): The message to send.
         - id (int): The client ID.
         """
-        await self._chat(message, desttype=ChatDestTypes.CLIENT, id=id)
+        await self._chat(message, action=Actions.CHAT_CLIENT, desttype=ChatDestTypes.CLIENT, id=id)
+
+    async def send_gamescript(
+        self,
+        message: Any
+    ) -> None:
+        """Send a message to the GameScript.
+
+        - message (Any): The message, a str is sent as is, anything else is serialised to JSON.
+        """
+        self.protocol.gamescript(message)
+        await self._flush()
+
+    async def send_encoded(
+        self,
+        packet: EncodedPacket
+    ) -> None:
+        """Send a pre-encoded packet, for messages and commands that are sent often or to many servers.
+
+        - packet (EncodedPacket): The packet, for example EncodedPacket(openttdpacket.AdminChatPacket("Rules: be nice")).
+        """
+        self.protocol.send(packet)
+        await self._flush()
+
+    async def gamescript_call(
+        self,
+        message: dict,
+        timeout: float | None = 10.0
+    ) -> Any:
+        """Send a message to the GameScript and wait for its reply.
+
+        The message gets an id in the field named by admin.gamescript_calls.id_field, unless it has one,
+        the GameScript must copy it into its reply. The reply is still passed to the handlers as usual.
+        Raises TimeoutError if there is no reply in time.
+
+        - message (dict): The message.
+        - timeout (float | None): The number of seconds to wait for the reply. Default is 10.0.
+
+        Returns:
+        - Any: The parsed reply.
+        """
+        calls = self.gamescript_calls
+        id = calls.prepare(message)
+        reply = asyncio.get_running_loop().create_future()
+        calls.expect(id, reply.set_result)
+        try:
+            await self.send_gamescript(message)
+            return await asyncio.wait_for(reply, timeout)
+        finally:
+            calls.cancel(id)
 
     async def subscribe(
         self,
@@ -167,24 +453,59 @@ class Admin:
         - type (AdminUpdateType): The type of update to subscribe to.
         - frequency (AdminUpdateFrequency): The frequency of the update. Default is AdminUpdateFrequency.AUTOMATIC.
         """
-        if frequency not in AdminUpdateTypeFrequencyMatrix[type]:
-            raise ValueError(f"Invalid frequency ({frequency}) for {type}")
+        self.protocol.subscribe(type, frequency)
+        await self._flush()
+    
+    async def set_ip_acl(
+        self,
+        acl: "IPAccessList | None",
+        on_action: Callable[[ClientInfoPacket, "AccessAction"], None] | None = None
+    ) -> None:
+        """Kick or ban the clients whose address is in an access list, replacing the access list set before.
+
+        Subscribes to AdminUpdateType.CLIENT_INFO, so the server sends the ClientInfoPacket of every client that joins along with its ClientJoinPacket,
+        the client is kicked or banned as soon as that packet is received. The clients already on the server are polled and checked as well.
+        Call it after logging in, like subscribe.
+
+        - acl (IPAccessList | None): The access list, see pyopenttdadmin.ipacl. None stops checking clients.
+        - on_action (Callable[[ClientInfoPacket, AccessAction], None] | None): Called after a client was kicked or banned. Default is None.
+        """
+        if self._ip_acl is not None:
+            self.protocol.remove_listener(self._ip_acl)
+            self._ip_acl = None
+        if acl is None:
+            return
         
-        await self._subscribe(type, frequency)
+        self._ip_acl = acl.listener(self.protocol, on_action)
+        self.protocol.add_listener(self._ip_acl)
+        self.protocol.subscribe(AdminUpdateType.CLIENT_INFO)
+        self.protocol.send(AdminPollPacket(AdminUpdateType.CLIENT_INFO, POLL_ALL))
+        await self._flush()
+    
+    async def update_subscriptions(self) -> None:
+        """Subscribe to exactly the update types needed by the registered handlers.
+
+        Update types subscribed to with subscribe are left alone. Update types that are no longer needed
+        are set back to AdminUpdateFrequency.POLL if the server allows polling them, the others stay subscribed
+        until the connection is lost and are not subscribed to again after reconnecting.
+        """
+        self.protocol.update_subscriptions()
+        await self._flush()
     
     async def run(self):
         """This method will keep polling the server for packets, it calls on_packet for each packet received.
         
-        If a shutdownpacket is recieved, the method will return.
+        If a shutdownpacket is recieved or the connection is closed, the method will return, unless reconnecting is enabled.
         """
-        while True:
-            packets = await self.recv()
-
-            for packet in packets:
+        # one task sends the polls of every admin sharing the scheduler
+        poller = _poll_driver(self.polls)
+        poller.attach(self)
+        try:
+            async for packet in self.stream():
                 await self.on_packet(packet)
-                
-                if isinstance(packet, ShutdownPacket):
-                    return
+        finally:
+            poller.detach(self)
+            self.save_snapshot()
     
     async def handle_packet(self, packet: Packet):
         """Handle a packet received from the server.
@@ -192,29 +513,153 @@ class Admin:
         - packet (Packet): The packet to handle.
         """
         tasks = set()
-        for handler in self.handlers.get(type(packet), []):
+        for handler in self.protocol.handlers_for(packet, time.monotonic()):
             tasks.add(handler(self, packet))
         
+        if self.protocol.next_deadline() is not None and (self._coalesce_task is None or self._coalesce_task.done()):
+            self._coalesce_task = asyncio.create_task(self._flush_coalesced())
+        
         await asyncio.gather(*tasks)
     
-    def add_handler(self, *packets: type[Packet]):
+    async def _flush_coalesced(self):
+        """Call coalescing handlers with the held back packets once their window has passed, until nothing is held back."""
+        while (deadline := self.protocol.next_deadline()) is not None:
+            await asyncio.sleep(max(deadline - time.monotonic(), 0))
+            
+            tasks = set()
+            for handler, packet in self.protocol.due(time.monotonic()):
+                tasks.add(handler(self, packet))
+            
+            await asyncio.gather(*tasks)
+    
+    def add_handler(self, *packets: type[Packet], coalesce: float | None = None, frequency: AdminUpdateFrequency | None = None, **filters):
         """Decorator to add a handler for a specific packet type.
 
         - packets (Packet): The packet classes to handle.
+        - coalesce (float | None): If set, the handler is called at most once per this many seconds for each packet type and id,
+            with the latest packet received in that window. Default is None, which calls the handler for every packet.
+        - frequency (AdminUpdateFrequency | None): The update frequency the handler needs when auto_subscribe is enabled. Default is None, which uses DEFAULT_UPDATE_FREQUENCIES.
+        - filters: Packet fields the handler is limited to, for example action = Actions.CHAT_COMPANY or id = 3. The fields are listed in Packet.fields.
+            Filters are hash indexed, so handlers waiting for other values are not looked at when a packet is dispatched.
         """
         def decorator(func: Callable[[Admin, Packet], Coroutine]):
             if not asyncio.iscoroutinefunction(func):
                 raise ValueError("Handler must be a coroutine.")
 
-            for packet_type in packets:
-                if packet_type not in self.handlers:
-                    self.handlers[packet_type] = []
-                self.handlers[packet_type].append(func)
+            self.protocol.add_handler(func, packets, coalesce, frequency, filters)
+            if self._writer is not None:
+                # subscription changes, the stream drains on the next send
+                self._write()
+            return func
+        
+        return decorator
+    
+    def remove_handler(self, func: Callable, *packets: type[Packet]) -> None:
+        """Remove a handler.
+
+        - func (Callable): The handler to remove.
+        - packets (type[Packet]): The packet classes to remove the handler for. Default is every packet class it handles.
+        """
+        self.protocol.remove_handler(func, packets)
+        if self._writer is not None:
+            self._write()
+    
+    def add_command(self, name: str, cooldown: float = 0.0):
+        """Decorator to add a chat command, the coroutine is called with the admin, the ChatPacket and the arguments of the command.
+
+        - name (str): The words of the command, without prefix, for example "help" or "rcon kick".
+        - cooldown (float): The minimum number of seconds between two uses of the command by the same client. Default is 0.0.
+        """
+        def decorator(func: Callable[..., Coroutine]):
+            if not asyncio.iscoroutinefunction(func):
+                raise ValueError("Command must be a coroutine.")
             
+            if not self.commands:
+                self.add_handler(ChatPacket)(self._dispatch_command)
+            self.commands.add(name, func, cooldown)
             return func
         
         return decorator
     
+    def remove_command(self, name: str) -> None:
+        """Remove a chat command.
+
+        - name (str): The words of the command, as passed to add_command.
+        """
+        self.commands.remove(name)
+        if not self.commands:
+            self.remove_handler(self._dispatch_command, ChatPacket)
+    
+    async def _dispatch_command(self, admin: "Admin", packet: ChatPacket):
+        found = self.commands.dispatch(packet.message, packet.id, time.monotonic())
+        if found is not None:
+            command, args = found
+            await command.func(self, packet, *args)
+    
+    def add_console_handler(self, pattern: str | re.Pattern, origin: str | None = None):
+        """Decorator to add a handler for console lines matching a regular expression.
+
+        The pattern is matched at the start of ConsolePacket.message, the coroutine is called with the admin, the ConsolePacket and the groups of the match.
+        All patterns are dispatched together, every line is only scanned for the patterns it can match.
+
+        - pattern (str | re.Pattern): The regular expression.
+        - origin (str | None): The console origin to limit the handler to, for example "net". Default is None, which matches every origin.
+        """
+        def decorator(func: Callable[..., Coroutine]):
+            if not asyncio.iscoroutinefunction(func):
+                raise ValueError("Handler must be a coroutine.")
+            
+            if not self.console:
+                self.add_handler(ConsolePacket)(self._dispatch_console)
+            self.console.add(pattern, func, origin)
+            return func
+        
+        return decorator
+    
+    def remove_console_handler(self, func: Callable) -> None:
+        """Remove a console handler from all its patterns.
+
+        - func (Callable): The handler to remove.
+        """
+        for route in [route for route in self.console.routes if route.func == func]:
+            self.console.remove(route)
+        if not self.console:
+            self.remove_handler(self._dispatch_console, ConsolePacket)
+    
+    async def _dispatch_console(self, admin: "Admin", packet: ConsolePacket):
+        tasks = set()
+        for route, match in self.console.match(packet.origin, packet.message):
+            tasks.add(route.func(self, packet, *match.groups()))
+        
+        await asyncio.gather(*tasks)
+    
+    def add_poll(self, type: AdminUpdateType, period: float, d1: int = POLL_ALL) -> None:
+        """Poll an update type periodically while run is running.
+
+        The polls of all tasks are spread evenly over time, within the rate budget of admin.polls, the stalest data first.
+
+        - type (AdminUpdateType): The update type to poll, for example AdminUpdateType.COMPANY_ECONOMY.
+        - period (float): The number of seconds between polls.
+        - d1 (int): The client or company id for CLIENT_INFO and COMPANY_INFO. Default is POLL_ALL.
+        """
+        if self._refresh_polls not in self.protocol.listeners:
+            self.protocol.add_listener(self._refresh_polls)
+        self.polls.add(self, type, period, time.monotonic(), d1)
+        _poll_driver(self.polls).wake()
+    
+    def remove_poll(self, type: AdminUpdateType | None = None, d1: int | None = None) -> None:
+        """Stop polling.
+
+        - type (AdminUpdateType | None): The update type. Default is None, which stops every poll of this admin.
+        - d1 (int | None): The id. Default is None, which stops the polls of every id.
+        """
+        self.polls.remove(self, type, d1)
+        if self._refresh_polls in self.protocol.listeners and not self.polls.has_tasks(self):
+            self.protocol.remove_listener(self._refresh_polls)
+    
+    def _refresh_polls(self, packet: Packet):
+        self.polls.refresh(self, packet, time.monotonic())
+    
     async def on_packet(self, packet: Packet):
         """This method is called for each packet received from the server.
         
@@ -0,0 +1,351 @@
+from pyopenttdadmin.enums import *
+from pyopenttdadmin.packet import *
+from pyopenttdadmin.polls import PollScheduler
+from pyopenttdadmin.reconnect import Backoff
+
+from .admin import Admin
+
+from multiprocessing.connection import Connection, wait
+from typing import AsyncIterator, Callable, Iterable
+
+import asyncio
+import inspect
+import multiprocessing
+import os
+import queue
+import struct
+import threading
+
+# Every IPC message starts with the message kind and the index of the server in the fleet.
+_HEADER = struct.Struct("<BH")
+# Packets and bytes received and events dropped since the last report, and whether the server is connected.
+_METRICS = struct.Struct("<IQI?")
+# the server index of control messages for every server of a worker
+_ALL = 0xFFFF
+# the number of messages a worker holds for the parent, events beyond it are dropped
+_MAX_BACKLOG = 65536
+
+# worker -> parent
+_EVENT = 1 # payload: the frame of a forwarded packet, type byte included
+_METRICS_REPORT = 2
+# parent -> worker
+_RCON = 10
+_CHAT = 11
+_STOP = 12
+
+class ServerMetrics:
+    """Traffic of a server in the fleet, as reported by its worker.
+
+    - packets (int): The number of packets received.
+    - bytes (int): The number of bytes received.
+    - dropped (int): The number of forwarded packets dropped because the parent did not read events fast enough.
+    - connected (bool): Whether the worker is connected to the server.
+    """
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+        self.dropped = 0
+        self.connected = False
+
+    def __repr__(self) -> str:
+        return f"ServerMetrics({self.packets}, {self.bytes}, {self.dropped}, {self.connected})"
+
+class Fleet:
+    """Runs admin connections to many servers, sharded over worker processes.
+
+    Each worker runs the async Admin connections of its shard in its own event loop, so decoding and handling
+    scale with the number of cores. Handlers are registered in the workers by setup. The packet classes in forward
+    are sent to the parent as raw frames and only decoded when read from events.
+    Messages between the parent and the workers are small struct packed frames over one pipe per direction.
+    A worker writes to its pipe from a separate thread, so a parent that falls behind never stalls the event loop of the worker,
+    the worker holds a bounded backlog and counts the events it drops in metrics.
+
+    - servers (Iterable[tuple[str, str, int, str]]): The id, ip, port and admin password of each server.
+    - workers (int | None): The number of worker processes. Default is None, which uses the number of cores.
+    - name (str): The name the admins log in with. Default is "pyOpenTTDAdmin".
+    - subscriptions (dict[AdminUpdateType, AdminUpdateFrequency] | None): The update types to subscribe to on every server. Default is None.
+    - forward (Iterable[type[Packet]]): The packet classes to send to the parent. Default is ().
+    - setup (Callable[[Admin, str], object] | None): Called in the worker with each Admin and its server id before logging in,
+        to register handlers. It may be a coroutine function and must be picklable. Default is None.
+    - report_interval (float): The number of seconds between metrics reports of the workers. Default is 1.0.
+    - polls (dict[AdminUpdateType, float] | None): The update types to poll on every server, with the number of seconds between polls.
+        The polls are spread evenly over time instead of going out to every server at once. Default is None.
+    - poll_rate (float): The number of polls per second of the whole fleet, split evenly over the workers. Default is 10.0.
+    """
+    def __init__(
+        self,
+        servers: Iterable[tuple[str, str, int, str]],
+        workers: int | None = None,
+        name: str = "pyOpenTTDAdmin",
+        subscriptions: dict[AdminUpdateType, AdminUpdateFrequency] | None = None,
+        forward: Iterable[type[Packet]] = (),
+        setup: Callable[[Admin, str], object] | None = None,
+        report_interval: float = 1.0,
+        polls: dict[AdminUpdateType, float] | None = None,
+        poll_rate: float = 10.0
+    ):
+        self.servers = list(servers)
+        self.ids = [server[0] for server in self.servers]
+        self._index = {id: i for i, id in enumerate(self.ids)}
+        if len(self._index) != len(self.ids):
+            raise ValueError("Server ids must be unique.")
+        if len(self.ids) > _ALL:
+            raise ValueError("A fleet holds at most 65535 servers.")
+
+        self.workers = max(1, min(workers or os.cpu_count() or 1, len(self.servers)))
+        self.name = name
+        self.subscriptions = dict(subscriptions or {})
+        self.forward = tuple(forward)
+        self.setup = setup
+        self.report_interval = report_interval
+        self.polls = dict(polls or {})
+        self.poll_rate = poll_rate
+
+        self.metrics: dict[str, ServerMetrics] = {id: ServerMetrics() for id in self.ids}
+        self._processes: list[multiprocessing.Process] = []
+        # per worker, the parent writes to its control pipe and reads from its event pipe
+        self._pipes: list[Connection] = []
+        self._event_pipes: list[Connection] = []
+        self._shard_of: list[int] = [i % self.workers for i in range(len(self.ids))]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self) -> None:
+        """Start the worker processes."""
+        for shard in range(self.workers):
+            control_reader, control_writer = multiprocessing.Pipe(duplex = False)
+            event_reader, event_writer = multiprocessing.Pipe(duplex = False)
+            servers = [(i, *self.servers[i]) for i in range(shard, len(self.servers), self.workers)]
+            process = multiprocessing.Process(
+                target = _worker,
+                args = (control_reader, event_writer, servers, self.name, self.subscriptions, self.forward, self.setup, self.report_interval, self.polls, self.poll_rate / self.workers),
+                daemon = True
+            )
+            process.start()
+            control_reader.close()
+            event_writer.close()
+            self._processes.append(process)
+            self._pipes.append(control_writer)
+            self._event_pipes.append(event_reader)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the worker processes.
+
+        - timeout (float): The number of seconds to wait for each worker before terminating it. Default is 5.0.
+        """
+        for pipe in self._pipes:
+            try:
+                pipe.send_bytes(_HEADER.pack(_STOP, 0))
+            except OSError:
+                pass
+
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+        for pipe in self._pipes + self._event_pipes:
+            pipe.close()
+        self._processes.clear()
+        self._pipes.clear()
+        self._event_pipes.clear()
+
+    def _control(self, kind: int, id: str, text: str):
+        index = self._index[id]
+        self._pipes[self._shard_of[index]].send_bytes(_HEADER.pack(kind, index) + text.encode('utf-8'))
+
+    def _control_all(self, kind: int, text: str):
+        # one message per worker, the worker sends it to each of its servers
+        data = _HEADER.pack(kind, _ALL) + text.encode('utf-8')
+        for pipe in self._pipes:
+            pipe.send_bytes(data)
+
+    def send_rcon(self, id: str, command: str) -> None:
+        """Send an RCON command to a server.
+
+        - id (str): The server id.
+        - command (str): The RCON command to send.
+        """
+        self._control(_RCON, id, command)
+
+    def send_global(self, id: str, message: str) -> None:
+        """Send a global chat message to a server.
+
+        - id (str): The server id.
+        - message (str): The message to send.
+        """
+        self._control(_CHAT, id, message)
+
+    def broadcast_rcon(self, command: str) -> None:
+        """Send an RCON command to every server.
+
+        - command (str): The RCON command to send.
+        """
+        self._control_all(_RCON, command)
+
+    def broadcast_global(self, message: str) -> None:
+        """Send a global chat message to every server.
+
+        - message (str): The message to send.
+        """
+        self._control_all(_CHAT, message)
+
+    def _receive(self, pipe: Connection) -> tuple[str, Packet] | None:
+        """Read a message from a worker, metrics are applied and None is returned for them."""
+        data = pipe.recv_bytes()
+        kind, index = _HEADER.unpack_from(data)
+        id = self.ids[index]
+        if kind == _EVENT:
+            return id, Packet.create_packet(data[_HEADER.size:])
+
+        packets, size, dropped, connected = _METRICS.unpack_from(data, _HEADER.size)
+        metrics = self.metrics[id]
+        metrics.packets += packets
+        metrics.bytes += size
+        metrics.dropped += dropped
+        metrics.connected = connected
+        return None
+
+    async def events(self) -> AsyncIterator[tuple[str, Packet]]:
+        """Yield the forwarded packets of every server, with the id of the server, until all workers have stopped.
+
+        Metrics reports are applied to metrics while waiting.
+        """
+        pipes = list(self._event_pipes)
+        while pipes:
+            try:
+                ready = await asyncio.to_thread(wait, pipes, 0.5)
+            except OSError:
+                # stop closed the pipes
+                return
+            for pipe in ready:
+                try:
+                    event = self._receive(pipe)
+                except (EOFError, OSError):
+                    pipes.remove(pipe)
+                    continue
+
+                if event is not None:
+                    yield event
+
+def _worker(control: Connection, events: Connection, servers: list[tuple[int, str, str, int, str]], name: str, subscriptions: dict, forward: tuple, setup, report_interval: float, polls: dict, poll_rate: float):
+    outbox: queue.Queue[bytes] = queue.Queue(_MAX_BACKLOG)
+    # the writer thread is the only user of the event pipe, a slow parent blocks it instead of the event loop.
+    # It is not waited for, the worker only ends once the parent stops reading for good.
+    threading.Thread(target = _write_events, args = (events, outbox), daemon = True).start()
+    try:
+        asyncio.run(_run_worker(control, outbox, servers, name, subscriptions, forward, setup, report_interval, polls, poll_rate))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        control.close()
+
+def _write_events(events: Connection, outbox: "queue.Queue[bytes]"):
+    try:
+        while True:
+            events.send_bytes(outbox.get())
+    except OSError:
+        # the parent is gone
+        pass
+    finally:
+        events.close()
+
+async def _run_worker(control: Connection, outbox: "queue.Queue[bytes]", servers: list[tuple[int, str, str, int, str]], name: str, subscriptions: dict, forward: tuple, setup, report_interval: float, polls: dict, poll_rate: float):
+    forward_types = frozenset(packet.packet_type.value for packet in forward)
+    # one budget for the polls of every server of the worker
+    scheduler = PollScheduler(poll_rate)
+    admins: dict[int, Admin] = {}
+    # packets, bytes and dropped events per server since the last report
+    counters: dict[int, list[int]] = {}
+
+    def frame_listener(index: int):
+        counter = counters[index]
+        header = _HEADER.pack(_EVENT, index)
+        def listener(frame: bytes):
+            counter[0] += 1
+            counter[1] += len(frame) + 2
+            if frame[0] in forward_types:
+                try:
+                    outbox.put_nowait(header + frame)
+                except queue.Full:
+                    counter[2] += 1
+        return listener
+
+    async def serve(index: int, id: str, ip: str, port: int, password: str):
+        admin = admins[index] = Admin(ip, port, reconnect = True, polls = scheduler)
+        counters[index] = [0, 0, 0]
+        admin.protocol.frame_listeners.append(frame_listener(index))
+        if setup is not None:
+            result = setup(admin, id)
+            if inspect.isawaitable(result):
+                await result
+
+        # the first connection is retried like the reconnects of the admin
+        for delay in Backoff().delays():
+            try:
+                await admin.login(name, password)
+                break
+            except OSError:
+                await asyncio.sleep(delay)
+
+        for type, frequency in subscriptions.items():
+            await admin.subscribe(type, frequency)
+        for type, period in polls.items():
+            admin.add_poll(type, period)
+
+        await admin.run()
+
+    async def report():
+        while True:
+            await asyncio.sleep(report_interval)
+            for index, counter in counters.items():
+                writer = admins[index]._writer
+                connected = writer is not None and not writer.is_closing()
+                try:
+                    outbox.put_nowait(_HEADER.pack(_METRICS_REPORT, index) + _METRICS.pack(counter[0], counter[1], counter[2], connected))
+                except queue.Full:
+                    # the counts go out with the next report
+                    continue
+                counter[0] = counter[1] = counter[2] = 0
+
+    async def send(admin: Admin, kind: int, text: str):
+        if admin._writer is None:
+            return
+        try:
+            if kind == _RCON:
+                await admin.send_rcon(text)
+            elif kind == _CHAT:
+                await admin.send_global(text)
+        except (ConnectionError, OSError):
+            # the admin is reconnecting, commands sent meanwhile are dropped
+            pass
+
+    tasks = [asyncio.create_task(serve(*server)) for server in servers]
+    tasks.append(asyncio.create_task(report()))
+    try:
+        while True:
+            try:
+                # the control pipe is only read here, one call at a time
+                data = await asyncio.to_thread(control.recv_bytes)
+            except (EOFError, OSError):
+                return
+
+            kind, index = _HEADER.unpack_from(data)
+            if kind == _STOP:
+                return
+
+            text = data[_HEADER.size:].decode('utf-8')
+            if index == _ALL:
+                # the rcon and chat frames are encoded once for all servers
+                await asyncio.gather(*(send(admin, kind, text) for admin in admins.values()))
+            elif index in admins:
+                await send(admins[index], kind, text)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions = True)
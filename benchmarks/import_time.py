@@ -0,0 +1,64 @@
+"""Check that importing the package stays within a time budget.
+
+Every statement is timed in a fresh interpreter, the median of several runs is compared with its budget.
+Exits with status 1 if a budget is exceeded, and lists the slowest modules of that import.
+
+    python benchmarks/import_time.py [--runs 7] [--scale 1.0]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# statement -> budget in milliseconds
+BUDGETS = {
+    "import pyopenttdadmin": 20.0,
+    "from pyopenttdadmin import Admin": 50.0,
+    "from aiopyopenttdadmin import Admin": 120.0,
+}
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run(code: str, *args: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH = ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    return subprocess.run([sys.executable, *args, "-c", code], capture_output = True, text = True, env = env, check = True)
+
+def measure(statement: str) -> float:
+    """The time the statement takes in a fresh interpreter, in milliseconds."""
+    code = f"import time\nstart = time.perf_counter()\n{statement}\nprint((time.perf_counter() - start) * 1000)"
+    return float(run(code).stdout)
+
+def slowest(statement: str, count: int = 10) -> list[str]:
+    """The modules with the highest cumulative import time, from python -X importtime."""
+    lines = [line for line in run(statement, "-X", "importtime").stderr.splitlines() if line.startswith("import time:") and "|" in line]
+    rows = []
+    for line in lines[1:]:
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    rows.sort(reverse = True)
+    return [f"{cumulative / 1000:8.1f} ms  {name}" for cumulative, name in rows[:count]]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument("--runs", type = int, default = 7, help = "the number of runs per statement, the median is used")
+    parser.add_argument("--scale", type = float, default = 1.0, help = "multiply the budgets, for slow machines")
+    args = parser.parse_args()
+
+    # the first run compiles the bytecode, it is not timed
+    for statement in BUDGETS:
+        run(statement)
+
+    failed = False
+    for statement, budget in BUDGETS.items():
+        budget *= args.scale
+        median = statistics.median(measure(statement) for _ in range(args.runs))
+        ok = median <= budget
+        print(f"{'ok  ' if ok else 'FAIL'} {median:7.1f} ms / {budget:7.1f} ms  {statement}")
+        if not ok:
+            failed = True
+            print("\n".join("       " + line for line in slowest(statement)))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
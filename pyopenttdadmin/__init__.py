@@ -1,3 +1,31 @@
-from .admin import Admin
 from .enums import *
-from . import packet as openttdpacket
\ No newline at end of file
+
+# Loaded on first access, so tools that only need part of the package start quickly. For the same reason, modules
+# import slow or optional dependencies (multiprocessing, orjson, sortedcontainers, numpy, JSON and command
+# schema decoding in packet) inside the functions that need them. benchmarks/import_time.py keeps this within budget.
+_LAZY = {
+    "Admin": (".admin", "Admin"),
+    "AdminProtocol": (".protocol", "AdminProtocol"),
+    "CommandRouter": (".commands", "CommandRouter"),
+    "EncodedPacket": (".protocol", "EncodedPacket"),
+    "OverflowPolicy": (".packetqueue", "OverflowPolicy"),
+    "openttdpacket": (".packet", None),
+}
+
+# from ... import * still gets everything, it loads the lazy names
+__all__ = [name for name in globals() if not name.startswith("_")] + list(_LAZY)
+
+def __getattr__(name: str):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+    module, attribute = _LAZY[name]
+    value = importlib.import_module(module, __name__)
+    if attribute is not None:
+        value = getattr(value, attribute)
+    globals()[name] = value
+    return value
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_LAZY))
@@ -1,32 +1,113 @@
+import os
+import re
 import socket
 import time
 
-from typing import Callable
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator
 
+from .cmdnames import CommandNames
+from .commands import CommandRouter
+from .connection import ConnectionMetrics, ConnectionOptions, ReadSizer
+from .console import ConsoleRouter
 from .enums import *
 from .packet import *
+from .packetqueue import OverflowPolicy, PacketQueue
+from .polls import POLL_ALL, PollScheduler
+from .protocol import AdminProtocol, EncodedPacket
+from .reconnect import Backoff
+from .state import GameState
+
+if TYPE_CHECKING:
+    from .ipacl import AccessAction, IPAccessList
+    from .sharedstate import SharedStateWriter
 
 class Admin:
     """This class is used to interact with an OpenTTD server using the admin port.
 
+    It is a blocking socket transport around AdminProtocol, which does the framing, encoding and dispatching.
+    
     - ip (str): The IP address of the server.
     - port (int): The port of the server.
-    - name (str): The name of the admin.
-    - password (str): The password of the admin.
+    - max_queue (int): The number of framed packets kept in memory before overflow policies apply. Default is 1024.
+    - overflow_policies (dict[type[Packet], OverflowPolicy] | None): The overflow policy per packet class. Default is DEFAULT_OVERFLOW_POLICIES.
+    - auto_subscribe (bool): Subscribe to the update types needed by the registered handlers at login and whenever handlers change. Default is False.
+    - reconnect (bool | Backoff): Reconnect when the connection is lost, replaying the login and subscriptions and resyncing the state.
+        Pass a Backoff to tune the delays between attempts. Default is False.
+    - cmd_names_cache (str | os.PathLike | None): The directory to cache DoCommand names in, per server version. The names are polled
+        when they are not cached for the server version, admin.command_names resolves CmdLoggingPacket.cmd to a name.
+        Default is None, which polls them on every login.
+    - snapshot (str | os.PathLike | None): The file to keep a snapshot of admin.state in. It is loaded now, so the state can be queried before the server
+        has sent anything, and saved when the admin is closed or run returns. Default is None.
+    - options (ConnectionOptions | None): The socket options and read sizes. Default is None, which uses ConnectionOptions().
+    - polls (PollScheduler | None): The scheduler of the polls added with add_poll. Share one between admins to give them a single rate budget,
+        each admin sends its own polls from its run loop, so the admins may run in different threads. Default is None, which makes one for this admin.
     """
-    def __init__(self, ip: str = "127.0.0.1", port: int = 3977):
-        self.socket = socket.socket()
-        self.socket.connect((ip, port))
-        self.socket.settimeout(0.5) # used to periodically check for keyboard interrupts
-        self._buffer = b""
-        self.handlers: dict[PacketType, list[Callable]] = {}
+    def __init__(self, ip: str = "127.0.0.1", port: int = 3977, max_queue: int = 1024, overflow_policies: dict[type[Packet], OverflowPolicy] | None = None, auto_subscribe: bool = False, reconnect: bool | Backoff = False, cmd_names_cache: str | os.PathLike | None = None, snapshot: str | os.PathLike | None = None, options: ConnectionOptions | None = None, polls: PollScheduler | None = None):
+        self.ip = ip
+        self.port = port
+        self.options = options or ConnectionOptions()
+        self.metrics = ConnectionMetrics()
+        self._sizer = ReadSizer(self.options.min_read, self.options.max_read)
+        self.socket = self._connect()
+        self.backoff: Backoff | None = Backoff() if reconnect is True else reconnect or None
+
+        self.protocol = AdminProtocol(max_queue, overflow_policies, auto_subscribe, cmd_names_cache)
+        self.queue: PacketQueue = self.protocol.queue
+        self.handlers: dict[type[Packet], list[Callable]] = self.protocol.handlers
+        self.subscriptions: dict[AdminUpdateType, AdminUpdateFrequency] = self.protocol.subscriptions
+        self.state: GameState = self.protocol.state
+        self.command_names: CommandNames = self.protocol.command_names
+        self.snapshot = snapshot
+        if snapshot is not None:
+            # provisional until the resync after login
+            self.state.load(snapshot)
+        self.commands = CommandRouter()
+        self.console = ConsoleRouter()
+        self.shared_state: "SharedStateWriter | None" = None
+        self._ip_acl: Callable[[Packet], None] | None = None
+        self.polls = polls if polls is not None else PollScheduler()
 
     def __enter__(self):
         return self
     
     def __exit__(self, exc_type, exc_value, traceback):
+        self.save_snapshot()
+        if self.shared_state is not None:
+            self.shared_state.close()
         self.socket.close()
     
+    def publish_state(self, name: str | None = None, max_clients: int = 256, max_companies: int = 16) -> "SharedStateWriter":
+        """Publish the client and company tables of admin.state in shared memory, for SharedStateReader in other local processes.
+
+        The records a packet changes are rewritten as it arrives, the segment is removed when the admin is closed.
+
+        - name (str | None): The name of the segment. Default is None, which picks a free name.
+        - max_clients (int): The number of client records. Default is 256.
+        - max_companies (int): The number of company records. Default is 16.
+
+        Returns:
+        - SharedStateWriter: The writer, its name attribute is what readers attach to.
+        """
+        if self.shared_state is None:
+            from .sharedstate import SharedStateWriter
+            self.shared_state = SharedStateWriter(name, max_clients, max_companies)
+            self.shared_state.publish(self.state)
+            self.protocol.add_listener(self.shared_state.listener(self.state))
+        return self.shared_state
+    
+    def save_snapshot(self) -> None:
+        """Save admin.state to the snapshot file, if there is one and the server has welcomed the admin."""
+        if self.snapshot is not None and self.state.welcome is not None:
+            self.state.save(self.snapshot)
+    
+    @property
+    def auto_subscribe(self) -> bool:
+        return self.protocol.auto_subscribe
+    
+    @auto_subscribe.setter
+    def auto_subscribe(self, value: bool):
+        self.protocol.auto_subscribe = value
+    
     def login(self, name: str, password: str, version: int = 0):
         """Log in to the server.
 
@@ -34,15 +115,26 @@ class Admin:
         - password (str): The password of the admin.
         - version (int): The version of the admin. Default is 0.
         """
-        packet = AdminJoinPacket(password, name, str(version))
-        self._send(packet)
+        self.protocol.login(name, password, version)
+        self._flush()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.create_connection((self.ip, self.port), timeout = self.options.connect_timeout)
+        self.options.apply(sock)
+        sock.settimeout(0.5) # used to periodically check for keyboard interrupts
+        return sock
+
+    def _flush(self):
+        """Write everything the protocol wants to send to the socket."""
+        data = self.protocol.data_to_send()
+        if data:
+            self.socket.sendall(data)
+            self.metrics.writes += 1
+            self.metrics.bytes_sent += len(data)
     
     def _send(self, packet: Packet):
-        data = packet.to_bytes()
-        packet_type = packet.packet_type.value.to_bytes(1, 'little')
-        length = (len(data) + 3).to_bytes(2, 'little')
-
-        self.socket.send(length + packet_type + data)
+        self.protocol.send(packet)
+        self._flush()
     
     def _recv(self, size: int):
         """Help function to periodically check for keyboard interrupts.
@@ -50,42 +142,94 @@ class Admin:
         Returns socket.recv(size)
         """
         try:
-            return self.socket.recv(size)
+            data = self.socket.recv(size)
         except socket.timeout:
             return b""
+        
+        if not data:
+            raise ConnectionResetError("Connection closed by the server.")
+        return data
+    
+    def _read(self):
+        """Read from the socket into the protocol, with a read size that follows the traffic, and send what the protocol answers."""
+        data = self._recv(self._sizer.size)
+        self._sizer.update(len(data))
+        metrics = self.metrics
+        metrics.read_size = self._sizer.size
+        if data:
+            metrics.reads += 1
+            metrics.bytes_received += len(data)
+            self.protocol.receive_data(data)
+            metrics.packets = self.protocol.frames_received
+        # the protocol may answer received packets, e.g. with polls
+        self._flush()
+    
+    def _reconnect(self):
+        """Reconnect with backoff and let the protocol replay the login and subscriptions."""
+        self.socket.close()
+        for delay in self.backoff.delays():
+            time.sleep(delay)
+            try:
+                self.socket = self._connect()
+            except OSError:
+                continue
+            
+            self.protocol.reconnected()
+            self._flush()
+            return
+        
+        raise ConnectionError("Could not reconnect to the server.")
     
     def recv(self) -> list[Packet]:
         """Receive packets from the server.
+
+        Raises ConnectionError when the connection is closed.
         
         Returns:
         - list[Packet]: A list of packets received from the server.
         """
-        self._buffer += self._recv(1024)
-        packets = []
-        if len(self._buffer) < 2:
-            return packets
+        # packets left in the buffer by the last read come first, the socket is only read once they are taken
+        packets = self.protocol.packets()
+        if not packets:
+            self._read()
+            packets = self.protocol.packets()
+        return packets
+    
+    def stream(self, types: Iterable[type[Packet]] | None = None) -> Iterator[Packet]:
+        """Yield packets from the server as soon as they are framed.
+
+        The socket is only read once all queued packets are consumed, so a slow consumer pauses reading instead of building a backlog.
+        Packets that do not match types are discarded without being handled.
+        The generator returns after a ShutdownPacket or when the connection is closed, unless reconnecting is enabled.
 
+        - types (Iterable[type[Packet]] | None): The packet classes to yield. Default is None, which yields every packet.
+        """
+        wanted = None if types is None else frozenset(types)
+        protocol = self.protocol
         while True:
-            packet_len = int.from_bytes(self._buffer[0:2], 'little')
-            if len(self._buffer) < packet_len:
-                return packets
+            packet = protocol.next_packet()
+            if packet is None:
+                try:
+                    self._read()
+                except ConnectionError:
+                    if self.backoff is None:
+                        return
+                    self._reconnect()
+                continue
             
-            packets.append(Packet.create_packet(self._buffer[2: packet_len]))
-            self._buffer = self._buffer[packet_len:]
-            if not self._buffer:
-                return packets
+            if wanted is None or type(packet) in wanted:
+                yield packet
+            
+            if isinstance(packet, ShutdownPacket) and self.backoff is None:
+                return
         
     def _rcon(self, command: str):
-        packet = AdminRconPacket(command)
-        self._send(packet)
+        self.protocol.rcon(command)
+        self._flush()
     
     def _chat(self, message: str, action: Actions = Actions.CHAT, desttype: ChatDestTypes = ChatDestTypes.BROADCAST, id: int = 0):
-        packet = AdminChatPacket(message, action, desttype, id)
-        self._send(packet)
-    
-    def _subscribe(self, type: AdminUpdateType, frequency: AdminUpdateFrequency = AdminUpdateFrequency.AUTOMATIC):
-        packet = AdminSubscribePacket(type, frequency)
-        self._send(packet)
+        self.protocol.chat(message, action, desttype, id)
+        self._flush()
     
     def send_rcon(
         self,
@@ -131,6 +275,28 @@ class Admin:
         """
         self._chat(message, action = Actions.CHAT_CLIENT, desttype = ChatDestTypes.CLIENT, id = id)
 
+    def send_gamescript(
+        self,
+        message: Any
+    ) -> None:
+        """Send a message to the GameScript.
+
+        - message (Any): The message, a str is sent as is, anything else is serialised to JSON.
+        """
+        self.protocol.gamescript(message)
+        self._flush()
+
+    def send_encoded(
+        self,
+        packet: EncodedPacket
+    ) -> None:
+        """Send a pre-encoded packet, for messages and commands that are sent often or to many servers.
+
+        - packet (EncodedPacket): The packet, for example EncodedPacket(openttdpacket.AdminChatPacket("Rules: be nice")).
+        """
+        self.protocol.send(packet)
+        self._flush()
+
     def subscribe(
         self,
         type: AdminUpdateType,
@@ -141,45 +307,208 @@ class Admin:
         - type (AdminUpdateType): The type of update to subscribe to.
         - frequency (AdminUpdateFrequency): The frequency of the update. Default is AdminUpdateFrequency.AUTOMATIC.
         """
-        if frequency not in AdminUpdateTypeFrequencyMatrix[type]:
-            raise ValueError(f"Invalid frequency ({frequency}) for {type}")
-        self._subscribe(type, frequency)
+        self.protocol.subscribe(type, frequency)
+        self._flush()
+    
+    def set_ip_acl(
+        self,
+        acl: "IPAccessList | None",
+        on_action: Callable[[ClientInfoPacket, "AccessAction"], None] | None = None
+    ) -> None:
+        """Kick or ban the clients whose address is in an access list, replacing the access list set before.
+
+        Subscribes to AdminUpdateType.CLIENT_INFO, so the server sends the ClientInfoPacket of every client that joins along with its ClientJoinPacket,
+        the client is kicked or banned as soon as that packet is received. The clients already on the server are polled and checked as well.
+        Call it after logging in, like subscribe.
+
+        - acl (IPAccessList | None): The access list, see pyopenttdadmin.ipacl. None stops checking clients.
+        - on_action (Callable[[ClientInfoPacket, AccessAction], None] | None): Called after a client was kicked or banned. Default is None.
+        """
+        if self._ip_acl is not None:
+            self.protocol.remove_listener(self._ip_acl)
+            self._ip_acl = None
+        if acl is None:
+            return
+        
+        self._ip_acl = acl.listener(self.protocol, on_action)
+        self.protocol.add_listener(self._ip_acl)
+        self.protocol.subscribe(AdminUpdateType.CLIENT_INFO)
+        self.protocol.send(AdminPollPacket(AdminUpdateType.CLIENT_INFO, POLL_ALL))
+        self._flush()
+    
+    def update_subscriptions(self) -> None:
+        """Subscribe to exactly the update types needed by the registered handlers.
+
+        Update types subscribed to with subscribe are left alone. Update types that are no longer needed
+        are set back to AdminUpdateFrequency.POLL if the server allows polling them, the others stay subscribed
+        until the connection is lost and are not subscribed to again after reconnecting.
+        """
+        self.protocol.update_subscriptions()
+        self._flush()
     
     def run(self):
         """This method will keep polling the server for packets, it calls on_packet for each packet received.
         
-        If a shutdownpacket is recieved, the method will return.
+        If a shutdownpacket is recieved or the connection is closed, the method will return, unless reconnecting is enabled.
         """
-        while True:
-            packets = self.recv()
-            for packet in packets:
-                self.on_packet(packet)
+        try:
+            while True:
+                # wake up in time for held back packets of coalescing handlers and scheduled polls
+                deadlines = [deadline for deadline in (self.protocol.next_deadline(), self.polls.next_deadline(self)) if deadline is not None]
+                deadline = min(deadlines) if deadlines else None
+                timeout = 0.5 if deadline is None else min(0.5, max(deadline - time.monotonic(), 0.001))
+                self.socket.settimeout(timeout)
+
+                try:
+                    packets = self.recv()
+                except ConnectionError:
+                    if self.backoff is None:
+                        return
+                    self._reconnect()
+                    continue
+                
+                for packet in packets:
+                    self.on_packet(packet)
+                    
+                    if isinstance(packet, ShutdownPacket) and self.backoff is None:
+                        return
                 
-                if isinstance(packet, ShutdownPacket):
-                    return
+                self._flush_coalesced()
+                self._send_polls()
+        finally:
+            self.save_snapshot()
     
     def handle_packet(self, packet: Packet):
         """Handle a packet received from the server.
 
         - packet (Packet): The packet to handle.
         """
-        for handler in self.handlers.get(type(packet), []):
+        for handler in self.protocol.handlers_for(packet, time.monotonic()):
             handler(self, packet)
     
-    def add_handler(self, *packet_types: type[Packet]):
+    def _flush_coalesced(self):
+        """Call coalescing handlers with the held back packets whose window has passed."""
+        for handler, packet in self.protocol.due(time.monotonic()):
+            handler(self, packet)
+    
+    def add_handler(self, *packet_types: type[Packet], coalesce: float | None = None, frequency: AdminUpdateFrequency | None = None, **filters):
         """Decorator to add a handler for a specific packet type.
 
         - packets (Packet): The packet classes to handle.
+        - coalesce (float | None): If set, the handler is called at most once per this many seconds for each packet type and id,
+            with the latest packet received in that window. Default is None, which calls the handler for every packet.
+        - frequency (AdminUpdateFrequency | None): The update frequency the handler needs when auto_subscribe is enabled. Default is None, which uses DEFAULT_UPDATE_FREQUENCIES.
+        - filters: Packet fields the handler is limited to, for example action = Actions.CHAT_COMPANY or id = 3. The fields are listed in Packet.fields.
+            Filters are hash indexed, so handlers waiting for other values are not looked at when a packet is dispatched.
         """
         def decorator(func: Callable[[Admin, Packet], None]):
-            for packet_type in packet_types:
-                if packet_type not in self.handlers:
-                    self.handlers[packet_type] = []
-                self.handlers[packet_type].append(func)
+            self.protocol.add_handler(func, packet_types, coalesce, frequency, filters)
+            self._flush()
+            return func
+        
+        return decorator
+    
+    def remove_handler(self, func: Callable, *packet_types: type[Packet]) -> None:
+        """Remove a handler.
+
+        - func (Callable): The handler to remove.
+        - packet_types (type[Packet]): The packet classes to remove the handler for. Default is every packet class it handles.
+        """
+        self.protocol.remove_handler(func, packet_types)
+        self._flush()
+    
+    def add_command(self, name: str, cooldown: float = 0.0):
+        """Decorator to add a chat command, the function is called with the admin, the ChatPacket and the arguments of the command.
+
+        - name (str): The words of the command, without prefix, for example "help" or "rcon kick".
+        - cooldown (float): The minimum number of seconds between two uses of the command by the same client. Default is 0.0.
+        """
+        def decorator(func: Callable[..., None]):
+            if not self.commands:
+                self.add_handler(ChatPacket)(self._dispatch_command)
+            self.commands.add(name, func, cooldown)
             return func
         
         return decorator
     
+    def remove_command(self, name: str) -> None:
+        """Remove a chat command.
+
+        - name (str): The words of the command, as passed to add_command.
+        """
+        self.commands.remove(name)
+        if not self.commands:
+            self.remove_handler(self._dispatch_command, ChatPacket)
+    
+    def _dispatch_command(self, admin: "Admin", packet: ChatPacket):
+        found = self.commands.dispatch(packet.message, packet.id, time.monotonic())
+        if found is not None:
+            command, args = found
+            command.func(self, packet, *args)
+    
+    def add_console_handler(self, pattern: str | re.Pattern, origin: str | None = None):
+        """Decorator to add a handler for console lines matching a regular expression.
+
+        The pattern is matched at the start of ConsolePacket.message, the function is called with the admin, the ConsolePacket and the groups of the match.
+        All patterns are dispatched together, every line is only scanned for the patterns it can match.
+
+        - pattern (str | re.Pattern): The regular expression.
+        - origin (str | None): The console origin to limit the handler to, for example "net". Default is None, which matches every origin.
+        """
+        def decorator(func: Callable[..., None]):
+            if not self.console:
+                self.add_handler(ConsolePacket)(self._dispatch_console)
+            self.console.add(pattern, func, origin)
+            return func
+        
+        return decorator
+    
+    def remove_console_handler(self, func: Callable) -> None:
+        """Remove a console handler from all its patterns.
+
+        - func (Callable): The handler to remove.
+        """
+        for route in [route for route in self.console.routes if route.func == func]:
+            self.console.remove(route)
+        if not self.console:
+            self.remove_handler(self._dispatch_console, ConsolePacket)
+    
+    def _dispatch_console(self, admin: "Admin", packet: ConsolePacket):
+        for route, match in self.console.match(packet.origin, packet.message):
+            route.func(self, packet, *match.groups())
+    
+    def add_poll(self, type: AdminUpdateType, period: float, d1: int = POLL_ALL) -> None:
+        """Poll an update type periodically while run is running.
+
+        The polls of all tasks are spread evenly over time, within the rate budget of admin.polls, the stalest data first.
+
+        - type (AdminUpdateType): The update type to poll, for example AdminUpdateType.COMPANY_ECONOMY.
+        - period (float): The number of seconds between polls.
+        - d1 (int): The client or company id for CLIENT_INFO and COMPANY_INFO. Default is POLL_ALL.
+        """
+        if self._refresh_polls not in self.protocol.listeners:
+            self.protocol.add_listener(self._refresh_polls)
+        self.polls.add(self, type, period, time.monotonic(), d1)
+    
+    def remove_poll(self, type: AdminUpdateType | None = None, d1: int | None = None) -> None:
+        """Stop polling.
+
+        - type (AdminUpdateType | None): The update type. Default is None, which stops every poll of this admin.
+        - d1 (int | None): The id. Default is None, which stops the polls of every id.
+        """
+        self.polls.remove(self, type, d1)
+        if self._refresh_polls in self.protocol.listeners and not self.polls.has_tasks(self):
+            self.protocol.remove_listener(self._refresh_polls)
+    
+    def _refresh_polls(self, packet: Packet):
+        self.polls.refresh(self, packet, time.monotonic())
+    
+    def _send_polls(self):
+        """Send the polls of this admin that are due."""
+        for task in self.polls.due(time.monotonic(), self):
+            self.protocol.send(AdminPollPacket(task.type, task.d1))
+        self._flush()
+    
     def on_packet(self, packet: Packet):
         """This method is called for each packet received from the server.
         
@@ -0,0 +1,253 @@
+import bisect
+import re
+import time
+
+from typing import Callable
+
+from .enums import *
+from .packet import *
+
+_TOKEN = re.compile(r"\w+")
+
+def tokenize(text: str) -> frozenset[str]:
+    """The lower case words of a text, as they are indexed.
+
+    - text (str): The text.
+    """
+    return frozenset(_TOKEN.findall(text.lower()))
+
+class ChatEntry:
+    """A chat message kept by ChatHistory.
+
+    - seq (int): The position of the message in the history, counting from the first message ever added.
+    - time (float): The time the message was received.
+    - date (int | None): The game date of the last DatePacket before the message, None if no date was received.
+    - client_id (int): The client that sent the message.
+    - action (Actions): The chat action.
+    - message (str): The message.
+    """
+    def __init__(self, seq: int, time: float, date: int | None, client_id: int, action: Actions, message: str):
+        self.seq = seq
+        self.time = time
+        self.date = date
+        self.client_id = client_id
+        self.action = action
+        self.message = message
+        self.tokens = tokenize(message)
+
+    def __repr__(self) -> str:
+        return f"ChatEntry({self.seq}, {self.time}, {self.date}, {self.client_id}, {self.message!r})"
+
+class _Postings:
+    """The seqs of the entries with a word or of a client, oldest first. The first start seqs are evicted."""
+    __slots__ = ("seqs", "start")
+
+    def __init__(self):
+        self.seqs: list[int] = []
+        self.start = 0
+
+    def __len__(self) -> int:
+        return len(self.seqs) - self.start
+
+    def popleft(self) -> None:
+        self.start += 1
+        # drop the evicted head once it outgrows the live part, so evicting stays O(1) amortized
+        if self.start > 16 and self.start * 2 > len(self.seqs):
+            del self.seqs[:self.start]
+            self.start = 0
+
+class ChatHistory:
+    """Bounded chat history with an inverted word index and a per client index.
+
+    Entries are kept in arrival order, so time and game date ranges are found by bisection. A query starts from the shortest
+    of the index lists it can use and only checks the entries in it, so it does not slow down with the size of the history.
+    Game dates go back when a new game starts or a savegame is loaded, entries from before the last such jump are
+    filtered on date one by one instead.
+    Add history.listener as protocol listener to fill it.
+
+    - max_entries (int | None): The number of messages to keep. Default is 100000.
+    - max_age (float | None): The number of seconds to keep messages. Default is None, which keeps them until max_entries is reached.
+    - clock (Callable[[], float]): The time source. Default is time.time.
+    """
+    def __init__(self, max_entries: int | None = 100000, max_age: float | None = None, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.clock = clock
+        self.date: int | None = None
+
+        # entries and their times and dates from position _start on are alive, the seq of the entry at position 0 is _base
+        self._entries: list[ChatEntry] = []
+        self._times: list[float] = []
+        self._dates: list[int] = []
+        self._start = 0
+        self._base = 0
+        # the seq of the first entry whose date is lower than the one before it, dates are sorted from there on
+        self._date_jump = 0
+        self._tokens: dict[str, _Postings] = {}
+        self._clients: dict[int, _Postings] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries) - self._start
+
+    def __iter__(self):
+        return iter(self._entries[self._start:])
+
+    def add(self, client_id: int, action: Actions, message: str, now: float | None = None) -> ChatEntry:
+        """Add a message.
+
+        - client_id (int): The client that sent the message.
+        - action (Actions): The chat action.
+        - message (str): The message.
+        - now (float | None): The time the message was received. Default is None, which uses the clock.
+
+        Returns:
+        - ChatEntry: The added entry.
+        """
+        now = self.clock() if now is None else now
+        seq = self._base + len(self._entries)
+        entry = ChatEntry(seq, now, self.date, client_id, action, message)
+        # entries without a date sort before every date
+        date = -1 if self.date is None else self.date
+        if self._dates and date < self._dates[-1]:
+            self._date_jump = seq
+        self._entries.append(entry)
+        self._times.append(now)
+        self._dates.append(date)
+
+        for token in entry.tokens:
+            postings = self._tokens.get(token)
+            if postings is None:
+                postings = self._tokens[token] = _Postings()
+            postings.seqs.append(seq)
+        postings = self._clients.get(client_id)
+        if postings is None:
+            postings = self._clients[client_id] = _Postings()
+        postings.seqs.append(seq)
+
+        self._evict(now)
+        return entry
+
+    def _evict(self, now: float):
+        entries = self._entries
+        start = self._start
+        end = len(entries)
+        if self.max_entries is not None and end - start > self.max_entries:
+            start = end - self.max_entries
+        if self.max_age is not None:
+            start = max(start, bisect.bisect_left(self._times, now - self.max_age, start))
+
+        for entry in entries[self._start:start]:
+            # the oldest entry is the first of every list it is in
+            for token in entry.tokens:
+                postings = self._tokens[token]
+                postings.popleft()
+                if not postings:
+                    del self._tokens[token]
+            postings = self._clients[entry.client_id]
+            postings.popleft()
+            if not postings:
+                del self._clients[entry.client_id]
+        self._start = start
+
+        # drop the dead head once it outgrows the live part
+        if start > 1024 and start * 2 > len(entries):
+            del entries[:start]
+            del self._times[:start]
+            del self._dates[:start]
+            self._base += start
+            self._start = 0
+
+    def search(
+        self,
+        text: str | None = None,
+        client_id: int | None = None,
+        since: float | None = None,
+        until: float | None = None,
+        date_from: int | None = None,
+        date_to: int | None = None,
+        limit: int | None = None
+    ) -> list[ChatEntry]:
+        """Find messages, all given conditions must hold.
+
+        - text (str | None): Words the message must contain, matched as whole words ignoring case. Default is None.
+        - client_id (int | None): The client that sent the message. Default is None.
+        - since (float | None): The earliest time the message was received. Default is None.
+        - until (float | None): The time the message was received before. Default is None.
+        - date_from (int | None): The earliest game date. Default is None.
+        - date_to (int | None): The last game date. Default is None.
+        - limit (int | None): Return at most this many messages, the newest ones. Default is None.
+
+        Returns:
+        - list[ChatEntry]: The messages, oldest first.
+        """
+        if self.max_age is not None:
+            # messages may have aged out since the last one was added
+            self._evict(self.clock())
+
+        # the range of positions the time and date conditions allow
+        lo, hi = self._start, len(self._entries)
+        if since is not None:
+            lo = bisect.bisect_left(self._times, since, lo, hi)
+        if until is not None:
+            hi = bisect.bisect_left(self._times, until, lo, hi)
+        # dates are only sorted from the last jump back on, entries before it are checked one by one
+        dates = self._dates
+        sorted_from = max(lo, self._date_jump - self._base)
+        check_dates = sorted_from > lo and (date_from is not None or date_to is not None)
+        if date_from is not None and not check_dates:
+            lo = bisect.bisect_left(dates, date_from, lo, hi)
+        if date_to is not None and sorted_from < hi:
+            hi = bisect.bisect_right(dates, date_to, sorted_from, hi)
+        if lo >= hi:
+            return []
+
+        tokens = tokenize(text) if text is not None else frozenset()
+        lists = []
+        for token in tokens:
+            postings = self._tokens.get(token)
+            if postings is None:
+                return []
+            lists.append(postings)
+        if client_id is not None:
+            postings = self._clients.get(client_id)
+            if postings is None:
+                return []
+            lists.append(postings)
+
+        entries = self._entries
+        base = self._base
+        if lists:
+            shortest = min(lists, key = len)
+            seqs = shortest.seqs
+            first = bisect.bisect_left(seqs, lo + base, shortest.start)
+            last = bisect.bisect_left(seqs, hi + base, first)
+            positions = (seq - base for seq in reversed(seqs[first:last]))
+        else:
+            positions = range(hi - 1, lo - 1, -1)
+
+        found = []
+        for position in positions:
+            entry = entries[position]
+            if client_id is not None and entry.client_id != client_id:
+                continue
+            if not tokens <= entry.tokens:
+                continue
+            if check_dates and ((date_from is not None and dates[position] < date_from) or (date_to is not None and dates[position] > date_to)):
+                continue
+            found.append(entry)
+            if limit is not None and len(found) >= limit:
+                break
+
+        found.reverse()
+        return found
+
+    def listener(self, packet: Packet) -> None:
+        """Protocol listener that adds ChatPackets and keeps track of the game date."""
+        cls = type(packet)
+        if cls is ChatPacket:
+            self.add(packet.id, packet.action, packet.message)
+        elif cls is DatePacket:
+            self.date = packet.date
+        elif cls is NewGamePacket:
+            # messages until the first date of the new game have no date
+            self.date = None
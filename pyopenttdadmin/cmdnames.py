@@ -0,0 +1,107 @@
+import json
+import os
+import re
+
+from .packet import *
+
+class CommandNames:
+    """Table of the DoCommand names of the server, to resolve CmdLoggingPacket.cmd.
+
+    The table is filled from CmdNamesPacket and can be cached on disk, one file per server version,
+    so the names only have to be polled the first time a server version is seen. The server sends the names
+    spread over several packets, a table is only complete, and written to the cache, once finish is called.
+
+    - cache_dir (str | os.PathLike | None): The directory to cache the names in. Default is None, which doesn't cache.
+    """
+    def __init__(self, cache_dir: str | os.PathLike | None = None):
+        self.cache_dir = cache_dir
+        self.version: str | None = None
+        self.names: tuple[str | None, ...] = ()
+        self.complete = False
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, cmd: int) -> str:
+        name = self.name(cmd)
+        if name is None:
+            raise KeyError(cmd)
+        return name
+
+    def name(self, cmd: int) -> str | None:
+        """The name of a DoCommand.
+
+        - cmd (int): The command id, for example CmdLoggingPacket.cmd.
+
+        Returns:
+        - str | None: The name, or None if it is not known.
+        """
+        names = self.names
+        return names[cmd] if 0 <= cmd < len(names) else None
+
+    def _path(self, version: str) -> str:
+        name = re.sub(r'[^\w.-]', '_', version)
+        return os.path.join(self.cache_dir, f"cmd_names-{name}.json")
+
+    def load(self, version: str) -> bool:
+        """Switch to a server version, loading its names from the cache.
+
+        - version (str): The server version, as in WelcomePacket.version.
+
+        Returns:
+        - bool: True if the names are known for this version.
+        """
+        if version == self.version and self.complete:
+            return True
+
+        self.version = version
+        self.names = ()
+        self.complete = False
+        if self.cache_dir is None:
+            return False
+
+        try:
+            with open(self._path(version), encoding = 'utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if cached.get("version") != version:
+            return False
+
+        self.names = tuple(cached["names"])
+        self.complete = bool(self.names)
+        return self.complete
+
+    def finish(self) -> None:
+        """Mark the table as complete, after the server has sent all names, and write it to the cache."""
+        self.complete = True
+        self.save()
+
+    def save(self) -> None:
+        """Write the names of the current server version to the cache, if the table is complete."""
+        if self.cache_dir is None or self.version is None or not self.complete:
+            return
+
+        os.makedirs(self.cache_dir, exist_ok = True)
+        path = self._path(self.version)
+        # write next to the cache file and swap, so a reader never sees half a file
+        with open(path + ".tmp", "w", encoding = 'utf-8') as f:
+            json.dump({"version": self.version, "names": self.names}, f)
+        os.replace(path + ".tmp", path)
+
+    def update(self, names: dict[int, str]) -> None:
+        """Add names to the table, the server sends them spread over multiple packets.
+
+        - names (dict[int, str]): The names by command id, as in CmdNamesPacket.names.
+        """
+        if not names:
+            return
+
+        table = list(self.names)
+        size = max(names) + 1
+        if size > len(table):
+            table += [None] * (size - len(table))
+        for cmd, name in names.items():
+            table[cmd] = name
+        self.names = tuple(table)
@@ -0,0 +1,84 @@
+import struct
+
+from typing import Any, Iterable
+
+# Field types of command payloads, the integer types are struct codes. Strings are NUL terminated.
+STRING = "str"
+
+class CommandSchema:
+    """Layout of the payload of a DoCommand, as sent in CmdLoggingPacket.data.
+
+    The fields are compiled into struct layouts once, runs of fixed size fields are read with a single unpack
+    and only strings are searched for their terminator.
+
+    - fields (Iterable[tuple[str, str]]): The name and type of each argument, in order. The type is a struct code such as "I" or "q", or STRING.
+    """
+    def __init__(self, fields: Iterable[tuple[str, str]]):
+        self.fields = tuple(fields)
+        self.names = tuple(name for name, _ in self.fields)
+
+        # alternating runs: a struct for fixed size fields, None for a string
+        self._layout: list[struct.Struct | None] = []
+        codes = ""
+        for _, type in self.fields:
+            if type == STRING:
+                if codes:
+                    self._layout.append(struct.Struct("<" + codes))
+                    codes = ""
+                self._layout.append(None)
+            else:
+                # raises on unknown codes now instead of on the first decode
+                struct.calcsize(type)
+                codes += type
+        if codes:
+            self._layout.append(struct.Struct("<" + codes))
+
+    def decode(self, data: bytes) -> dict[str, Any]:
+        """Decode a payload.
+
+        - data (bytes): The payload.
+
+        Returns:
+        - dict[str, Any]: The arguments by name.
+        """
+        values = []
+        offset = 0
+        try:
+            for layout in self._layout:
+                if layout is None:
+                    end = data.index(b'\x00', offset)
+                    values.append(data[offset:end].decode('utf-8'))
+                    offset = end + 1
+                else:
+                    values += layout.unpack_from(data, offset)
+                    offset += layout.size
+        except (struct.error, ValueError) as e:
+            raise ValueError(f"Payload does not match the schema: {e}") from None
+
+        return dict(zip(self.names, values))
+
+# Payload layouts by command name as the server sends it in CmdNamesPacket, the name of the command handler,
+# as of OpenTTD 14. Other versions may lay out arguments differently.
+COMMAND_SCHEMAS: dict[str, CommandSchema] = {}
+
+def register_command_schema(name: str, fields: Iterable[tuple[str, str]]) -> CommandSchema:
+    """Register or replace the payload layout of a command.
+
+    - name (str): The command name, as in CmdNamesPacket and CmdLoggingPacket.name, for example "CmdGiveMoney".
+    - fields (Iterable[tuple[str, str]]): The name and type of each argument, in order.
+
+    Returns:
+    - CommandSchema: The compiled schema.
+    """
+    schema = COMMAND_SCHEMAS[name] = CommandSchema(fields)
+    return schema
+
+register_command_schema("CmdBuildRailroadTrack", [("end_tile", "I"), ("start_tile", "I"), ("railtype", "B"), ("track", "B"), ("auto_remove_signals", "?"), ("fail_on_obstacle", "?")])
+register_command_schema("CmdLandscapeClear", [("tile", "I")])
+register_command_schema("CmdClearArea", [("tile", "I"), ("start_tile", "I"), ("diagonal", "?")])
+register_command_schema("CmdSellVehicle", [("vehicle_id", "I"), ("sell_chain", "?"), ("backup_order", "?"), ("client_id", "I")])
+register_command_schema("CmdGiveMoney", [("money", "q"), ("dest_company", "B")])
+register_command_schema("CmdPause", [("mode", "B"), ("pause", "?")])
+register_command_schema("CmdCompanyCtrl", [("action", "B"), ("company_id", "B"), ("reason", "B"), ("client_id", "I")])
+register_command_schema("CmdRenameCompany", [("text", STRING)])
+register_command_schema("CmdRenamePresident", [("text", STRING)])
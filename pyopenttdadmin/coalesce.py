@@ -0,0 +1,68 @@
+import heapq
+
+from .packet import Packet
+
+class Coalescer:
+    """Latest-wins debouncing of packets per packet type and id.
+
+    The first packet for a key is delivered immediately. Packets arriving within window seconds of the last delivery
+    are held back, only the latest one is delivered once the window has passed.
+    Packets without an id attribute are coalesced per packet type.
+
+    - window (float): The minimum number of seconds between two deliveries for the same key.
+    """
+    def __init__(self, window: float):
+        self.window = window
+        self._last: dict[tuple[type[Packet], int | None], float] = {}
+        self._pending: dict[tuple[type[Packet], int | None], Packet] = {}
+        self._deadlines: list[tuple[float, tuple[type[Packet], int | None]]] = []
+
+    def offer(self, packet: Packet, now: float) -> bool:
+        """Offer a packet for delivery.
+
+        - packet (Packet): The received packet.
+        - now (float): The current time.
+
+        Returns:
+        - bool: True if the packet should be delivered now, False if it is held back.
+        """
+        key = (type(packet), getattr(packet, "id", None))
+        if key in self._pending:
+            self._pending[key] = packet
+            return False
+
+        last = self._last.get(key)
+        if last is None or now - last >= self.window:
+            if len(self._last) > 1024:
+                self._purge(now)
+            self._last[key] = now
+            return True
+
+        self._pending[key] = packet
+        heapq.heappush(self._deadlines, (last + self.window, key))
+        return False
+
+    def due(self, now: float) -> list[Packet]:
+        """Collect the held back packets whose window has passed.
+
+        - now (float): The current time.
+
+        Returns:
+        - list[Packet]: The packets to deliver now.
+        """
+        packets = []
+        deadlines = self._deadlines
+        while deadlines and deadlines[0][0] <= now:
+            _, key = heapq.heappop(deadlines)
+            packets.append(self._pending.pop(key))
+            self._last[key] = now
+
+        return packets
+
+    def next_deadline(self) -> float | None:
+        """The time at which the next held back packet is due, or None if nothing is held back."""
+        return self._deadlines[0][0] if self._deadlines else None
+
+    def _purge(self, now: float):
+        """Forget keys whose window has passed, so ids that are no longer used don't pile up."""
+        self._last = {key: last for key, last in self._last.items() if now - last < self.window or key in self._pending}
@@ -0,0 +1,143 @@
+from typing import Callable, Iterable
+
+class Command:
+    """A chat command registered with a CommandRouter.
+
+    - name (str): The words of the command, without prefix, for example "rcon kick".
+    - func (Callable): The function called when the command is used.
+    - cooldown (float): The minimum number of seconds between two uses of the command by the same client.
+    """
+    def __init__(self, name: str, func: Callable, cooldown: float = 0.0):
+        self.name = name
+        self.func = func
+        self.cooldown = cooldown
+
+    def __repr__(self) -> str:
+        return f"Command({self.name!r}, {self.func.__name__}, {self.cooldown})"
+
+class CommandRouter:
+    """Routes chat messages to commands through a trie of command words.
+
+    A message is split into words once, the words after the prefix are walked down the trie and the deepest
+    command on the way wins, the remaining words are its arguments. Dispatching therefore costs the same
+    however many commands are registered. Command words are matched case insensitively.
+
+    - prefixes (Iterable[str]): The prefixes a message must start with to be a command. Default is ("!",).
+    """
+    def __init__(self, prefixes: Iterable[str] = ("!",)):
+        # longest first, so "!!" is not taken for "!"
+        self.prefixes = tuple(sorted(prefixes, key = len, reverse = True))
+        self._root: dict = {}
+        self._last_used: dict[tuple[Command, int], float] = {}
+        self.commands: dict[str, Command] = {}
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+    def add(self, name: str, func: Callable, cooldown: float = 0.0) -> Command:
+        """Register a command.
+
+        - name (str): The words of the command, without prefix, for example "help" or "rcon kick".
+        - func (Callable): The function called when the command is used.
+        - cooldown (float): The minimum number of seconds between two uses of the command by the same client. Default is 0.0.
+
+        Returns:
+        - Command: The registered command.
+        """
+        words = name.lower().split()
+        if not words:
+            raise ValueError("Command name must not be empty.")
+
+        key = " ".join(words)
+        if key in self.commands:
+            raise ValueError(f"Command {key!r} is already registered.")
+
+        node = self._root
+        for word in words:
+            node = node.setdefault(word, {})
+
+        # None can't clash with a command word, words are strings
+        command = node[None] = Command(key, func, cooldown)
+        self.commands[key] = command
+        return command
+
+    def remove(self, name: str) -> None:
+        """Remove a command.
+
+        - name (str): The words of the command, as passed to add.
+        """
+        words = name.lower().split()
+        command = self.commands.pop(" ".join(words))
+
+        path = [self._root]
+        for word in words:
+            path.append(path[-1][word])
+        del path[-1][None]
+
+        # prune the branches that lead to no command anymore
+        for i in range(len(words), 0, -1):
+            if path[i]:
+                break
+            del path[i - 1][words[i - 1]]
+
+        self._last_used = {used: last for used, last in self._last_used.items() if used[0] is not command}
+
+    def match(self, message: str) -> tuple[Command, list[str]] | None:
+        """Find the command a message uses.
+
+        - message (str): The chat message.
+
+        Returns:
+        - tuple[Command, list[str]] | None: The command and its arguments, or None if the message is not a command.
+        """
+        for prefix in self.prefixes:
+            if message.startswith(prefix):
+                break
+        else:
+            return None
+
+        words = message[len(prefix):].split()
+        node = self._root
+        found = None
+        for i, word in enumerate(words):
+            node = node.get(word.lower())
+            if node is None:
+                break
+            if None in node:
+                found = (node[None], i + 1)
+
+        if found is None:
+            return None
+
+        command, used = found
+        return command, words[used:]
+
+    def dispatch(self, message: str, client_id: int, now: float) -> tuple[Command, list[str]] | None:
+        """Find the command a message uses, respecting the cooldown of the command for the client.
+
+        - message (str): The chat message.
+        - client_id (int): The client that sent the message.
+        - now (float): The current monotonic time.
+
+        Returns:
+        - tuple[Command, list[str]] | None: The command and its arguments, or None if the message is not a command or the command is cooling down.
+        """
+        found = self.match(message)
+        if found is None:
+            return None
+
+        command = found[0]
+        if command.cooldown:
+            key = (command, client_id)
+            last = self._last_used.get(key)
+            if last is not None and now - last < command.cooldown:
+                return None
+            if len(self._last_used) > 1024:
+                self._purge(now)
+            self._last_used[key] = now
+
+        return found
+
+    def _purge(self, now: float):
+        """Forget cooldowns that have passed, so clients that left don't pile up."""
+        self._last_used = {key: last for key, last in self._last_used.items() if now - last < key[0].cooldown}
@@ -0,0 +1,106 @@
+import socket
+
+class ConnectionOptions:
+    """Socket options of the connection to the server.
+
+    - nodelay (bool): Disable Nagle's algorithm, so small packets such as rcon commands are sent at once. Default is True.
+    - recv_buffer (int | None): The kernel receive buffer size in bytes, SO_RCVBUF. Default is None, which keeps the system default.
+    - send_buffer (int | None): The kernel send buffer size in bytes, SO_SNDBUF. Default is None, which keeps the system default.
+    - keepalive (bool): Send TCP keepalive probes, so a dead connection is noticed on an idle server. Default is False.
+    - keepalive_idle (int | None): The number of idle seconds before the first keepalive probe, where the platform supports it.
+        Default is None, which keeps the system default.
+    - connect_timeout (float | None): The number of seconds to wait for the connection to be established. Default is 10.0.
+    - min_read (int): The smallest number of bytes read at once. Default is 1024.
+    - max_read (int): The largest number of bytes read at once. Default is 65536.
+    """
+    def __init__(
+        self,
+        nodelay: bool = True,
+        recv_buffer: int | None = None,
+        send_buffer: int | None = None,
+        keepalive: bool = False,
+        keepalive_idle: int | None = None,
+        connect_timeout: float | None = 10.0,
+        min_read: int = 1024,
+        max_read: int = 65536
+    ):
+        if not 0 < min_read <= max_read:
+            raise ValueError("min_read must be positive and at most max_read.")
+        self.nodelay = nodelay
+        self.recv_buffer = recv_buffer
+        self.send_buffer = send_buffer
+        self.keepalive = keepalive
+        self.keepalive_idle = keepalive_idle
+        self.connect_timeout = connect_timeout
+        self.min_read = min_read
+        self.max_read = max_read
+
+    def apply(self, sock: socket.socket) -> None:
+        """Set the options on a connected socket.
+
+        - sock (socket.socket): The socket.
+        """
+        if self.nodelay:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.recv_buffer is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer)
+        if self.send_buffer is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+        if self.keepalive:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if self.keepalive_idle is not None:
+                # TCP_KEEPIDLE on Linux, TCP_KEEPALIVE on macOS
+                option = getattr(socket, "TCP_KEEPIDLE", getattr(socket, "TCP_KEEPALIVE", None))
+                if option is not None:
+                    sock.setsockopt(socket.IPPROTO_TCP, option, self.keepalive_idle)
+
+class ReadSizer:
+    """Adapts the number of bytes read at once to the traffic.
+
+    The size doubles when a read fills it, so a burst is read in a few large reads, and halves when reads come back
+    less than a quarter full or the connection is idle, so a quiet connection doesn't hold on to large buffers.
+
+    - min_size (int): The smallest size. Default is 1024.
+    - max_size (int): The largest size. Default is 65536.
+    """
+    def __init__(self, min_size: int = 1024, max_size: int = 65536):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.size = min_size
+
+    def update(self, received: int) -> None:
+        """Adapt the size to the number of bytes the last read returned.
+
+        - received (int): The number of bytes read, 0 if the read timed out.
+        """
+        if received >= self.size:
+            self.size = min(self.size * 2, self.max_size)
+        elif received < self.size // 4:
+            self.size = max(self.size // 2, self.min_size)
+
+class ConnectionMetrics:
+    """Traffic of an admin connection.
+
+    - reads (int): The number of reads that returned data.
+    - writes (int): The number of writes to the connection.
+    - packets (int): The number of packets received.
+    - bytes_received (int): The number of bytes received.
+    - bytes_sent (int): The number of bytes sent.
+    - read_size (int): The current read size.
+    """
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.read_size = 0
+        self.packets = 0
+
+    def syscalls_per_packet(self) -> float:
+        """The number of reads and writes per received packet, 0.0 before any packet was received."""
+        if not self.packets:
+            return 0.0
+        return (self.reads + self.writes) / self.packets
+
+    def __repr__(self) -> str:
+        return f"ConnectionMetrics(reads={self.reads}, writes={self.writes}, packets={self.packets}, bytes_received={self.bytes_received}, bytes_sent={self.bytes_sent}, read_size={self.read_size})"
@@ -0,0 +1,157 @@
+import re
+
+from typing import Callable
+
+# the longest literal prefix used as index key, bounds the number of lookups per line
+MAX_PREFIX = 16
+_SPECIAL = set(".^$*+?{}[]\\|()")
+_QUANTIFIERS = set("*+?{")
+_GROUP_REFERENCE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+def literal_prefix(pattern: str) -> str:
+    """The text every line matching pattern at its start begins with.
+
+    - pattern (str): The regular expression.
+
+    Returns:
+    - str: The literal prefix, empty if the pattern has none or contains alternation.
+    """
+    if "|" in pattern:
+        return ""
+
+    prefix = []
+    # patterns are matched at the start of the line anyway
+    for char in pattern[1:] if pattern.startswith("^") else pattern:
+        if char in _SPECIAL:
+            # a quantified character is optional or repeated, it is not part of the prefix
+            if char in _QUANTIFIERS and prefix:
+                prefix.pop()
+            break
+        prefix.append(char)
+    return "".join(prefix)[:MAX_PREFIX]
+
+class ConsoleRoute:
+    """A pattern registered with a ConsoleRouter.
+
+    - pattern (re.Pattern): The compiled pattern.
+    - func (Callable): The function called for matching lines.
+    - origin (str | None): The console origin the route is limited to, for example "net". None matches every origin.
+    """
+    def __init__(self, pattern: re.Pattern, func: Callable, origin: str | None, order: int):
+        self.pattern = pattern
+        self.func = func
+        self.origin = origin
+        self.order = order
+
+    def __repr__(self) -> str:
+        return f"ConsoleRoute({self.pattern.pattern!r}, {self.func.__name__}, {self.origin})"
+
+class ConsoleRouter:
+    """Routes console lines to the handlers whose pattern matches the start of the line.
+
+    Patterns with a literal prefix are indexed by that prefix, a line only runs the patterns whose prefix it starts with,
+    found with one dictionary lookup per distinct prefix length. Patterns without a literal prefix are compiled into a single
+    alternation that rules out most lines in one scan before the individual patterns are tried.
+    """
+    def __init__(self):
+        self.routes: list[ConsoleRoute] = []
+        self._order = 0
+        self._prefixed: dict[str, list[ConsoleRoute]] = {}
+        self._lengths: list[int] = []
+        self._fallback: list[ConsoleRoute] = []
+        # None if there are no fallback patterns, True if they can't be combined and always have to be tried
+        self._combined: re.Pattern | bool | None = None
+
+    def __len__(self) -> int:
+        return len(self.routes)
+
+    def add(self, pattern: str | re.Pattern, func: Callable, origin: str | None = None) -> ConsoleRoute:
+        """Register a pattern.
+
+        - pattern (str | re.Pattern): The regular expression, matched at the start of the line.
+        - func (Callable): The function called for matching lines.
+        - origin (str | None): The console origin to limit the pattern to, for example "net". Default is None, which matches every origin.
+
+        Returns:
+        - ConsoleRoute: The registered route.
+        """
+        compiled = re.compile(pattern)
+        self._order += 1
+        route = ConsoleRoute(compiled, func, origin, self._order)
+        self.routes.append(route)
+        self._index(route)
+        return route
+
+    def remove(self, route: ConsoleRoute) -> None:
+        """Remove a route.
+
+        - route (ConsoleRoute): The route, as returned by add.
+        """
+        self.routes.remove(route)
+        self._prefixed.clear()
+        self._fallback.clear()
+        for kept in self.routes:
+            self._index(kept, compile = False)
+        self._compile()
+
+    def _index(self, route: ConsoleRoute, compile: bool = True):
+        # flags change what the literal text matches, such patterns are not indexed
+        prefix = "" if route.pattern.flags & ~re.UNICODE else literal_prefix(route.pattern.pattern)
+        if prefix:
+            self._prefixed.setdefault(prefix, []).append(route)
+        else:
+            self._fallback.append(route)
+
+        if compile:
+            self._compile()
+
+    def _compile(self):
+        self._lengths = sorted({len(prefix) for prefix in self._prefixed})
+        self._combined = None
+        if not self._fallback:
+            return
+
+        self._combined = True
+        # flags and group references mean something else in the combined pattern, it could miss lines
+        if any(route.pattern.flags & ~re.UNICODE or _GROUP_REFERENCE.search(route.pattern.pattern) for route in self._fallback):
+            return
+        try:
+            # non capturing wrappers keep the alternatives apart, the groups are only used by the individual patterns
+            self._combined = re.compile("|".join(f"(?:{route.pattern.pattern})" for route in self._fallback))
+        except re.error:
+            # e.g. the same group name in two patterns
+            pass
+
+    def match(self, origin: str, message: str) -> list[tuple[ConsoleRoute, re.Match]]:
+        """The routes matching a console line.
+
+        - origin (str): The origin of the line.
+        - message (str): The line.
+
+        Returns:
+        - list[tuple[ConsoleRoute, re.Match]]: The matching routes with their match, in the order they were added.
+        """
+        candidates = []
+        prefixed = self._prefixed
+        for length in self._lengths:
+            if length > len(message):
+                break
+            routes = prefixed.get(message[:length])
+            if routes:
+                candidates += routes
+
+        combined = self._combined
+        if combined is True or (combined is not None and combined.match(message)):
+            candidates += self._fallback
+
+        matched = []
+        for route in candidates:
+            if route.origin is not None and route.origin != origin:
+                continue
+            found = route.pattern.match(message)
+            if found:
+                matched.append((route, found))
+
+        if len(matched) > 1:
+            matched.sort(key = lambda pair: pair[0].order)
+        return matched
@@ -0,0 +1,146 @@
+import bisect
+import datetime
+
+from typing import Any
+
+# OpenTTD dates count days from 1 January of year 0, with the Gregorian leap rules applied from year 0 on.
+DAYS_IN_400_YEARS = 400 * 365 + 97
+# 1 January 1920, the base year of the original game
+DAYS_TILL_ORIGINAL_BASE_YEAR = 365 * 1920 + 1920 // 4 - 1920 // 100 + 1920 // 400
+# datetime.date ordinals start at 1 January of year 1, year 0 is a leap year
+_ORDINAL_OFFSET = 365
+
+def is_leap_year(year: int) -> bool:
+    """Whether a year has 366 days.
+
+    - year (int): The year.
+    """
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+def days_till(year: int) -> int:
+    """The date of 1 January of a year.
+
+    - year (int): The year.
+    """
+    return 365 * year + (year + 3) // 4 - (year + 99) // 100 + (year + 399) // 400
+
+# the day within a 400 year cycle each of its years starts on, the cycle starts with a leap year
+_YEAR_STARTS = [days_till(year) for year in range(401)]
+# the day within the year each month starts on, for normal and leap years
+_MONTH_STARTS = [
+    [0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334, 365],
+    [0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335, 366],
+]
+
+def to_ymd(date: int) -> tuple[int, int, int]:
+    """Convert an OpenTTD date, such as DatePacket.date, to a calendar date.
+
+    - date (int): The number of days since 1 January of year 0.
+
+    Returns:
+    - tuple[int, int, int]: The year, the month (1-12) and the day of the month (1-31).
+    """
+    cycles, day = divmod(date, DAYS_IN_400_YEARS)
+    year = bisect.bisect_right(_YEAR_STARTS, day) - 1
+    day -= _YEAR_STARTS[year]
+    year += cycles * 400
+
+    months = _MONTH_STARTS[is_leap_year(year)]
+    month = bisect.bisect_right(months, day)
+    return year, month, day - months[month - 1] + 1
+
+def from_ymd(year: int, month: int, day: int) -> int:
+    """Convert a calendar date to an OpenTTD date.
+
+    - year (int): The year.
+    - month (int): The month, 1-12.
+    - day (int): The day of the month, 1-31.
+
+    Returns:
+    - int: The number of days since 1 January of year 0.
+    """
+    return days_till(year) + _MONTH_STARTS[is_leap_year(year)][month - 1] + day - 1
+
+def to_date(date: int) -> datetime.date:
+    """Convert an OpenTTD date to a datetime.date, which exists for years 1 to 9999.
+
+    - date (int): The number of days since 1 January of year 0.
+    """
+    return datetime.date.fromordinal(date - _ORDINAL_OFFSET)
+
+def from_date(date: datetime.date) -> int:
+    """Convert a datetime.date to an OpenTTD date.
+
+    - date (datetime.date): The date.
+    """
+    return date.toordinal() + _ORDINAL_OFFSET
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("Converting arrays of dates requires numpy, install it with pip install pyOpenTTDAdmin[numpy]") from None
+    return numpy
+
+_tables: dict[str, Any] = {}
+
+def _array_tables() -> dict[str, Any]:
+    """The lookup tables of the array conversions, as numpy arrays, built once."""
+    if not _tables:
+        np = _numpy()
+        # month and day of month for every day of the year, for normal and leap years
+        month_of = np.zeros((2, 366), dtype = np.int8)
+        day_of = np.zeros((2, 366), dtype = np.int8)
+        for leap, starts in enumerate(_MONTH_STARTS):
+            for month in range(12):
+                month_of[leap, starts[month]:starts[month + 1]] = month + 1
+                day_of[leap, starts[month]:starts[month + 1]] = np.arange(1, starts[month + 1] - starts[month] + 1)
+
+        _tables["year_starts"] = np.array(_YEAR_STARTS, dtype = np.int64)
+        _tables["month_starts"] = np.array(_MONTH_STARTS, dtype = np.int64)
+        _tables["month_of"] = month_of
+        _tables["day_of"] = day_of
+    return _tables
+
+def _is_leap_array(years):
+    return (years % 4 == 0) & ((years % 100 != 0) | (years % 400 == 0))
+
+def to_ymd_array(dates) -> tuple[Any, Any, Any]:
+    """Convert an array of OpenTTD dates to calendar dates, without a Python loop. Requires numpy.
+
+    - dates (numpy.ndarray | Sequence[int]): The numbers of days since 1 January of year 0.
+
+    Returns:
+    - tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]: The years, the months (1-12) and the days of the month (1-31), shaped like dates.
+    """
+    np = _numpy()
+    tables = _array_tables()
+    dates = np.asarray(dates, dtype = np.int64)
+
+    cycles, day = np.divmod(dates, DAYS_IN_400_YEARS)
+    year = np.searchsorted(tables["year_starts"], day, side = 'right') - 1
+    day = day - tables["year_starts"][year]
+    year = year + cycles * 400
+
+    leap = _is_leap_array(year).astype(np.intp)
+    return year, tables["month_of"][leap, day], tables["day_of"][leap, day]
+
+def from_ymd_array(years, months, days):
+    """Convert arrays of calendar dates to OpenTTD dates, without a Python loop. Requires numpy.
+
+    - years (numpy.ndarray | Sequence[int]): The years.
+    - months (numpy.ndarray | Sequence[int]): The months, 1-12.
+    - days (numpy.ndarray | Sequence[int]): The days of the month, 1-31.
+
+    Returns:
+    - numpy.ndarray: The numbers of days since 1 January of year 0.
+    """
+    np = _numpy()
+    tables = _array_tables()
+    years = np.asarray(years, dtype = np.int64)
+    months = np.asarray(months, dtype = np.int64)
+    days = np.asarray(days, dtype = np.int64)
+
+    leap = _is_leap_array(years).astype(np.intp)
+    till = 365 * years + (years + 3) // 4 - (years + 99) // 100 + (years + 399) // 400
+    return till + tables["month_starts"][leap, months - 1] + days - 1
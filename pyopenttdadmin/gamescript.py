@@ -0,0 +1,60 @@
+from typing import Any, Callable
+
+from .packet import *
+
+class GameScriptCalls:
+    """Matches GameScript replies to the messages that asked for them, by a message id field.
+
+    Only GameScriptPackets that arrive while calls are pending are parsed.
+
+    - id_field (str): The field of the JSON object that holds the message id, the GameScript must copy it into its reply. Default is "id".
+    """
+    def __init__(self, id_field: str = "id"):
+        self.id_field = id_field
+        self.pending: dict[Any, Callable[[Any], None]] = {}
+        self._next_id = 0
+
+    def prepare(self, message: dict) -> Any:
+        """Give a message an id, unless it has one already.
+
+        - message (dict): The message to send.
+
+        Returns:
+        - Any: The id of the message.
+        """
+        if self.id_field not in message:
+            self._next_id += 1
+            message[self.id_field] = self._next_id
+        return message[self.id_field]
+
+    def expect(self, id: Any, callback: Callable[[Any], None]) -> None:
+        """Call a function with the reply to a message.
+
+        - id (Any): The id of the message.
+        - callback (Callable[[Any], None]): Called with the parsed reply.
+        """
+        if id in self.pending:
+            raise ValueError(f"A call with id {id!r} is already pending.")
+        self.pending[id] = callback
+
+    def cancel(self, id: Any) -> None:
+        """Stop waiting for the reply to a message.
+
+        - id (Any): The id of the message.
+        """
+        self.pending.pop(id, None)
+
+    def listener(self, packet: Packet) -> None:
+        """Protocol listener that resolves pending calls."""
+        if not self.pending or type(packet) is not GameScriptPacket:
+            return
+
+        try:
+            data = packet.data
+        except ValueError:
+            return
+
+        if isinstance(data, dict):
+            callback = self.pending.pop(data.get(self.id_field), None)
+            if callback is not None:
+                callback(data)
@@ -0,0 +1,112 @@
+from operator import itemgetter
+from typing import Any, Callable
+
+from .packet import Packet
+
+_MISSING = object()
+
+class HandlerIndex:
+    """The handlers of one packet class, indexed on the fields they filter on.
+
+    A handler with filters is stored in a hash index on its first filter field, keyed by the wanted value.
+    Matching a packet looks up its value for every indexed field and only checks the other filters of the handlers found there,
+    so handlers that filter on other values are never looked at. Handlers are returned in the order they were added.
+
+    - packet_type (type[Packet]): The packet class the handlers are for.
+    """
+    def __init__(self, packet_type: type[Packet]):
+        self.packet_type = packet_type
+        # every packet has synthetic, set on the packets the admin makes up
+        self._fields = frozenset(packet_type.fields) | {"synthetic"}
+        self._order = 0
+        self._unfiltered: list[tuple[int, Callable]] = []
+        self._indexes: dict[str, dict[Any, list[tuple[int, Callable, dict[str, Any]]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._unfiltered) + sum(len(entries) for index in self._indexes.values() for entries in index.values())
+
+    def add(self, func: Callable, filters: dict[str, Any] | None = None) -> None:
+        """Add a handler.
+
+        - func (Callable): The handler.
+        - filters (dict[str, Any] | None): The values packet fields must be equal to for the handler to be called. Default is None, which matches every packet.
+        """
+        filters = dict(filters or {})
+        self.validate(filters)
+
+        self._order += 1
+        if not filters:
+            self._unfiltered.append((self._order, func))
+            return
+
+        field = next(iter(filters))
+        value = filters.pop(field)
+        self._indexes.setdefault(field, {}).setdefault(value, []).append((self._order, func, filters))
+
+    def validate(self, filters: dict[str, Any]) -> None:
+        """Raise a ValueError if the packet class has no field for one of the filters, the fields are listed in packet_type.fields.
+
+        - filters (dict[str, Any]): The filters to check.
+        """
+        unknown = filters.keys() - self._fields
+        if unknown:
+            raise ValueError(f"{self.packet_type.__name__} has no field {', '.join(sorted(unknown))}")
+
+    def remove(self, func: Callable) -> None:
+        """Remove the oldest registration of a handler, like list.remove.
+
+        - func (Callable): The handler to remove.
+        """
+        found = None
+        for i, (order, handler) in enumerate(self._unfiltered):
+            if handler == func:
+                found = (order, self._unfiltered, i)
+                break
+
+        for index in self._indexes.values():
+            for entries in index.values():
+                for i, (order, handler, _) in enumerate(entries):
+                    if handler == func and (found is None or order < found[0]):
+                        found = (order, entries, i)
+                        break
+
+        if found is None:
+            raise ValueError(f"{func} is not a handler for {self.packet_type.__name__}")
+
+        _, entries, i = found
+        del entries[i]
+        # drop emptied buckets, so an index only holds values that are still wanted
+        for field, index in list(self._indexes.items()):
+            for value, bucket in list(index.items()):
+                if not bucket:
+                    del index[value]
+            if not index:
+                del self._indexes[field]
+
+    def match(self, packet: Packet) -> list[Callable]:
+        """The handlers whose filters match a packet.
+
+        - packet (Packet): The received packet.
+
+        Returns:
+        - list[Callable]: The handlers, in the order they were added.
+        """
+        if not self._indexes:
+            return [func for _, func in self._unfiltered]
+
+        matched = list(self._unfiltered)
+        for field, index in self._indexes.items():
+            try:
+                entries = index.get(getattr(packet, field, _MISSING))
+            except TypeError:
+                # unhashable field value, it can't equal a filter value
+                continue
+            if not entries:
+                continue
+
+            for order, func, filters in entries:
+                if all(getattr(packet, name, _MISSING) == value for name, value in filters.items()):
+                    matched.append((order, func))
+
+        matched.sort(key = itemgetter(0))
+        return [func for _, func in matched]
@@ -0,0 +1,138 @@
+import bisect
+
+from . import jsoncodec
+from .packet import *
+from .state import GameState
+
+# the packets that change the client and company tables
+_EVENT_PACKETS = frozenset({
+    ClientInfoPacket, ClientUpdatePacket, ClientQuitPacket, ClientErrorPacket, ClientJoinPacket,
+    CompanyInfoPacket, CompanyUpdatePacket, CompanyNewPacket, CompanyRemovePacket, CompanyEconomyPacket,
+    NewGamePacket, WelcomePacket,
+})
+
+class StateHistory:
+    """Event log of a GameState, to look up the client and company tables at a past game date.
+
+    The packets that change the tables are kept as events, tagged with the game date they arrived at. Every
+    snapshot_interval events the tables are saved as a compact snapshot. state_at loads the last snapshot before
+    a date and replays the events up to it, so only one full copy per interval is kept.
+    Game dates are expected to only go forward, a history covers one game.
+    Add history.listener(admin.state) as protocol listener.
+
+    - snapshot_interval (int): The number of events between snapshots. Default is 1000.
+    - max_events (int | None): The number of events to keep, older events and their snapshots are dropped a snapshot interval at a time.
+        Default is None, which keeps everything.
+    """
+    def __init__(self, snapshot_interval: int = 1000, max_events: int | None = None):
+        if max_events is not None and max_events < snapshot_interval:
+            raise ValueError("max_events must be at least snapshot_interval.")
+        self.snapshot_interval = snapshot_interval
+        self.max_events = max_events
+        self.date: int | None = None
+
+        # events and their dates, the event at position 0 has number _base
+        self._events: list[Packet] = []
+        self._dates: list[int] = []
+        self._base = 0
+        # snapshots as (number of the first event after it, date, JSON of GameState.to_dict)
+        self._snapshots: list[tuple[int, int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def _date_key(self) -> int:
+        # events before the first DatePacket sort before every date
+        return -1 if self.date is None else self.date
+
+    def snapshot(self, state: GameState) -> None:
+        """Save the tables of a state as they are after the recorded events.
+
+        - state (GameState): The state the events are applied to.
+        """
+        self._snapshots.append((self._base + len(self._events), self._date_key(), jsoncodec.dumps(state.to_dict())))
+
+    def record(self, packet: Packet, state: GameState) -> None:
+        """Record a packet, after it was applied to the state.
+
+        - packet (Packet): The packet.
+        - state (GameState): The state the packet was applied to.
+        """
+        cls = type(packet)
+        if cls is DatePacket:
+            self.date = packet.date
+            return
+        if cls not in _EVENT_PACKETS:
+            return
+
+        # the state never changes the packets it keeps, so the event is the packet as received
+        self._events.append(packet)
+        self._dates.append(self._date_key())
+
+        if not self._snapshots or self._base + len(self._events) - self._snapshots[-1][0] >= self.snapshot_interval:
+            self.snapshot(state)
+            self._trim()
+
+    def _trim(self):
+        if self.max_events is None or len(self._events) <= self.max_events or len(self._snapshots) < 2:
+            return
+
+        # drop whole intervals, so the oldest kept event still has a snapshot to replay from
+        keep = 1
+        while len(self._snapshots) - keep > 1 and self._base + len(self._events) - self._snapshots[keep][0] > self.max_events:
+            keep += 1
+        drop = self._snapshots[keep][0] - self._base
+        del self._events[:drop]
+        del self._dates[:drop]
+        del self._snapshots[:keep]
+        self._base += drop
+
+    def listener(self, state: GameState):
+        """A protocol listener that records the packets applied to state.
+
+        It must run after state.apply, which AdminProtocol calls first.
+
+        - state (GameState): The state to record, admin.state.
+        """
+        # the tables from before the first event
+        self.snapshot(state)
+        def record(packet: Packet):
+            self.record(packet, state)
+        return record
+
+    def state_at(self, date: int) -> GameState | None:
+        """The client and company tables at the end of a game date.
+
+        - date (int): The game date, see DatePacket.date.
+
+        Returns:
+        - GameState | None: A new state with the tables at that date, None if the date is before the first kept snapshot.
+        """
+        snapshots = self._snapshots
+        # the last snapshot taken at or before the date
+        index = bisect.bisect_right(snapshots, date, key = lambda snapshot: snapshot[1]) - 1
+        if index < 0:
+            return None
+        start, _, data = snapshots[index]
+
+        state = GameState()
+        state.from_dict(jsoncodec.loads(data))
+        state.provisional = False
+        end = bisect.bisect_right(self._dates, date)
+        for packet in self._events[start - self._base:end]:
+            state.apply(packet)
+        state.date = date
+        return state
+
+    def events(self, date_from: int | None = None, date_to: int | None = None) -> list[tuple[int, Packet]]:
+        """The recorded events between two game dates.
+
+        - date_from (int | None): The first date. Default is None, which starts at the oldest kept event.
+        - date_to (int | None): The last date. Default is None, which ends at the newest event.
+
+        Returns:
+        - list[tuple[int, Packet]]: The dates and packets, oldest first. The date is -1 for events before the first DatePacket.
+        """
+        lo = 0 if date_from is None else bisect.bisect_left(self._dates, date_from)
+        hi = len(self._dates) if date_to is None else bisect.bisect_right(self._dates, date_to)
+        return list(zip(self._dates[lo:hi], self._events[lo:hi]))
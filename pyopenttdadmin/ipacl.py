@@ -0,0 +1,229 @@
+import ipaddress
+import os
+
+from enum import Enum
+from typing import Callable, Iterable
+
+from .packet import *
+from .protocol import AdminProtocol
+
+class AccessAction(Enum):
+    """What to do with a client whose address is in an IPAccessList."""
+    ALLOW = "allow" # overrides a kick or ban of a wider range
+    KICK = "kick"
+    BAN = "ban"
+
+_Address = ipaddress.IPv4Address | ipaddress.IPv6Address
+_Network = ipaddress.IPv4Network | ipaddress.IPv6Network
+
+class _Node:
+    """A node of a _Trie, standing for the first length bits of an address, key holds those bits."""
+    __slots__ = ("key", "length", "children", "action")
+
+    def __init__(self, key: int, length: int, action: AccessAction | None = None):
+        self.key = key
+        self.length = length
+        self.children: list["_Node | None"] = [None, None]
+        self.action = action
+
+class _Trie:
+    """Radix trie over the bits of addresses of one IP version.
+
+    Paths without branches are compressed into a single edge: every node either holds an entry or branches,
+    so the trie has fewer than two nodes per entry, whatever the prefix lengths are.
+    """
+    def __init__(self, bits: int):
+        self.bits = bits
+        self.root = _Node(0, 0)
+        self.size = 0
+
+    def insert(self, value: int, length: int, action: AccessAction):
+        key = value >> (self.bits - length)
+        node = self.root
+        while node.length < length:
+            bit = (key >> (length - node.length - 1)) & 1
+            child = node.children[bit]
+            if child is None:
+                node.children[bit] = _Node(key, length, action)
+                self.size += 1
+                return
+
+            # the first bits the child and the new entry both have
+            common = min(child.length, length)
+            a = child.key >> (child.length - common)
+            b = key >> (length - common)
+            if a == b:
+                if child.length <= length:
+                    node = child
+                    continue
+                # the new entry is on the edge to the child
+                new = node.children[bit] = _Node(key, length, action)
+                new.children[(child.key >> (child.length - length - 1)) & 1] = child
+                self.size += 1
+                return
+
+            # the edge to the child is split where the child and the new entry part ways
+            differ = (a ^ b).bit_length()
+            branch = node.children[bit] = _Node(a >> differ, common - differ)
+            branch.children[(a >> (differ - 1)) & 1] = child
+            branch.children[(b >> (differ - 1)) & 1] = _Node(key, length, action)
+            self.size += 1
+            return
+
+        if node.action is None:
+            self.size += 1
+        node.action = action
+
+    def delete(self, value: int, length: int) -> bool:
+        key = value >> (self.bits - length)
+        path = [self.root]
+        while path[-1].length < length:
+            node = path[-1]
+            child = node.children[(key >> (length - node.length - 1)) & 1]
+            if child is None or child.length > length or key >> (length - child.length) != child.key:
+                return False
+            path.append(child)
+        if path[-1].action is None:
+            return False
+
+        path[-1].action = None
+        self.size -= 1
+        # drop the nodes that no longer hold an entry or branch, the root stays
+        while len(path) > 1:
+            node = path.pop()
+            if node.action is not None:
+                break
+            children = [child for child in node.children if child is not None]
+            if len(children) == 2:
+                break
+            parent = path[-1]
+            parent.children[parent.children[1] is node] = children[0] if children else None
+        return True
+
+    def longest_match(self, value: int) -> AccessAction | None:
+        bits = self.bits
+        node = self.root
+        found = node.action
+        while node.length < bits:
+            node = node.children[(value >> (bits - node.length - 1)) & 1]
+            if node is None or value >> (bits - node.length) != node.key:
+                break
+            if node.action is not None:
+                found = node.action
+        return found
+
+class IPAccessList:
+    """Ban and allow lists of IPv4 and IPv6 addresses and CIDR ranges, in a radix trie per IP version.
+
+    A lookup follows one edge per entry or branch on the way to the address, so it costs at most 32 or 128 steps
+    however many entries there are, and usually far fewer.
+    The most specific entry containing an address decides, so an allowed address inside a banned range is let in.
+
+    - reason (str): The reason given with kicks and bans. Default is "Your address is banned from this server".
+    """
+    def __init__(self, reason: str = "Your address is banned from this server"):
+        self.reason = reason
+        self._tries = {4: _Trie(32), 6: _Trie(128)}
+
+    def __len__(self) -> int:
+        return self._tries[4].size + self._tries[6].size
+
+    @staticmethod
+    def _network(network: str | _Network) -> _Network:
+        network = ipaddress.ip_network(network, strict = False)
+        if isinstance(network, ipaddress.IPv6Network) and network.network_address.ipv4_mapped is not None and network.prefixlen >= 96:
+            # ::ffff:a.b.c.d is how dual stack servers report IPv4 clients
+            network = ipaddress.IPv4Network((network.network_address.ipv4_mapped, network.prefixlen - 96))
+        return network
+
+    def add(self, network: str | _Network, action: AccessAction = AccessAction.BAN) -> None:
+        """Add an address or range, replacing the action of the same range if it is already listed.
+
+        - network (str | IPv4Network | IPv6Network): The address or CIDR range, for example "203.0.113.0/24". Host bits are ignored.
+        - action (AccessAction): What to do with clients in the range. Default is AccessAction.BAN.
+        """
+        network = self._network(network)
+        self._tries[network.version].insert(int(network.network_address), network.prefixlen, action)
+
+    def remove(self, network: str | _Network) -> bool:
+        """Remove an address or range.
+
+        - network (str | IPv4Network | IPv6Network): The address or CIDR range, as it was added.
+
+        Returns:
+        - bool: Whether the range was listed.
+        """
+        network = self._network(network)
+        return self._tries[network.version].delete(int(network.network_address), network.prefixlen)
+
+    def update(self, networks: Iterable[str | _Network], action: AccessAction = AccessAction.BAN) -> None:
+        """Add many addresses or ranges with the same action.
+
+        - networks (Iterable[str | IPv4Network | IPv6Network]): The addresses or CIDR ranges.
+        - action (AccessAction): What to do with clients in the ranges. Default is AccessAction.BAN.
+        """
+        for network in networks:
+            self.add(network, action)
+
+    def load(self, path: str | os.PathLike, action: AccessAction = AccessAction.BAN) -> int:
+        """Add the entries of a file, one address or range per line.
+
+        A line may name its own action after the range, for example "10.0.0.0/8 allow". Empty lines and text after # are ignored.
+
+        - path (str | os.PathLike): The file.
+        - action (AccessAction): The action of lines without one. Default is AccessAction.BAN.
+
+        Returns:
+        - int: The number of entries read.
+        """
+        count = 0
+        with open(path, encoding = 'utf-8') as file:
+            for number, line in enumerate(file, 1):
+                fields = line.partition("#")[0].split()
+                if not fields:
+                    continue
+                try:
+                    self.add(fields[0], AccessAction(fields[1].lower()) if len(fields) > 1 else action)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{number}: {e}") from None
+                count += 1
+        return count
+
+    def lookup(self, ip: str | _Address) -> AccessAction | None:
+        """The action of the most specific entry containing an address.
+
+        - ip (str | IPv4Address | IPv6Address): The address.
+
+        Returns:
+        - AccessAction | None: The action, None if the address is not listed or not a valid address.
+        """
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        return self._tries[address.version].longest_match(int(address))
+
+    def listener(self, protocol: AdminProtocol, on_action: Callable[[ClientInfoPacket, AccessAction], None] | None = None):
+        """A protocol listener that kicks or bans listed clients as soon as their ClientInfoPacket is framed.
+
+        The rcon command is queued on protocol, so it goes out with the data sent after the packet is received.
+        ClientInfoPackets are sent for joining clients with a subscription to AdminUpdateType.CLIENT_INFO, admin.set_ip_acl subscribes and installs the listener.
+
+        - protocol (AdminProtocol): The protocol of the admin, admin.protocol.
+        - on_action (Callable[[ClientInfoPacket, AccessAction], None] | None): Called after a client was kicked or banned. Default is None.
+        """
+        def enforce(packet: Packet):
+            if type(packet) is not ClientInfoPacket:
+                return
+
+            action = self.lookup(packet.ip)
+            if action is None or action is AccessAction.ALLOW:
+                return
+            # quotes would end the reason argument early
+            reason = self.reason.replace('"', "'")
+            protocol.rcon(f'{action.value} {packet.id} "{reason}"')
+            if on_action is not None:
+                on_action(packet, action)
+        return enforce
@@ -0,0 +1,42 @@
+import json
+
+from typing import Any
+
+# the orjson module, None if it is not installed, False until looked up
+_orjson: Any = False
+
+def _backend():
+    global _orjson
+    if _orjson is False:
+        try:
+            import orjson
+        except ImportError:
+            orjson = None
+        _orjson = orjson
+    return _orjson
+
+def loads(data: str | bytes) -> Any:
+    """Parse JSON, with orjson if it is installed.
+
+    - data (str | bytes): The JSON text.
+
+    Returns:
+    - Any: The parsed value.
+    """
+    orjson = _backend()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(value: Any) -> str:
+    """Serialise a value to compact JSON, with orjson if it is installed.
+
+    - value (Any): The value to serialise.
+
+    Returns:
+    - str: The JSON text.
+    """
+    orjson = _backend()
+    if orjson is not None:
+        return orjson.dumps(value).decode('utf-8')
+    return json.dumps(value, separators = (",", ":"), ensure_ascii = False)
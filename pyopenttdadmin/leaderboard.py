@@ -0,0 +1,170 @@
+import bisect
+
+from typing import Callable, Iterable
+
+from .packet import *
+
+# SortedList, or _BisectList without sortedcontainers, None until the first leaderboard is made
+_SortedList: type | None = None
+
+# the value each leaderboard ranks companies by
+LEADERBOARD_METRICS: dict[str, Callable[[CompanyEconomyPacket], int]] = {
+    "money": lambda economy: economy.money,
+    "income": lambda economy: economy.income,
+    "delivered_cargo": lambda economy: economy.delivered_cargo,
+    # value and performance of the last finished quarter
+    "company_value": lambda economy: economy.quarterly_info[0][0],
+    "performance": lambda economy: economy.quarterly_info[0][1],
+}
+
+class _BisectList:
+    """The part of SortedList a Leaderboard uses, on a plain list, for when sortedcontainers is not installed."""
+    def __init__(self):
+        self._items: list = []
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def add(self, item):
+        bisect.insort(self._items, item)
+
+    def remove(self, item):
+        del self._items[bisect.bisect_left(self._items, item)]
+
+    def bisect_left(self, item) -> int:
+        return bisect.bisect_left(self._items, item)
+
+    def clear(self):
+        self._items.clear()
+
+def _sorted_list():
+    global _SortedList
+    if _SortedList is None:
+        try:
+            from sortedcontainers import SortedList
+        except ImportError:
+            SortedList = _BisectList
+        _SortedList = SortedList
+    return _SortedList()
+
+class Leaderboard:
+    """Companies sorted by a value, highest first, kept sorted as values change.
+
+    Updates are O(log n) with sortedcontainers installed, and a bisection plus a short memory move without it.
+    Companies with the same value are ordered by id.
+    """
+    def __init__(self):
+        self._sorted = _sorted_list()
+        # company id -> its entry in _sorted, (-value, id)
+        self._entries: dict[int, tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, id: int) -> bool:
+        return id in self._entries
+
+    def update(self, id: int, value: int) -> None:
+        """Set the value of a company.
+
+        - id (int): The company id.
+        - value (int): The value.
+        """
+        entry = (-value, id)
+        old = self._entries.get(id)
+        if old == entry:
+            return
+        if old is not None:
+            self._sorted.remove(old)
+        self._sorted.add(entry)
+        self._entries[id] = entry
+
+    def remove(self, id: int) -> None:
+        """Remove a company, if it is on the leaderboard.
+
+        - id (int): The company id.
+        """
+        entry = self._entries.pop(id, None)
+        if entry is not None:
+            self._sorted.remove(entry)
+
+    def clear(self) -> None:
+        """Remove all companies."""
+        self._sorted.clear()
+        self._entries.clear()
+
+    def value(self, id: int) -> int | None:
+        """The value of a company, None if it is not on the leaderboard.
+
+        - id (int): The company id.
+        """
+        entry = self._entries.get(id)
+        return None if entry is None else -entry[0]
+
+    def rank(self, id: int) -> int | None:
+        """The position of a company, 1 for the highest value, None if it is not on the leaderboard.
+
+        - id (int): The company id.
+        """
+        entry = self._entries.get(id)
+        if entry is None:
+            return None
+        return self._sorted.bisect_left(entry) + 1
+
+    def top(self, n: int) -> list[tuple[int, int]]:
+        """The companies with the highest values.
+
+        - n (int): The number of companies.
+
+        Returns:
+        - list[tuple[int, int]]: The company ids and values, highest first.
+        """
+        return [(id, -value) for value, id in self._sorted[:n]]
+
+class Leaderboards:
+    """A Leaderboard per metric, updated from CompanyEconomyPackets.
+
+    GameState keeps one in state.leaderboards, for example state.leaderboards["money"].top(10).
+
+    - metrics (dict[str, Callable[[CompanyEconomyPacket], int]] | None): The leaderboards, by name, with the value they rank by.
+        Default is None, which uses LEADERBOARD_METRICS.
+    """
+    def __init__(self, metrics: dict[str, Callable[[CompanyEconomyPacket], int]] | None = None):
+        self.metrics = dict(LEADERBOARD_METRICS if metrics is None else metrics)
+        self.boards: dict[str, Leaderboard] = {name: Leaderboard() for name in self.metrics}
+
+    def __getitem__(self, name: str) -> Leaderboard:
+        return self.boards[name]
+
+    def update(self, economy: CompanyEconomyPacket) -> None:
+        """Update the values of a company on every leaderboard.
+
+        - economy (CompanyEconomyPacket): The economy of the company.
+        """
+        for name, metric in self.metrics.items():
+            self.boards[name].update(economy.id, metric(economy))
+
+    def remove(self, id: int) -> None:
+        """Remove a company from every leaderboard.
+
+        - id (int): The company id.
+        """
+        for board in self.boards.values():
+            board.remove(id)
+
+    def clear(self) -> None:
+        """Remove all companies from every leaderboard."""
+        for board in self.boards.values():
+            board.clear()
+
+    def rebuild(self, economies: Iterable[CompanyEconomyPacket]) -> None:
+        """Replace the leaderboards with the values of a set of economies.
+
+        - economies (Iterable[CompanyEconomyPacket]): The economies.
+        """
+        self.clear()
+        for economy in economies:
+            self.update(economy)
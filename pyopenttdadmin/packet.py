@@ -1,11 +1,19 @@
 from .enums import *
 
-from typing_extensions import Self
+from typing import Any
+
+try:
+    from typing import Self
+except ImportError:
+    # Python 3.10
+    from typing_extensions import Self
 
 # reference: https://github.com/OpenTTD/OpenTTD/blob/master/src/network/core/tcp_admin.h
 
 class Packet:
     packet_type = PacketType.INVALID_ADMIN_PACKET
+    synthetic = False # True for packets made up by the admin instead of received from the server
+    fields: tuple[str, ...] = () # the public attributes of a packet, which handlers can filter on
     def __init__(self, data: bytes):
         self.data = data
     
@@ -17,8 +25,11 @@ class Packet:
 
     @staticmethod
     def create_packet(data: bytes):
-        type = PacketType(data[0])
-        return packet_dict[type].from_bytes(data)
+        cls = packet_id_dict.get(data[0])
+        if cls is None:
+            # raises for unknown packet types
+            cls = packet_dict[PacketType(data[0])]
+        return cls.from_bytes(data)
     
     @staticmethod
     def from_bytes(data: bytes) -> Self:
@@ -26,6 +37,7 @@ class Packet:
 
 class ErrorPacket(Packet):
     packet_type = PacketType.SERVER_ERROR
+    fields = ("error",)
     def __init__(self, error: NetWorkErrorCodes):
         self.error = error
     
@@ -39,6 +51,7 @@ class ErrorPacket(Packet):
         
 class AdminJoinPacket(Packet):
     packet_type = PacketType.ADMIN_JOIN
+    fields = ("password", "string", "version")
     def __init__(self, password: str, string: str, version: str):
         self.password = password
         self.string = string
@@ -60,6 +73,7 @@ class AdminJoinPacket(Packet):
 
 class ProtocolPacket(Packet):
     packet_type = PacketType.SERVER_PROTOCOL
+    fields = ("version", "subscriptions")
     def __init__(self, version: int, subscriptions: dict[AdminUpdateType, AdminUpdateFrequency | None]):
         self.version = version
         self.subscriptions = subscriptions
@@ -92,6 +106,7 @@ class ProtocolPacket(Packet):
 
 class WelcomePacket(Packet):
     packet_type = PacketType.SERVER_WELCOME
+    fields = ("server_name", "version", "dedicated", "map_name", "seed", "landscape", "startdate", "mapheight", "mapwidth")
     def __init__(self, server_name: str, version: str, dedicated: bool, map_name: str, seed: int, landscape: int, startdate: int, mapheight: int, mapwidth: int):
         self.server_name = server_name
         self.version = version
@@ -140,6 +155,7 @@ class WelcomePacket(Packet):
 
 class NewGamePacket(Packet):
     packet_type = PacketType.SERVER_NEWGAME
+    fields = ()
     def __init__(self, data: bytes):
         pass
     
@@ -152,6 +168,7 @@ class NewGamePacket(Packet):
 
 class ShutdownPacket(Packet):
     packet_type = PacketType.SERVER_SHUTDOWN
+    fields = ()
     def __init__(self, data: bytes):
         pass
     
@@ -164,6 +181,7 @@ class ShutdownPacket(Packet):
 
 class DatePacket(Packet):
     packet_type = PacketType.SERVER_DATE
+    fields = ("date",)
     def __init__(self, date: int):
         self.date = date
     
@@ -177,6 +195,7 @@ class DatePacket(Packet):
 
 class ClientJoinPacket(Packet):
     packet_type = PacketType.SERVER_CLIENT_JOIN
+    fields = ("id",)
     def __init__(self, id: int):
         self.id = id
     
@@ -190,6 +209,7 @@ class ClientJoinPacket(Packet):
 
 class ClientInfoPacket(Packet):
     packet_type = PacketType.SERVER_CLIENT_INFO
+    fields = ("id", "ip", "name", "lang", "joined", "company_id")
     def __init__(self, id: int, ip: str, name: str, lang: int, joined: int, company_id: int):
         self.id = id
         self.ip = ip
@@ -215,6 +235,7 @@ class ClientInfoPacket(Packet):
     
 class ClientUpdatePacket(Packet):
     packet_type = PacketType.SERVER_CLIENT_UPDATE
+    fields = ("id", "name", "company_id")
     def __init__(self, id: int, name: str, company_id: int):
         self.id = id
         self.name = name
@@ -233,6 +254,7 @@ class ClientUpdatePacket(Packet):
 
 class ClientQuitPacket(Packet):
     packet_type = PacketType.SERVER_CLIENT_QUIT
+    fields = ("id",)
     def __init__(self, id: int):
         self.id = id
     
@@ -246,6 +268,7 @@ class ClientQuitPacket(Packet):
 
 class ClientErrorPacket(Packet):
     packet_type = PacketType.SERVER_CLIENT_ERROR
+    fields = ("id", "error")
     def __init__(self, id: int, error: NetWorkErrorCodes):
         self.id = id
         self.error = error
@@ -261,6 +284,7 @@ class ClientErrorPacket(Packet):
 
 class CompanyNewPacket(Packet):
     packet_type = PacketType.SERVER_COMPANY_NEW
+    fields = ("id",)
     def __init__(self, id: int):
         self.id = id
     
@@ -274,6 +298,7 @@ class CompanyNewPacket(Packet):
 
 class CompanyInfoPacket(Packet):
     packet_type = PacketType.SERVER_COMPANY_INFO
+    fields = ("id", "name", "manager_name", "color", "passworded", "year", "is_ai", "quarters_to_bankruptcy")
     def __init__(self, id: int, name: str, manager_name: str, color: Color, passworded: bool, year: int, is_ai: bool, quarters_to_bankruptcy: int):
         self.id = id
         self.name = name
@@ -303,6 +328,7 @@ class CompanyInfoPacket(Packet):
 
 class CompanyUpdatePacket(Packet):
     packet_type = PacketType.SERVER_COMPANY_UPDATE
+    fields = ("id", "name", "manager_name", "color", "passworded", "quarters_to_bankruptcy")
     def __init__(self, id: int, name: str, manager_name: str, color: Color, passworded: bool, quarters_to_bankruptcy: int):
         self.id = id
         self.name = name
@@ -316,7 +342,6 @@ class CompanyUpdatePacket(Packet):
 
     @staticmethod
     def from_bytes(data: bytes) -> Self:
-        print(data)
         id = data[1]
         name, _, data = data[2:].partition(b'\x00')
         manager_name, _, data = data.partition(b'\x00')
@@ -324,7 +349,6 @@ class CompanyUpdatePacket(Packet):
         name = name.decode('utf-8')
         manager_name = manager_name.decode('utf-8')
         
-        print(data)
         color = Color(data[0])
         passworded = bool(data[1])
         quarters_to_bankruptcy = data[2]
@@ -334,6 +358,7 @@ class CompanyUpdatePacket(Packet):
 
 class CompanyRemovePacket(Packet):
     packet_type = PacketType.SERVER_COMPANY_REMOVE
+    fields = ("id", "admin_remove_reason")
     def __init__(self, id: int, admin_remove_reason: AdminCompanyRemoveReason):
         self.id = id
         self.admin_remove_reason = admin_remove_reason
@@ -349,36 +374,41 @@ class CompanyRemovePacket(Packet):
 
 class CompanyEconomyPacket(Packet):
     packet_type = PacketType.SERVER_COMPANY_ECONOMY
-    def __init__(self, id: int, money: int, current_loan: int, delivered_cargo: int, quarterly_info: list[tuple[int, int, int]]):
+    fields = ("id", "money", "current_loan", "income", "delivered_cargo", "quarterly_info")
+    def __init__(self, id: int, money: int, current_loan: int, income: int, delivered_cargo: int, quarterly_info: list[tuple[int, int, int]]):
         self.id = id
         self.money = money
         self.current_loan = current_loan
+        self.income = income
         self.delivered_cargo = delivered_cargo
         self.quarterly_info = quarterly_info
     
     def __repr__(self) -> str:
-        return f"CompanyEconomyPacket({self.id}, {self.money}, {self.current_loan}, {self.delivered_cargo})"
+        return f"CompanyEconomyPacket({self.id}, {self.money}, {self.current_loan}, {self.income}, {self.delivered_cargo})"
     
     @staticmethod
     def from_bytes(data: bytes) -> Self:
         id = data[1]
-        money = int.from_bytes(data[2:10], 'little')
+        money = int.from_bytes(data[2:10], 'little', signed = True)
         current_loan = int.from_bytes(data[10:18], 'little')
-        delivered_cargo = int.from_bytes(data[18:20], 'little')
-        data = data[20:]
+        income = int.from_bytes(data[18:26], 'little', signed = True)
+        delivered_cargo = int.from_bytes(data[26:28], 'little')
+        data = data[28:]
         quarterly_info = []
         
+        # the last two quarters: company value, performance and delivered cargo
         for i in range(2):
-            company_value = int.from_bytes(data[:8], 'little')
+            company_value = int.from_bytes(data[:8], 'little', signed = True)
             company_performance_history = int.from_bytes(data[8:10], 'little')
-            delivered_cargo = int.from_bytes(data[10:12], 'little')
-            quarterly_info.append((company_value, company_performance_history, delivered_cargo))
+            quarter_cargo = int.from_bytes(data[10:12], 'little')
+            quarterly_info.append((company_value, company_performance_history, quarter_cargo))
             data = data[12:]
         
-        return CompanyEconomyPacket(id, money, current_loan, delivered_cargo, quarterly_info)
+        return CompanyEconomyPacket(id, money, current_loan, income, delivered_cargo, quarterly_info)
 
 class CompanyStatsPacket(Packet):
     packet_type = PacketType.SERVER_COMPANY_STATS
+    fields = ("id", "num_vehicles")
     def __init__(self, id: int, num_vehicles: dict[NetworkVehicleType, int]):
         self.id = id
         self.num_vehicles = num_vehicles
@@ -398,6 +428,7 @@ class CompanyStatsPacket(Packet):
 
 class ChatPacket(Packet):
     packet_type = PacketType.SERVER_CHAT
+    fields = ("action", "desttype", "id", "message", "money")
     def __init__(self, action: Actions, desttype: ChatDestTypes, id: int, message: str, money: int):
         self.action = action
         self.desttype = desttype
@@ -421,6 +452,7 @@ class ChatPacket(Packet):
 
 class RconEndPacket(Packet):
     packet_type = PacketType.SERVER_RCON_END
+    fields = ("command",)
     def __init__(self, command: str):
         self.command = command
     
@@ -434,6 +466,7 @@ class RconEndPacket(Packet):
    
 class RconPacket(Packet):
     packet_type = PacketType.SERVER_RCON
+    fields = ("color", "response")
     def __init__(self, color: bytes, response: str):
         self.color = color
         self.response = response
@@ -449,6 +482,7 @@ class RconPacket(Packet):
 
 class ConsolePacket(Packet):
     packet_type = PacketType.SERVER_CONSOLE
+    fields = ("origin", "message")
     def __init__(self, origin: str, message: str):
         self.origin = origin
         self.message = message
@@ -465,20 +499,33 @@ class ConsolePacket(Packet):
 
 class GameScriptPacket(Packet):
     packet_type = PacketType.SERVER_GAMESCRIPT
+    fields = ("json", "data")
     def __init__(self, json: str):
         self.json = json
+        self._data = None
+        self._parsed = False
     
     def __repr__(self) -> str:
         return f"GameScriptPacket({self.json})"
     
+    @property
+    def data(self) -> Any:
+        """The JSON message parsed, only parsed on first access. Raises ValueError if it is not valid JSON."""
+        if not self._parsed:
+            from . import jsoncodec
+            self._data = jsoncodec.loads(self.json)
+            self._parsed = True
+        return self._data
+    
     @staticmethod
     def from_bytes(data: bytes) -> Self:
-        json = data[1:].decode('utf-8')
-        return GameScriptPacket(json)
+        json, *_ = data[1:].partition(b'\x00')
+        return GameScriptPacket(json.decode('utf-8'))
 
 class CmdNamesPacket(Packet):
     packet_type = PacketType.SERVER_CMD_NAMES
-    def __init__(self, names: list[str]):
+    fields = ("names",)
+    def __init__(self, names: dict[int, str]):
         self.names = names
     
     def __repr__(self) -> str:
@@ -486,41 +533,74 @@ class CmdNamesPacket(Packet):
     
     @staticmethod
     def from_bytes(data: bytes) -> Self:
-        names = []
-        while b'\x00' in data:
-            name, _, data = data.partition(b'\x00')
-            names.append(name.decode('utf-8'))
-        
-        if data[:-1]:
-            names.append(data[:-1].decode('utf-8'))
+        # records of (bool more, uint16 id, string name), ended by a false bool
+        names = {}
+        offset = 1
+        while offset < len(data) and data[offset]:
+            id = data[offset + 1] | data[offset + 2] << 8
+            end = data.index(b'\x00', offset + 3)
+            names[id] = data[offset + 3: end].decode('utf-8')
+            offset = end + 1
 
         return CmdNamesPacket(names)
 
 class CmdLoggingPacket(Packet):
     packet_type = PacketType.SERVER_CMD_LOGGING
+    fields = ("client_id", "company_id", "cmd", "data", "frame", "name", "args")
+    name: str | None = None # the command name, set by the admin once the command names are known
     def __init__(self, client_id: int, company_id: int, cmd: int, data: bytes, frame: int):
         self.client_id = client_id
         self.company_id = company_id
         self.cmd = cmd
         self.data = data
         self.frame = frame
+        self._args = None
     
     def __repr__(self) -> str:
         return f"CmdLoggingPacket({self.client_id}, {self.company_id}, {self.cmd}, {self.data}, {self.frame})"
     
+    @property
+    def args(self) -> dict[str, Any] | None:
+        """The arguments of the command decoded from data, or None if there is no schema for the command.
+
+        The payload is only decoded on first access. Raises ValueError if the payload doesn't match the schema.
+        """
+        if self._args is None:
+            from .cmdschemas import COMMAND_SCHEMAS
+            schema = COMMAND_SCHEMAS.get(self.name)
+            if schema is None:
+                return None
+            self._args = schema.decode(self.data)
+        return self._args
+    
     @staticmethod
     def from_bytes(data: bytes) -> Self:
         client_id = int.from_bytes(data[1:5], 'little')
         company_id = data[5]
         cmd = int.from_bytes(data[6:8], 'little')
         buffer_length = int.from_bytes(data[8:10], 'little')
-        data = data[10: 10 + buffer_length]
         frame = int.from_bytes(data[10 + buffer_length: 14 + buffer_length], 'little')
+        data = data[10: 10 + buffer_length]
 
         return CmdLoggingPacket(client_id, company_id, cmd, data, frame)
 
+class PongPacket(Packet):
+    packet_type = PacketType.SERVER_PONG
+    fields = ("d1",)
+    def __init__(self, d1: int):
+        self.d1 = d1
+    
+    def __repr__(self) -> str:
+        return f"PongPacket({self.d1})"
+    
+    @staticmethod
+    def from_bytes(data: bytes) -> Self:
+        d1 = int.from_bytes(data[1:5], 'little')
+        return PongPacket(d1)
+
 class AdminRconPacket(Packet):
     packet_type = PacketType.ADMIN_RCON
+    fields = ("command",)
     def __init__(self, command: str):
         self.command = command
     
@@ -535,8 +615,26 @@ class AdminRconPacket(Packet):
         command, *_ = data[1:].partition(b'\x00')
         return AdminRconPacket(command.decode('utf-8'))
 
+class AdminGameScriptPacket(Packet):
+    packet_type = PacketType.ADMIN_GAMESCRIPT
+    fields = ("json",)
+    def __init__(self, json: str):
+        self.json = json
+    
+    def __repr__(self) -> str:
+        return f"AdminGameScriptPacket({self.json})"
+    
+    def to_bytes(self) -> bytes:
+        return f"{self.json}\x00".encode('utf-8')
+    
+    @staticmethod
+    def from_bytes(data: bytes) -> Self:
+        json, *_ = data[1:].partition(b'\x00')
+        return AdminGameScriptPacket(json.decode('utf-8'))
+
 class AdminChatPacket(Packet):
     packet_type = PacketType.ADMIN_CHAT
+    fields = ("message", "action", "desttype", "id")
     def __init__(self, message: str, action: Actions = Actions.CHAT, desttype: ChatDestTypes = ChatDestTypes.BROADCAST, id: int = 0):
         self.message = message
         self.action = action
@@ -564,6 +662,7 @@ class AdminChatPacket(Packet):
 
 class AdminSubscribePacket(Packet):
     packet_type = PacketType.FREQUENCY
+    fields = ("type", "frequency")
     def __init__(self, type: AdminUpdateType, frequency: AdminUpdateFrequency):
         self.type = type
         self.frequency = frequency
@@ -580,6 +679,42 @@ class AdminSubscribePacket(Packet):
         frequency = AdminUpdateFrequency(int.from_bytes(data[3:5], 'little'))
         return AdminSubscribePacket(type, frequency)
 
+class AdminPollPacket(Packet):
+    packet_type = PacketType.ADMIN_POLL
+    fields = ("type", "d1")
+    def __init__(self, type: AdminUpdateType, d1: int = 0xFFFFFFFF):
+        self.type = type
+        self.d1 = d1
+    
+    def __repr__(self) -> str:
+        return f"AdminPollPacket({self.type}, {self.d1})"
+    
+    def to_bytes(self) -> bytes:
+        return self.type.value.to_bytes(1, 'little') + self.d1.to_bytes(4, 'little')
+    
+    @staticmethod
+    def from_bytes(data: bytes) -> Self:
+        type = AdminUpdateType(data[1])
+        d1 = int.from_bytes(data[2:6], 'little')
+        return AdminPollPacket(type, d1)
+
+class AdminPingPacket(Packet):
+    packet_type = PacketType.ADMIN_PING
+    fields = ("d1",)
+    def __init__(self, d1: int):
+        self.d1 = d1
+    
+    def __repr__(self) -> str:
+        return f"AdminPingPacket({self.d1})"
+    
+    def to_bytes(self) -> bytes:
+        return self.d1.to_bytes(4, 'little')
+    
+    @staticmethod
+    def from_bytes(data: bytes) -> Self:
+        d1 = int.from_bytes(data[1:5], 'little')
+        return AdminPingPacket(d1)
+
 
 packet_dict: dict[PacketType, Packet] = {
     PacketType.SERVER_ERROR: ErrorPacket,
@@ -607,7 +742,14 @@ packet_dict: dict[PacketType, Packet] = {
     PacketType.SERVER_GAMESCRIPT: GameScriptPacket,
     PacketType.SERVER_CMD_NAMES: CmdNamesPacket,
     PacketType.SERVER_CMD_LOGGING: CmdLoggingPacket,
+    PacketType.SERVER_PONG: PongPacket,
     PacketType.ADMIN_RCON: AdminRconPacket,
+    PacketType.ADMIN_GAMESCRIPT: AdminGameScriptPacket,
     PacketType.ADMIN_CHAT: AdminChatPacket,
-    PacketType.FREQUENCY: AdminSubscribePacket
+    PacketType.FREQUENCY: AdminSubscribePacket,
+    PacketType.ADMIN_POLL: AdminPollPacket,
+    PacketType.ADMIN_PING: AdminPingPacket,
 }
+
+# packet_dict keyed by the raw type byte, saves the PacketType lookup for every received packet
+packet_id_dict: dict[int, Packet] = {packet_type.value: cls for packet_type, cls in packet_dict.items()}
@@ -0,0 +1,165 @@
+import collections
+
+from enum import Enum
+
+from .packet import *
+
+class OverflowPolicy(Enum):
+    """What a full PacketQueue does with a new packet of a given type."""
+    KEEP = 0x00          # The packet is never dropped, reading pauses until there is room.
+    DROP_OLDEST = 0x01   # The oldest queued DROP_OLDEST packet is dropped to make room, the newest of each type is kept.
+    LATEST_PER_ID = 0x02 # A queued packet of the same type and id is replaced by the new one.
+
+DEFAULT_OVERFLOW_POLICIES: dict[type[Packet], OverflowPolicy] = {
+    ConsolePacket: OverflowPolicy.DROP_OLDEST,
+    DatePacket: OverflowPolicy.DROP_OLDEST,
+    ClientUpdatePacket: OverflowPolicy.LATEST_PER_ID,
+    CompanyUpdatePacket: OverflowPolicy.LATEST_PER_ID,
+    CompanyEconomyPacket: OverflowPolicy.LATEST_PER_ID,
+    CompanyStatsPacket: OverflowPolicy.LATEST_PER_ID,
+}
+
+class PacketQueue:
+    """Bounded FIFO of framed packets with an overflow policy per packet type.
+
+    Policies only apply once the queue holds maxsize packets. Packets without a policy are never dropped,
+    instead the queue reports itself as blocked so the reader stops reading from the socket.
+    The newest queued packet of each DROP_OLDEST type is never dropped, so the latest date or console line always gets through.
+
+    - maxsize (int): The number of packets after which the overflow policies apply. Default is 1024.
+    - policies (dict[type[Packet], OverflowPolicy] | None): The policy per packet class. Default is DEFAULT_OVERFLOW_POLICIES.
+    """
+    def __init__(self, maxsize: int = 1024, policies: dict[type[Packet], OverflowPolicy] | None = None):
+        self.maxsize = maxsize
+        self.policies = dict(DEFAULT_OVERFLOW_POLICIES if policies is None else policies)
+        self.dropped: dict[type[Packet], int] = {}
+        self.replaced: dict[type[Packet], int] = {}
+
+        # every queued packet lives in a one-element list so it can be dropped or replaced in place
+        self._slots: collections.deque[list[Packet | None]] = collections.deque()
+        self._droppable: collections.deque[list[Packet | None]] = collections.deque()
+        self._latest: dict[tuple[type[Packet], int], list[Packet | None]] = {}
+        # the newest queued slot of each DROP_OLDEST type, which is not evicted
+        self._newest: dict[type[Packet], list[Packet | None]] = {}
+        self._size = 0
+        self._droppable_size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def full(self) -> bool:
+        """Whether the queue holds maxsize packets or more."""
+        return self._size >= self.maxsize
+
+    @property
+    def blocked(self) -> bool:
+        """Whether the queue is full and no queued packet can be dropped to make room."""
+        return self._size >= self.maxsize and self._droppable_size <= len(self._newest)
+
+    def put(self, packet: Packet) -> None:
+        """Add a packet, applying its overflow policy if the queue is full.
+
+        - packet (Packet): The packet to add.
+        """
+        cls = type(packet)
+        policy = self.policies.get(cls, OverflowPolicy.KEEP)
+
+        if self._size >= self.maxsize:
+            if policy is OverflowPolicy.LATEST_PER_ID:
+                slot = self._latest.get((cls, packet.id))
+                if slot is not None:
+                    slot[0] = packet
+                    self.replaced[cls] = self.replaced.get(cls, 0) + 1
+                    return
+
+            elif policy is OverflowPolicy.DROP_OLDEST:
+                # the new packet takes over as the newest of its type, the one before it may go
+                self._newest.pop(cls, None)
+
+            # when nothing can be evicted the packet is queued anyway, KEEP packets then block the reader
+            self._evict()
+
+        if len(self._slots) >= 2 * max(self._size, self.maxsize):
+            # dropped packets leave empty slots behind, compact them once they outnumber the live ones
+            self._slots = collections.deque(slot for slot in self._slots if slot[0] is not None)
+
+        slot = [packet]
+        self._slots.append(slot)
+        self._size += 1
+        if policy is OverflowPolicy.DROP_OLDEST:
+            self._droppable.append(slot)
+            self._droppable_size += 1
+            self._newest[cls] = slot
+        elif policy is OverflowPolicy.LATEST_PER_ID:
+            self._latest[(cls, packet.id)] = slot
+
+    def pop(self) -> Packet | None:
+        """Remove and return the oldest packet.
+
+        Returns:
+        - Packet | None: The oldest packet, or None if the queue is empty.
+        """
+        slots = self._slots
+        while slots:
+            slot = slots.popleft()
+            packet = slot[0]
+            if packet is None:
+                continue
+
+            slot[0] = None
+            self._size -= 1
+            cls = type(packet)
+            policy = self.policies.get(cls, OverflowPolicy.KEEP)
+            if policy is OverflowPolicy.DROP_OLDEST:
+                self._droppable_size -= 1
+                # everything queued before this slot has already been popped or dropped
+                while self._droppable.popleft() is not slot:
+                    pass
+                if self._newest.get(cls) is slot:
+                    del self._newest[cls]
+            elif policy is OverflowPolicy.LATEST_PER_ID and self._latest.get((cls, packet.id)) is slot:
+                del self._latest[(cls, packet.id)]
+
+            return packet
+
+        return None
+
+    def clear(self) -> list[Packet]:
+        """Remove all packets.
+
+        Returns:
+        - list[Packet]: The removed packets, oldest first.
+        """
+        packets = [slot[0] for slot in self._slots if slot[0] is not None]
+        self._slots.clear()
+        self._droppable.clear()
+        self._latest.clear()
+        self._newest.clear()
+        self._size = 0
+        self._droppable_size = 0
+        return packets
+
+    def _evict(self) -> bool:
+        """Drop the oldest DROP_OLDEST packet that is not the newest of its type, returns False if there is none."""
+        droppable = self._droppable
+        while droppable and droppable[0][0] is None:
+            droppable.popleft()
+        if len(droppable) >= 2 * max(self._droppable_size, 8):
+            # slots dropped behind a kept newest packet stay behind, compact them like _slots
+            self._droppable = droppable = collections.deque(slot for slot in droppable if slot[0] is not None)
+
+        newest = self._newest
+        for slot in droppable:
+            packet = slot[0]
+            if packet is None or newest.get(type(packet)) is slot:
+                continue
+
+            slot[0] = None
+            self._size -= 1
+            self._droppable_size -= 1
+            cls = type(packet)
+            self.dropped[cls] = self.dropped.get(cls, 0) + 1
+            return True
+
+        return False
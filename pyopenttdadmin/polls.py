@@ -0,0 +1,233 @@
+import heapq
+import random
+import threading
+
+from typing import Hashable
+
+from .enums import *
+from .packet import *
+
+# d1 of a poll for every client or company
+POLL_ALL = 0xFFFFFFFF
+# spreads the first polls of tasks added one after another evenly over their period
+_GOLDEN = 0.6180339887498949
+
+# the packets that answer a poll of each update type, with the attribute holding the client or company id
+_ANSWERS: dict[type[Packet], tuple[AdminUpdateType, str | None]] = {
+    DatePacket: (AdminUpdateType.DATE, None),
+    ClientInfoPacket: (AdminUpdateType.CLIENT_INFO, "id"),
+    CompanyInfoPacket: (AdminUpdateType.COMPANY_INFO, "id"),
+    CompanyEconomyPacket: (AdminUpdateType.COMPANY_ECONOMY, None),
+    CompanyStatsPacket: (AdminUpdateType.COMPANY_STATS, None),
+}
+
+class PollTask:
+    """A poll sent periodically by a PollScheduler.
+
+    - target (Hashable): What the poll is sent to, for example an Admin.
+    - type (AdminUpdateType): The update type to poll.
+    - d1 (int): The client or company id for CLIENT_INFO and COMPANY_INFO, POLL_ALL for all of them.
+    - period (float): The number of seconds between polls.
+    - due (float): The time of the next poll.
+    - fresh (float): The last time the polled data was received or polled.
+    """
+    def __init__(self, target: Hashable, type: AdminUpdateType, d1: int, period: float, due: float, fresh: float):
+        self.target = target
+        self.type = type
+        self.d1 = d1
+        self.period = period
+        self.due = due
+        self.fresh = fresh
+        self.removed = False
+        # released by due and waiting in the outbox of its target
+        self.pending = False
+
+    def __lt__(self, other: "PollTask") -> bool:
+        return self.due < other.due
+
+    def __repr__(self) -> str:
+        return f"PollTask({self.type}, {self.d1}, {self.period})"
+
+class PollScheduler:
+    """Spreads periodic polls evenly over time, within a rate budget.
+
+    The first polls of the tasks are spread over their period, after that every task is polled once per period,
+    give or take the jitter, so polls of many servers and companies don't line up into bursts.
+    At most rate polls per second are sent, with bursts of up to burst polls. When more polls are due than the budget
+    allows, the tasks whose data is oldest go first.
+
+    The scheduler does no I/O: due returns the tasks to poll now, the caller sends them. Released tasks wait in an
+    outbox per target, so admins in different threads can share a scheduler, each sending only its own polls with
+    due(now, target). The methods hold a lock, the scheduler is safe to use from several threads.
+
+    - rate (float): The number of polls per second. Default is 10.0.
+    - burst (int): The number of polls that may be sent at once after a quiet period. Default is 5.
+    - jitter (float): The fraction of the period each poll is moved by at random. Default is 0.1.
+    """
+    def __init__(self, rate: float = 10.0, burst: int = 5, jitter: float = 0.1):
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0.")
+        if burst < 1:
+            raise ValueError("burst must be at least 1.")
+        self.rate = rate
+        self.burst = burst
+        self.jitter = jitter
+        self.tasks: dict[tuple[Hashable, AdminUpdateType, int], PollTask] = {}
+        self._heap: list[PollTask] = []
+        # due tasks waiting for budget
+        self._ready: list[PollTask] = []
+        # tasks released within the budget, waiting to be taken by their target
+        self._outbox: dict[Hashable, list[PollTask]] = {}
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._refilled: float | None = None
+        self._phase = random.random()
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def add(self, target: Hashable, type: AdminUpdateType, period: float, now: float, d1: int = POLL_ALL) -> PollTask:
+        """Poll an update type periodically, replacing the task of the same target, type and d1.
+
+        - target (Hashable): What the poll is sent to, for example an Admin.
+        - type (AdminUpdateType): The update type to poll.
+        - period (float): The number of seconds between polls.
+        - now (float): The current time.
+        - d1 (int): The client or company id for CLIENT_INFO and COMPANY_INFO. Default is POLL_ALL.
+
+        Returns:
+        - PollTask: The task.
+        """
+        with self._lock:
+            self._remove(target, type, d1)
+            self._phase = (self._phase + _GOLDEN) % 1.0
+            task = PollTask(target, type, d1, period, now + period * self._phase, now)
+            self.tasks[(target, type, d1)] = task
+            heapq.heappush(self._heap, task)
+            return task
+
+    def remove(self, target: Hashable, type: AdminUpdateType | None = None, d1: int | None = None) -> None:
+        """Stop polling.
+
+        - target (Hashable): The target of the tasks.
+        - type (AdminUpdateType | None): The update type. Default is None, which removes every task of the target.
+        - d1 (int | None): The id. Default is None, which removes the tasks of every id.
+        """
+        with self._lock:
+            self._remove(target, type, d1)
+
+    def _remove(self, target: Hashable, type: AdminUpdateType | None, d1: int | None):
+        for key in [key for key in self.tasks if key[0] == target and type in (None, key[1]) and d1 in (None, key[2])]:
+            # removed lazily from the heap
+            self.tasks.pop(key).removed = True
+        self._ready = [task for task in self._ready if not task.removed]
+        outbox = self._outbox.get(target)
+        if outbox is not None:
+            outbox[:] = [task for task in outbox if not task.removed]
+
+    def has_tasks(self, target: Hashable) -> bool:
+        """Whether a target has tasks.
+
+        - target (Hashable): The target.
+        """
+        with self._lock:
+            return any(key[0] == target for key in self.tasks)
+
+    def refresh(self, target: Hashable, packet: Packet, now: float) -> None:
+        """Note that polled data was received, so the task counts as fresh.
+
+        - target (Hashable): The target the packet came from.
+        - packet (Packet): The received packet.
+        - now (float): The current time.
+        """
+        answer = _ANSWERS.get(type(packet))
+        if answer is None:
+            return
+
+        type_, field = answer
+        with self._lock:
+            task = None
+            if field is not None:
+                task = self.tasks.get((target, type_, getattr(packet, field)))
+            if task is None:
+                task = self.tasks.get((target, type_, POLL_ALL))
+            if task is not None:
+                task.fresh = now
+
+    def due(self, now: float, target: Hashable | None = None) -> list[PollTask]:
+        """The tasks to poll now, the stalest first. They are scheduled again one period later.
+
+        Tasks of every target are released within the budget, the released tasks of other targets wait for them.
+
+        - now (float): The current time.
+        - target (Hashable | None): The target to take the tasks of. Default is None, which takes the tasks of every target.
+
+        Returns:
+        - list[PollTask]: The tasks to send a poll for.
+        """
+        with self._lock:
+            self._release(now)
+            if target is not None:
+                polls = self._outbox.pop(target, [])
+            else:
+                polls = [task for outbox in self._outbox.values() for task in outbox]
+                self._outbox.clear()
+            for task in polls:
+                task.pending = False
+            return polls
+
+    def _release(self, now: float):
+        """Move due tasks to the outboxes of their targets, as far as the budget allows."""
+        if self._refilled is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+        heap = self._heap
+        while heap and heap[0].due <= now:
+            task = heapq.heappop(heap)
+            if task.removed:
+                continue
+            if task.pending:
+                # its target has not taken the last poll yet, this period is skipped
+                self._reschedule(task, now)
+                continue
+            self._ready.append(task)
+
+        if not self._ready or self._tokens < 1:
+            return
+
+        ready = self._ready
+        ready.sort(key = lambda task: task.fresh)
+        count = min(int(self._tokens), len(ready))
+        released = ready[:count]
+        del ready[:count]
+        self._tokens -= count
+
+        for task in released:
+            task.fresh = now
+            task.pending = True
+            self._outbox.setdefault(task.target, []).append(task)
+            self._reschedule(task, now)
+
+    def _reschedule(self, task: PollTask, now: float):
+        task.due = now + task.period * (1 + self.jitter * (2 * random.random() - 1))
+        heapq.heappush(self._heap, task)
+
+    def next_deadline(self, target: Hashable | None = None) -> float | None:
+        """The time at which due has something to return, or None if there are no tasks.
+
+        - target (Hashable | None): The target that will call due. Default is None, for a caller that takes the tasks of every target.
+        """
+        with self._lock:
+            if self._outbox.get(target) if target is not None else any(self._outbox.values()):
+                return float("-inf")
+
+            if self._ready:
+                if self._refilled is None or self._tokens >= 1:
+                    return self._refilled
+                return self._refilled + (1 - self._tokens) / self.rate
+
+            heap = self._heap
+            while heap and heap[0].removed:
+                heapq.heappop(heap)
+            return heap[0].due if heap else None
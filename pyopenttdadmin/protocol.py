@@ -0,0 +1,462 @@
+import functools
+import os
+
+from typing import Any, Callable, Iterable
+
+from . import jsoncodec
+from .cmdnames import CommandNames
+from .coalesce import Coalescer
+from .enums import *
+from .handlerindex import HandlerIndex
+from .packet import *
+from .packetqueue import OverflowPolicy, PacketQueue
+from .state import GameState
+from .subscriptions import plan_subscriptions
+
+# the number of distinct rcon commands and chat messages whose encoded frames are kept
+ENCODE_CACHE_SIZE = 256
+
+class EncodedPacket:
+    """A packet encoded once, with its length and type header, that can be sent any number of times.
+
+    Sending it appends data to the outgoing buffer without encoding anything. It is immutable, so it can be shared between admins.
+
+    - packet (Packet): The packet to encode.
+    """
+    __slots__ = ("packet_type", "data")
+
+    def __init__(self, packet: Packet):
+        object.__setattr__(self, "packet_type", packet.packet_type)
+        object.__setattr__(self, "data", AdminProtocol.encode(packet))
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError("EncodedPacket is immutable")
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __repr__(self) -> str:
+        return f"EncodedPacket({self.packet_type}, {self.data!r})"
+
+@functools.lru_cache(maxsize = ENCODE_CACHE_SIZE)
+def _rcon_frame(command: str) -> EncodedPacket:
+    return EncodedPacket(AdminRconPacket(command))
+
+@functools.lru_cache(maxsize = ENCODE_CACHE_SIZE)
+def _chat_frame(message: str, action: Actions, desttype: ChatDestTypes, id: int) -> EncodedPacket:
+    return EncodedPacket(AdminChatPacket(message, action, desttype, id))
+
+class AdminProtocol:
+    """Sans-IO state machine of the admin protocol, shared by the sync and async Admin.
+
+    It does no I/O itself: bytes received from the server are fed to receive_data and come out as packets,
+    packets to send are encoded into a buffer that the transport empties with data_to_send.
+    It also keeps the registered handlers, the subscriptions and the game state, so every transport behaves the same way.
+    Listeners are called for every packet as soon as it is framed, before it is queued, so they see packets the queue drops.
+
+    - max_queue (int): The number of framed packets kept in memory before overflow policies apply. Default is 1024.
+    - overflow_policies (dict[type[Packet], OverflowPolicy] | None): The overflow policy per packet class. Default is DEFAULT_OVERFLOW_POLICIES.
+    - auto_subscribe (bool): Subscribe to the update types needed by the registered handlers at login and whenever handlers change. Default is False.
+    - cmd_names_cache (str | os.PathLike | None): The directory to cache DoCommand names in, the names are polled when they are not cached for the server version.
+        Default is None, which polls them on every login.
+    """
+    def __init__(self, max_queue: int = 1024, overflow_policies: dict[type[Packet], OverflowPolicy] | None = None, auto_subscribe: bool = False, cmd_names_cache: str | os.PathLike | None = None):
+        self._buffer = b""
+        self._outgoing = bytearray()
+        self.frames_received = 0
+        self.queue = PacketQueue(max_queue, overflow_policies)
+
+        self.handlers: dict[type[Packet], list[Callable]] = {}
+        self._indexes: dict[type[Packet], HandlerIndex] = {}
+        self._coalescers: dict[Callable, Coalescer] = {}
+        self._frequencies: dict[Callable, AdminUpdateFrequency] = {}
+
+        self.auto_subscribe = auto_subscribe
+        self.subscriptions: dict[AdminUpdateType, AdminUpdateFrequency] = {}
+        self._manual_subscriptions: set[AdminUpdateType] = set()
+        self._planned_subscriptions: set[AdminUpdateType] = set()
+        self.logged_in = False
+        self._login: AdminJoinPacket | None = None
+
+        self.state = GameState()
+        self.command_names = CommandNames(cmd_names_cache)
+        self.listeners: list[Callable[[Packet], None]] = [self.state.apply, self._update_command_names, self._resync_after_new_game]
+        # called with the type byte and payload of every frame, before it is decoded
+        self.frame_listeners: list[Callable[[bytes], None]] = []
+        self._resync_token: int | None = None
+        self._cmd_names_token: int | None = None
+        self._new_game = False
+        self._ping_token = 0
+
+    @property
+    def wants_data(self) -> bool:
+        """Whether the transport should read from the server, False while the queue is blocked."""
+        return not self.queue.blocked
+
+    def receive_data(self, data: bytes) -> None:
+        """Feed bytes received from the server.
+
+        - data (bytes): The received bytes.
+        """
+        if self._buffer:
+            self._buffer += data
+        else:
+            self._buffer = data
+        self._frame()
+
+    def _frame(self):
+        """Move complete packets from the buffer into the queue.
+
+        Framing stops as soon as the queue is blocked, the remaining bytes stay in the buffer.
+        """
+        buffer = self._buffer
+        queue = self.queue
+        create_packet = Packet.create_packet
+        offset = 0
+        end = len(buffer)
+        while end - offset >= 2 and not queue.blocked:
+            packet_len = buffer[offset] | buffer[offset + 1] << 8
+            if end - offset < packet_len:
+                break
+
+            frame = buffer[offset + 2: offset + packet_len]
+            for listener in self.frame_listeners:
+                listener(frame)
+            self._deliver(create_packet(frame))
+            offset += packet_len
+            self.frames_received += 1
+
+        if offset:
+            self._buffer = buffer[offset:]
+
+    def _deliver(self, packet: Packet):
+        """Pass a framed packet to the listeners and queue it."""
+        for listener in self.listeners:
+            listener(packet)
+        self.queue.put(packet)
+
+        if type(packet) is PongPacket and packet.d1 == self._resync_token:
+            self._resync_token = None
+            for synthetic in self.state.end_resync():
+                self._deliver(synthetic)
+
+    def _update_command_names(self, packet: Packet):
+        cls = type(packet)
+        if cls is CmdLoggingPacket:
+            packet.name = self.command_names.name(packet.cmd)
+        elif cls is WelcomePacket:
+            if not self.command_names.load(packet.version):
+                self.send(AdminPollPacket(AdminUpdateType.CMD_NAMES))
+                # the server answers in order, so the pong marks the end of the names
+                self._cmd_names_token = self.ping()
+        elif cls is CmdNamesPacket:
+            self.command_names.update(packet.names)
+        elif cls is PongPacket and packet.d1 == self._cmd_names_token:
+            self._cmd_names_token = None
+            self.command_names.finish()
+
+    def _resync_after_new_game(self, packet: Packet):
+        cls = type(packet)
+        if cls is NewGamePacket:
+            self._new_game = True
+        elif cls is WelcomePacket and self._new_game:
+            self._new_game = False
+            # the clients rejoin once the new game is loaded, the ones that did not are dropped
+            self.resync()
+
+    def add_listener(self, func: Callable[[Packet], None]) -> None:
+        """Call a function for every packet as soon as it is framed.
+
+        - func (Callable[[Packet], None]): The listener, it must not block.
+        """
+        self.listeners.append(func)
+
+    def remove_listener(self, func: Callable[[Packet], None]) -> None:
+        """Stop calling a listener.
+
+        - func (Callable[[Packet], None]): The listener to remove.
+        """
+        self.listeners.remove(func)
+
+    def next_packet(self) -> Packet | None:
+        """Take the oldest received packet.
+
+        Returns:
+        - Packet | None: The packet, or None if no complete packet has been received.
+        """
+        packet = self.queue.pop()
+        if packet is None and self._buffer:
+            self._frame()
+            packet = self.queue.pop()
+        return packet
+
+    def packets(self) -> list[Packet]:
+        """Take the queued packets, after framing buffered packets until the queue is blocked.
+
+        At most one queue full is taken at a time, so the overflow policies apply to what arrived in one read.
+        Packets that did not fit stay in the buffer for the next call.
+
+        Returns:
+        - list[Packet]: The packets, oldest first.
+        """
+        if self._buffer:
+            self._frame()
+        return self.queue.clear()
+
+    @staticmethod
+    def encode(packet: Packet) -> bytes:
+        """Encode a packet with its length and type header.
+
+        - packet (Packet): The packet to encode.
+
+        Returns:
+        - bytes: The packet as sent over the wire.
+        """
+        data = packet.to_bytes()
+        return (len(data) + 3).to_bytes(2, 'little') + packet.packet_type.value.to_bytes(1, 'little') + data
+
+    def send(self, packet: Packet | EncodedPacket) -> None:
+        """Queue a packet to be sent to the server.
+
+        - packet (Packet | EncodedPacket): The packet to send, an EncodedPacket is queued as is.
+        """
+        if type(packet) is EncodedPacket:
+            self._outgoing += packet.data
+        else:
+            self._outgoing += self.encode(packet)
+
+    def data_to_send(self) -> bytes:
+        """Take the bytes that should be written to the server.
+
+        Returns:
+        - bytes: The encoded packets queued with send, empty if there are none.
+        """
+        data = bytes(self._outgoing)
+        self._outgoing.clear()
+        return data
+
+    def login(self, name: str, password: str, version: int = 0) -> None:
+        """Queue the login packet, followed by the planned subscriptions if auto_subscribe is enabled
+        and a resync if the game state was loaded from a snapshot.
+
+        - name (str): The name of the admin.
+        - password (str): The password of the admin.
+        - version (int): The version of the admin. Default is 0.
+        """
+        self._login = AdminJoinPacket(password, name, str(version))
+        self.send(self._login)
+        self.logged_in = True
+
+        if self.auto_subscribe:
+            self.update_subscriptions()
+        if self.state.provisional:
+            # reconcile the tables loaded from a snapshot
+            self.resync()
+
+    def ping(self) -> int:
+        """Queue a ping, the server answers with a PongPacket carrying the returned token.
+
+        Returns:
+        - int: The token of the ping.
+        """
+        self._ping_token = (self._ping_token + 1) & 0xFFFFFFFF
+        self.send(AdminPingPacket(self._ping_token))
+        return self._ping_token
+
+    def resync(self) -> None:
+        """Queue the polls needed to rebuild the client and company tables.
+
+        Once the server has answered them, synthetic join, quit, new and remove packets are queued for
+        the differences with the tables as they were, these packets have synthetic set to True.
+        """
+        self.state.begin_resync()
+        self.send(AdminPollPacket(AdminUpdateType.CLIENT_INFO))
+        self.send(AdminPollPacket(AdminUpdateType.COMPANY_INFO))
+        # the server answers in order, so the pong marks the end of the poll replies
+        self._resync_token = self.ping()
+
+    def reconnected(self) -> None:
+        """Reset the connection state after the transport reconnected to the server.
+
+        Queues the last login and all subscriptions again, followed by a resync.
+        """
+        self._buffer = b""
+        self._outgoing.clear()
+        # the names are polled again when the server welcomes the admin
+        self._cmd_names_token = None
+        # the resync below covers a new game started while disconnected
+        self._new_game = False
+        if self._login is None:
+            return
+
+        self.send(self._login)
+        for type, frequency in self.subscriptions.items():
+            if frequency is not AdminUpdateFrequency.POLL:
+                self.send(AdminSubscribePacket(type, frequency))
+        self.resync()
+
+    def rcon(self, command: str) -> None:
+        """Queue an RCON command, the frames of recently sent commands are reused.
+
+        - command (str): The RCON command to send.
+        """
+        self._outgoing += _rcon_frame(command).data
+
+    def chat(self, message: str, action: Actions = Actions.CHAT, desttype: ChatDestTypes = ChatDestTypes.BROADCAST, id: int = 0) -> None:
+        """Queue a chat message.
+
+        - message (str): The message to send.
+        - action (Actions): The chat action. Default is Actions.CHAT.
+        - desttype (ChatDestTypes): The destination type. Default is ChatDestTypes.BROADCAST.
+        - id (int): The company or client ID for team and private messages. Default is 0.
+        """
+        # the frames of recently sent messages are reused
+        self._outgoing += _chat_frame(message, action, desttype, id).data
+
+    def gamescript(self, message: Any) -> None:
+        """Queue a message for the GameScript.
+
+        - message (Any): The message, a str is sent as is, anything else is serialised to JSON.
+        """
+        if not isinstance(message, str):
+            message = jsoncodec.dumps(message)
+        self.send(AdminGameScriptPacket(message))
+
+    def _subscribe(self, type: AdminUpdateType, frequency: AdminUpdateFrequency):
+        self.send(AdminSubscribePacket(type, frequency))
+        self.subscriptions[type] = frequency
+
+    def subscribe(self, type: AdminUpdateType, frequency: AdminUpdateFrequency = AdminUpdateFrequency.AUTOMATIC) -> None:
+        """Queue a subscription to an update type, the subscription planner leaves this update type alone from now on.
+
+        - type (AdminUpdateType): The type of update to subscribe to.
+        - frequency (AdminUpdateFrequency): The frequency of the update. Default is AdminUpdateFrequency.AUTOMATIC.
+        """
+        if frequency not in AdminUpdateTypeFrequencyMatrix[type]:
+            raise ValueError(f"Invalid frequency ({frequency}) for {type}")
+
+        self._manual_subscriptions.add(type)
+        self._subscribe(type, frequency)
+
+    def update_subscriptions(self) -> None:
+        """Queue the subscriptions needed by the registered handlers.
+
+        Update types subscribed to with subscribe are left alone. Update types that are no longer needed
+        are set back to AdminUpdateFrequency.POLL if the server allows polling them, the others stay subscribed
+        until the connection is lost and are not subscribed to again after reconnecting.
+        """
+        plan = plan_subscriptions(
+            (packet_type, self._frequencies.get(handler))
+            for packet_type, handlers in self.handlers.items()
+            for handler in handlers
+        )
+        for type in self._manual_subscriptions:
+            plan.pop(type, None)
+
+        for type, frequency in plan.items():
+            if self.subscriptions.get(type) is not frequency:
+                self._subscribe(type, frequency)
+
+        for type in self._planned_subscriptions - plan.keys():
+            if AdminUpdateFrequency.POLL in AdminUpdateTypeFrequencyMatrix[type]:
+                self._subscribe(type, AdminUpdateFrequency.POLL)
+            else:
+                # the server can't unsubscribe, but the subscription is not replayed after a reconnect
+                self.subscriptions.pop(type, None)
+
+        self._planned_subscriptions = set(plan)
+
+    def add_handler(self, func: Callable, packet_types: Iterable[type[Packet]], coalesce: float | None = None, frequency: AdminUpdateFrequency | None = None, filters: dict[str, Any] | None = None) -> None:
+        """Register a handler.
+
+        - func (Callable): The handler.
+        - packet_types (Iterable[type[Packet]]): The packet classes to handle.
+        - coalesce (float | None): If set, the handler gets at most one packet per this many seconds for each packet type and id. Default is None.
+        - frequency (AdminUpdateFrequency | None): The update frequency the handler needs when auto_subscribe is enabled. Default is None.
+        - filters (dict[str, Any] | None): The values packet fields must be equal to for the handler to be called. Default is None.
+        """
+        packet_types = tuple(packet_types)
+        if frequency is not None:
+            # raises on frequencies the server does not allow for these packets
+            plan_subscriptions((packet_type, frequency) for packet_type in packet_types)
+
+        # check the filters against every packet class before registering anything
+        for packet_type in packet_types:
+            if packet_type not in self._indexes:
+                self._indexes[packet_type] = HandlerIndex(packet_type)
+            self._indexes[packet_type].validate(filters or {})
+
+        for packet_type in packet_types:
+            self._indexes[packet_type].add(func, filters)
+            if packet_type not in self.handlers:
+                self.handlers[packet_type] = []
+            self.handlers[packet_type].append(func)
+
+        if coalesce is not None:
+            self._coalescers[func] = Coalescer(coalesce)
+        if frequency is not None:
+            self._frequencies[func] = frequency
+
+        if self.auto_subscribe and self.logged_in:
+            self.update_subscriptions()
+
+    def remove_handler(self, func: Callable, packet_types: Iterable[type[Packet]] = ()) -> None:
+        """Remove a handler.
+
+        - func (Callable): The handler to remove.
+        - packet_types (Iterable[type[Packet]]): The packet classes to remove the handler for. Default is every packet class it handles.
+        """
+        for packet_type in tuple(packet_types) or list(self.handlers):
+            handlers = self.handlers.get(packet_type, [])
+            if func in handlers:
+                handlers.remove(func)
+                self._indexes[packet_type].remove(func)
+            if not handlers:
+                self.handlers.pop(packet_type, None)
+                self._indexes.pop(packet_type, None)
+
+        if not any(func in handlers for handlers in self.handlers.values()):
+            self._coalescers.pop(func, None)
+            self._frequencies.pop(func, None)
+
+        if self.auto_subscribe and self.logged_in:
+            self.update_subscriptions()
+
+    def handlers_for(self, packet: Packet, now: float) -> list[Callable]:
+        """The handlers to call for a packet now.
+
+        Handlers whose filters don't match the packet, and coalescing handlers that hold the packet back, are left out.
+
+        - packet (Packet): The received packet.
+        - now (float): The current monotonic time.
+
+        Returns:
+        - list[Callable]: The handlers to call.
+        """
+        index = self._indexes.get(type(packet))
+        if index is None:
+            return []
+
+        handlers = index.match(packet)
+        if not self._coalescers:
+            return handlers
+
+        return [
+            handler for handler in handlers
+            if (coalescer := self._coalescers.get(handler)) is None or coalescer.offer(packet, now)
+        ]
+
+    def due(self, now: float) -> list[tuple[Callable, Packet]]:
+        """The held back packets of coalescing handlers whose window has passed.
+
+        - now (float): The current monotonic time.
+
+        Returns:
+        - list[tuple[Callable, Packet]]: The handlers with the packet to call them with.
+        """
+        return [(handler, packet) for handler, coalescer in self._coalescers.items() for packet in coalescer.due(now)]
+
+    def next_deadline(self) -> float | None:
+        """The monotonic time at which due has something to return, or None if nothing is held back."""
+        deadlines = [deadline for coalescer in self._coalescers.values() if (deadline := coalescer.next_deadline()) is not None]
+        return min(deadlines) if deadlines else None
@@ -0,0 +1,190 @@
+import time
+
+from enum import Enum
+from typing import Callable, Hashable, Iterable
+
+from .packet import *
+
+class RateScope(Enum):
+    """What command rates are counted per."""
+    CLIENT = 0 # key: client id
+    COMPANY = 1 # key: company id
+    CLIENT_COMMAND = 2 # key: (client id, command id)
+
+class RateCounter:
+    """Counts events in a sliding window, with a ring of fixed size buckets.
+
+    Adding an event and reading the count are O(1), apart from clearing the buckets that expired since the last call.
+    The window slides a bucket at a time, so the count covers between window - window / buckets and window seconds.
+
+    - window (float): The length of the window in seconds.
+    - buckets (int): The number of buckets the window is split into. Default is 10.
+    """
+    def __init__(self, window: float, buckets: int = 10):
+        self.window = window
+        self._width = window / buckets
+        self._counts = [0] * buckets
+        self._head = 0 # the absolute index of the newest bucket
+        self.total = 0
+
+    def _advance(self, now: float):
+        bucket = int(now // self._width)
+        passed = bucket - self._head
+        if passed <= 0:
+            return
+
+        counts = self._counts
+        size = len(counts)
+        if passed >= size:
+            counts[:] = [0] * size
+            self.total = 0
+        else:
+            for i in range(self._head + 1, bucket + 1):
+                i %= size
+                self.total -= counts[i]
+                counts[i] = 0
+        self._head = bucket
+
+    def add(self, now: float, count: int = 1) -> int:
+        """Count events.
+
+        - now (float): The current time.
+        - count (int): The number of events. Default is 1.
+
+        Returns:
+        - int: The number of events in the window.
+        """
+        self._advance(now)
+        self._counts[self._head % len(self._counts)] += count
+        self.total += count
+        return self.total
+
+    def count(self, now: float) -> int:
+        """The number of events in the window.
+
+        - now (float): The current time.
+        """
+        self._advance(now)
+        return self.total
+
+class _Threshold:
+    def __init__(self, scope: RateScope, window: float, limit: int, callback: Callable, cmd: int | str | None):
+        self.scope = scope
+        self.window = window
+        self.limit = limit
+        self.callback = callback
+        self.cmd = cmd
+        # keys that are over the limit, the callback fires again once they have dropped back to it
+        self.exceeded: set[Hashable] = set()
+        # counts of the one command per client or company, for thresholds on a command
+        self.counters: dict[Hashable, RateCounter] = {}
+
+class CommandRateTracker:
+    """Live command rates per client, company and client command, over several sliding windows, from CmdLoggingPacket.
+
+    Add tracker.listener as protocol listener, thresholds are then checked as soon as each packet is framed.
+
+    - windows (Iterable[float]): The window lengths in seconds. Default is (10, 60, 600).
+    - buckets (int): The number of buckets per window. Default is 10.
+    - clock (Callable[[], float]): The time source. Default is time.monotonic.
+    """
+    def __init__(self, windows: Iterable[float] = (10, 60, 600), buckets: int = 10, clock: Callable[[], float] = time.monotonic):
+        self.windows = tuple(sorted(windows))
+        self.buckets = buckets
+        self.clock = clock
+        self._counters: dict[RateScope, dict[Hashable, dict[float, RateCounter]]] = {scope: {} for scope in RateScope}
+        self._thresholds: dict[RateScope, list[_Threshold]] = {scope: [] for scope in RateScope}
+        self._updates = 0
+
+    def add_threshold(self, scope: RateScope, window: float, limit: int, callback: Callable[[Hashable, int, CmdLoggingPacket], None], cmd: int | str | None = None) -> None:
+        """Call a function when a key goes over a number of commands within a window.
+
+        The callback is called with the key, the count and the packet that crossed the limit. It is called once per crossing,
+        a key is armed again by a command that leaves its count at or below the limit.
+
+        - scope (RateScope): What the commands are counted per.
+        - window (float): The window, one of the windows of the tracker.
+        - limit (int): The highest count that does not call the callback.
+        - callback (Callable[[Hashable, int, CmdLoggingPacket], None]): The function to call.
+        - cmd (int | str | None): Only count this command, by id or name. Default is None, which counts every command.
+        """
+        if window not in self.windows:
+            raise ValueError(f"Window {window} is not tracked, the tracked windows are {self.windows}")
+        self._thresholds[scope].append(_Threshold(scope, window, limit, callback, cmd))
+
+    def _counter(self, scope: RateScope, key: Hashable) -> dict[float, RateCounter]:
+        counters = self._counters[scope].get(key)
+        if counters is None:
+            counters = self._counters[scope][key] = {window: RateCounter(window, self.buckets) for window in self.windows}
+        return counters
+
+    def listener(self, packet: Packet) -> None:
+        """Protocol listener that counts CmdLoggingPackets."""
+        if type(packet) is not CmdLoggingPacket:
+            return
+
+        now = self.clock()
+        keys = (
+            (RateScope.CLIENT, packet.client_id),
+            (RateScope.COMPANY, packet.company_id),
+            (RateScope.CLIENT_COMMAND, (packet.client_id, packet.cmd)),
+        )
+        for scope, key in keys:
+            counters = self._counter(scope, key)
+            counts = {window: counter.add(now) for window, counter in counters.items()}
+
+            for threshold in self._thresholds[scope]:
+                if threshold.cmd is not None and threshold.cmd != packet.cmd and threshold.cmd != packet.name:
+                    continue
+
+                if threshold.cmd is None or scope is RateScope.CLIENT_COMMAND:
+                    count = counts[threshold.window]
+                else:
+                    counter = threshold.counters.get(key)
+                    if counter is None:
+                        counter = threshold.counters[key] = RateCounter(threshold.window, self.buckets)
+                    count = counter.add(now)
+
+                if count > threshold.limit:
+                    if key not in threshold.exceeded:
+                        threshold.exceeded.add(key)
+                        threshold.callback(key, count, packet)
+                else:
+                    threshold.exceeded.discard(key)
+
+        self._updates += 1
+        if self._updates % 4096 == 0:
+            self._purge(now)
+
+    def count(self, scope: RateScope, key: Hashable, window: float) -> int:
+        """The number of commands of a key within a window.
+
+        - scope (RateScope): What the commands are counted per.
+        - key (Hashable): The client id, company id or (client id, command id).
+        - window (float): The window, one of the windows of the tracker.
+        """
+        counters = self._counters[scope].get(key)
+        if counters is None:
+            return 0
+        return counters[window].count(self.clock())
+
+    def rate(self, scope: RateScope, key: Hashable, window: float) -> float:
+        """The number of commands per second of a key within a window.
+
+        - scope (RateScope): What the commands are counted per.
+        - key (Hashable): The client id, company id or (client id, command id).
+        - window (float): The window, one of the windows of the tracker.
+        """
+        return self.count(scope, key, window) / window
+
+    def _purge(self, now: float):
+        """Forget keys without commands in the longest window, so clients that left don't pile up."""
+        longest = self.windows[-1]
+        for scope, keys in self._counters.items():
+            for key in [key for key, counters in keys.items() if counters[longest].count(now) == 0]:
+                del keys[key]
+
+        for thresholds in self._thresholds.values():
+            for threshold in thresholds:
+                threshold.counters = {key: counter for key, counter in threshold.counters.items() if counter.count(now)}
+                threshold.exceeded &= threshold.counters.keys() | self._counters[threshold.scope].keys()
@@ -0,0 +1,28 @@
+import random
+
+from typing import Iterator
+
+class Backoff:
+    """Jittered exponential backoff between reconnect attempts.
+
+    - initial (float): The delay before the first attempt in seconds. Default is 1.0.
+    - maximum (float): The longest delay in seconds. Default is 60.0.
+    - factor (float): The factor the delay grows with after every failed attempt. Default is 2.0.
+    - jitter (float): The fraction of each delay that is randomised, so a fleet of bots does not reconnect in lockstep. Default is 0.5.
+    - attempts (int | None): The number of attempts before giving up. Default is None, which never gives up.
+    """
+    def __init__(self, initial: float = 1.0, maximum: float = 60.0, factor: float = 2.0, jitter: float = 0.5, attempts: int | None = None):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.attempts = attempts
+
+    def delays(self) -> Iterator[float]:
+        """Yield the delay before each reconnect attempt."""
+        delay = self.initial
+        attempt = 0
+        while self.attempts is None or attempt < self.attempts:
+            yield delay * (1 - self.jitter * random.random())
+            delay = min(delay * self.factor, self.maximum)
+            attempt += 1
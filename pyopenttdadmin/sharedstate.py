@@ -0,0 +1,306 @@
+import os
+import struct
+
+from multiprocessing import resource_tracker, shared_memory
+from typing import Iterator
+
+from .packet import *
+from .state import GameState
+
+LAYOUT_VERSION = 2
+
+# changes, layout version, client capacity, company capacity
+_HEADER = struct.Struct("<QIII")
+# every record starts with its own seq, which is odd while the record is written
+_SEQ = struct.Struct("<I")
+# seq, used, id, joined, company id, language, name
+_CLIENT = struct.Struct("<I?IIBB32s")
+# seq, used, id, color, passworded, is ai, founded year, money, loan, name
+_COMPANY = struct.Struct("<I?BB??Iqq96s")
+# the start of a client record, enough to find a client by id
+_CLIENT_KEY = struct.Struct("<I?I")
+
+# the packets that change a single record
+_CLIENT_PACKETS = frozenset({ClientInfoPacket, ClientUpdatePacket, ClientQuitPacket, ClientErrorPacket})
+_COMPANY_PACKETS = frozenset({CompanyInfoPacket, CompanyUpdatePacket, CompanyRemovePacket, CompanyEconomyPacket})
+# the packets that change whole tables
+_TABLES_PACKETS = frozenset({NewGamePacket, WelcomePacket})
+
+def _fixed(text: str, size: int) -> bytes:
+    """Encode text into at most size bytes, without splitting a character."""
+    return text.encode('utf-8')[:size].decode('utf-8', 'ignore').encode('utf-8')
+
+def _text(data: bytes) -> str:
+    return data.rstrip(b'\x00').decode('utf-8')
+
+class SharedClient:
+    """A client record read from shared memory, see ClientInfoPacket for the fields."""
+    __slots__ = ("id", "name", "joined", "company_id", "lang")
+
+    def __init__(self, id: int, name: str, joined: int, company_id: int, lang: int):
+        self.id = id
+        self.name = name
+        self.joined = joined
+        self.company_id = company_id
+        self.lang = lang
+
+    def __repr__(self) -> str:
+        return f"SharedClient({self.id}, {self.name!r}, {self.joined}, {self.company_id}, {self.lang})"
+
+class SharedCompany:
+    """A company record read from shared memory, see CompanyInfoPacket and CompanyEconomyPacket for the fields.
+
+    money and current_loan are 0 until the first CompanyEconomyPacket of the company.
+    """
+    __slots__ = ("id", "name", "color", "passworded", "is_ai", "year", "money", "current_loan")
+
+    def __init__(self, id: int, name: str, color: int, passworded: bool, is_ai: bool, year: int, money: int, current_loan: int):
+        self.id = id
+        self.name = name
+        self.color = color
+        self.passworded = passworded
+        self.is_ai = is_ai
+        self.year = year
+        self.money = money
+        self.current_loan = current_loan
+
+    def __repr__(self) -> str:
+        return f"SharedCompany({self.id}, {self.name!r}, {self.color}, {self.passworded}, {self.is_ai}, {self.year}, {self.money}, {self.current_loan})"
+
+class SharedStateWriter:
+    """Publishes the client and company tables of a GameState in a shared memory segment.
+
+    Records have a fixed width, so readers find them by offset. Each record is guarded by its own seqlock: its sequence number
+    is odd while the record is written, readers retry when it is odd or changed during their read, so the writer never waits for a reader.
+    A packet only rewrites the record it changes, companies are stored at the slot of their id.
+
+    - name (str | None): The name of the segment. Default is None, which picks a free name, see the name attribute.
+    - max_clients (int): The number of client records. Default is 256.
+    - max_companies (int): The number of company records, company ids from max_companies on are left out. Default is 16.
+    """
+    def __init__(self, name: str | None = None, max_clients: int = 256, max_companies: int = 16):
+        self.max_clients = max_clients
+        self.max_companies = max_companies
+        size = _HEADER.size + max_clients * _CLIENT.size + max_companies * _COMPANY.size
+        self.memory = shared_memory.SharedMemory(name, create = True, size = size)
+        self.name = self.memory.name
+        self._changes = 0
+        self._companies_offset = _HEADER.size + max_clients * _CLIENT.size
+        # the slot of every published client, and the free slots, lowest last
+        self._client_slots: dict[int, int] = {}
+        self._free_clients = list(range(max_clients - 1, -1, -1))
+        _HEADER.pack_into(self.memory.buf, 0, 0, LAYOUT_VERSION, max_clients, max_companies)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write(self, record: struct.Struct, offset: int, *fields):
+        buf = self.memory.buf
+        seq = _SEQ.unpack_from(buf, offset)[0]
+        _SEQ.pack_into(buf, offset, seq + 1)
+        record.pack_into(buf, offset, seq + 1, *fields)
+        _SEQ.pack_into(buf, offset, seq + 2)
+        self._changes += 1
+        struct.pack_into("<Q", buf, 0, self._changes)
+
+    def _client_offset(self, slot: int) -> int:
+        return _HEADER.size + slot * _CLIENT.size
+
+    def _company_offset(self, id: int) -> int:
+        return self._companies_offset + id * _COMPANY.size
+
+    def write_client(self, state: GameState, id: int) -> None:
+        """Write the record of a client as it is in a game state, or clear it if the client is gone.
+
+        Clients that don't fit are left out until a slot is free and they are written again.
+
+        - state (GameState): The state to publish.
+        - id (int): The client id.
+        """
+        client = state.clients.get(id)
+        slot = self._client_slots.get(id)
+        if client is None:
+            if slot is not None:
+                del self._client_slots[id]
+                self._free_clients.append(slot)
+                self._write(_CLIENT, self._client_offset(slot), False, 0, 0, 0, 0, b"")
+            return
+
+        if slot is None:
+            if not self._free_clients:
+                return
+            slot = self._client_slots[id] = self._free_clients.pop()
+        self._write(_CLIENT, self._client_offset(slot), True, client.id, client.joined, client.company_id, client.lang, _fixed(client.name, 32))
+
+    def write_company(self, state: GameState, id: int) -> None:
+        """Write the record of a company as it is in a game state, or clear it if the company is gone.
+
+        - state (GameState): The state to publish.
+        - id (int): The company id.
+        """
+        if not 0 <= id < self.max_companies:
+            return
+
+        company = state.companies.get(id)
+        if company is None:
+            self._write(_COMPANY, self._company_offset(id), False, 0, 0, False, False, 0, 0, 0, b"")
+            return
+
+        economy = state.economy.get(id)
+        self._write(
+            _COMPANY, self._company_offset(id),
+            True, company.id, company.color.value, company.passworded, company.is_ai, company.year,
+            economy.money if economy is not None else 0,
+            economy.current_loan if economy is not None else 0,
+            _fixed(company.name, 96)
+        )
+
+    def publish(self, state: GameState) -> None:
+        """Write all tables of a game state to the segment.
+
+        - state (GameState): The state to publish.
+        """
+        for id in [id for id in self._client_slots if id not in state.clients]:
+            self.write_client(state, id)
+        for id in state.clients:
+            self.write_client(state, id)
+        for id in range(self.max_companies):
+            self.write_company(state, id)
+
+    def listener(self, state: GameState):
+        """A protocol listener that writes the records a packet changes.
+
+        It must run after state.apply, which AdminProtocol calls first.
+
+        - state (GameState): The state to publish.
+        """
+        def publish(packet: Packet):
+            cls = type(packet)
+            if cls in _CLIENT_PACKETS:
+                self.write_client(state, packet.id)
+            elif cls in _COMPANY_PACKETS:
+                self.write_company(state, packet.id)
+            elif cls in _TABLES_PACKETS:
+                self.publish(state)
+        return publish
+
+    def close(self) -> None:
+        """Close and remove the segment."""
+        self.memory.close()
+        self.memory.unlink()
+
+class SharedStateReader:
+    """Reads the tables published by a SharedStateWriter, from any process on the same machine.
+
+    Records are unpacked straight from the segment one at a time, client and company look up a single record.
+
+    - name (str): The name of the segment, SharedStateWriter.name.
+    """
+    def __init__(self, name: str):
+        # the writer owns the segment, don't let the resource tracker remove it when this process exits
+        try:
+            self.memory = shared_memory.SharedMemory(name, track = False)
+        except TypeError:
+            # Python 3.12 and older track every segment, POSIX ones under the name with a leading slash
+            self.memory = shared_memory.SharedMemory(name)
+            if os.name == "posix":
+                resource_tracker.unregister("/" + self.memory.name, "shared_memory")
+
+        _, version, self.max_clients, self.max_companies = _HEADER.unpack_from(self.memory.buf, 0)
+        if version != LAYOUT_VERSION:
+            raise ValueError(f"Unsupported layout version {version}")
+        self._companies_offset = _HEADER.size + self.max_clients * _CLIENT.size
+        # the slot each client was last seen at
+        self._client_slots: dict[int, int] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def changes(self) -> int:
+        """The number of records written so far, it changes whenever the tables do."""
+        return struct.unpack_from("<Q", self.memory.buf, 0)[0]
+
+    def _read(self, record: struct.Struct, offset: int) -> tuple:
+        buf = self.memory.buf
+        while True:
+            fields = record.unpack_from(buf, offset)
+            # odd while the writer is busy, changed if it wrote while the record was unpacked
+            if not fields[0] & 1 and _SEQ.unpack_from(buf, offset)[0] == fields[0]:
+                return fields
+
+    def _client(self, slot: int) -> SharedClient | None:
+        _, used, id, joined, company_id, lang, name = self._read(_CLIENT, _HEADER.size + slot * _CLIENT.size)
+        if not used:
+            return None
+        return SharedClient(id, _text(name), joined, company_id, lang)
+
+    def _company(self, slot: int) -> SharedCompany | None:
+        _, used, id, color, passworded, is_ai, year, money, loan, name = self._read(_COMPANY, self._companies_offset + slot * _COMPANY.size)
+        if not used:
+            return None
+        return SharedCompany(id, _text(name), color, passworded, is_ai, year, money, loan)
+
+    def client(self, id: int) -> SharedClient | None:
+        """Read the record of a client.
+
+        The slot of a client is remembered, the slots are only searched when the client is not found there.
+
+        - id (int): The client id.
+
+        Returns:
+        - SharedClient | None: The client, or None if it is not published.
+        """
+        slot = self._client_slots.get(id)
+        if slot is not None:
+            client = self._client(slot)
+            if client is not None and client.id == id:
+                return client
+
+        buf = self.memory.buf
+        for slot in range(self.max_clients):
+            _, used, slot_id = _CLIENT_KEY.unpack_from(buf, _HEADER.size + slot * _CLIENT.size)
+            if used and slot_id == id:
+                client = self._client(slot)
+                if client is not None and client.id == id:
+                    self._client_slots[id] = slot
+                    return client
+        self._client_slots.pop(id, None)
+        return None
+
+    def company(self, id: int) -> SharedCompany | None:
+        """Read the record of a company.
+
+        - id (int): The company id.
+
+        Returns:
+        - SharedCompany | None: The company, or None if it is not published.
+        """
+        if not 0 <= id < self.max_companies:
+            return None
+        return self._company(id)
+
+    def clients(self) -> Iterator[SharedClient]:
+        """Read the client records one at a time, each record is consistent on its own."""
+        for slot in range(self.max_clients):
+            client = self._client(slot)
+            if client is not None:
+                self._client_slots[client.id] = slot
+                yield client
+
+    def companies(self) -> Iterator[SharedCompany]:
+        """Read the company records one at a time, by company id, each record is consistent on its own."""
+        for slot in range(self.max_companies):
+            company = self._company(slot)
+            if company is not None:
+                yield company
+
+    def close(self) -> None:
+        """Stop reading, the segment stays available to other readers."""
+        self.memory.close()
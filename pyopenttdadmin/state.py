@@ -0,0 +1,257 @@
+import copy
+import inspect
+import json
+import os
+
+from typing import Any
+
+from . import enums, packet as packets
+from .enums import *
+from .leaderboard import Leaderboards
+from .packet import *
+
+SNAPSHOT_VERSION = 2
+# the company_id of clients that are not in a company
+SPECTATOR = 255
+
+def _encode(value: Any) -> Any:
+    """Turn a packet field into JSON, tagging the values JSON can't tell apart."""
+    if isinstance(value, Enum):
+        return {"enum": type(value).__name__, "value": value.value}
+    if isinstance(value, dict):
+        return {"dict": [[_encode(k), _encode(v)] for k, v in value.items()]}
+    if isinstance(value, tuple):
+        return {"tuple": [_encode(v) for v in value]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    return value
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if isinstance(value, dict):
+        if "enum" in value:
+            return getattr(enums, value["enum"])(value["value"])
+        if "dict" in value:
+            return {_decode(k): _decode(v) for k, v in value["dict"]}
+        return tuple(_decode(v) for v in value["tuple"])
+    return value
+
+def _replace(record: Packet, **fields) -> Packet:
+    """A copy of a table record with some fields changed."""
+    record = copy.copy(record)
+    for name, value in fields.items():
+        setattr(record, name, value)
+    return record
+
+def _encode_packet(packet: Packet | None) -> dict | None:
+    if packet is None:
+        return None
+    fields = inspect.signature(type(packet).__init__).parameters
+    return {"packet": type(packet).__name__, "fields": {name: _encode(getattr(packet, name)) for name in fields if name != "self"}}
+
+def _decode_packet(data: dict | None) -> Packet | None:
+    if data is None:
+        return None
+    return getattr(packets, data["packet"])(**{name: _decode(value) for name, value in data["fields"].items()})
+
+class GameState:
+    """Server, client and company tables kept up to date from the received packets.
+
+    The tables hold a copy of the latest info packet per id, updates replace it with an updated copy.
+    Records are never changed in place, so packets given to handlers stay as they were received.
+    During a resync, the client and company info polled from the server is compared with the tables,
+    end_resync then returns synthetic packets for everything that changed in between.
+
+    The tables can be saved to a snapshot and loaded at startup. Loaded tables are provisional until the next resync ends,
+    they are dropped if the WelcomePacket shows a different map or seed than the snapshot was taken of.
+
+    The economy table is also ranked in leaderboards, which are updated with every CompanyEconomyPacket.
+
+    A new game clears the company tables and moves every client to SPECTATOR, as the companies they were in are gone.
+    AdminProtocol resyncs once the new game is welcomed, dropping the clients that did not rejoin.
+    """
+    def __init__(self):
+        self.server_protocol: ProtocolPacket | None = None
+        self.welcome: WelcomePacket | None = None
+        self.date: int | None = None
+        self.clients: dict[int, ClientInfoPacket] = {}
+        self.companies: dict[int, CompanyInfoPacket] = {}
+        self.economy: dict[int, CompanyEconomyPacket] = {}
+        self.leaderboards = Leaderboards()
+
+        self.provisional = False
+        self._resyncing = False
+        self._seen_clients: set[int] = set()
+        self._seen_companies: set[int] = set()
+        self._previous_clients: set[int] = set()
+        self._previous_companies: set[int] = set()
+
+    def apply(self, packet: Packet) -> None:
+        """Update the tables with a packet.
+
+        - packet (Packet): The received packet.
+        """
+        cls = type(packet)
+        if cls is DatePacket:
+            self.date = packet.date
+        elif cls is ClientInfoPacket:
+            self.clients[packet.id] = copy.copy(packet)
+            if self._resyncing:
+                self._seen_clients.add(packet.id)
+        elif cls is ClientUpdatePacket:
+            client = self.clients.get(packet.id)
+            if client is not None:
+                self.clients[packet.id] = _replace(client, name = packet.name, company_id = packet.company_id)
+        elif cls is ClientQuitPacket or cls is ClientErrorPacket:
+            self.clients.pop(packet.id, None)
+        elif cls is ClientJoinPacket:
+            if self._resyncing:
+                # joined while resyncing, this is not a change missed while disconnected
+                self._previous_clients.add(packet.id)
+        elif cls is CompanyInfoPacket:
+            self.companies[packet.id] = copy.copy(packet)
+            if self._resyncing:
+                self._seen_companies.add(packet.id)
+        elif cls is CompanyUpdatePacket:
+            company = self.companies.get(packet.id)
+            if company is not None:
+                self.companies[packet.id] = _replace(
+                    company,
+                    name = packet.name,
+                    manager_name = packet.manager_name,
+                    color = packet.color,
+                    passworded = packet.passworded,
+                    quarters_to_bankruptcy = packet.quarters_to_bankruptcy
+                )
+        elif cls is CompanyNewPacket:
+            if self._resyncing:
+                self._previous_companies.add(packet.id)
+                self._seen_companies.add(packet.id)
+        elif cls is CompanyRemovePacket:
+            self.companies.pop(packet.id, None)
+            self.economy.pop(packet.id, None)
+            self.leaderboards.remove(packet.id)
+        elif cls is CompanyEconomyPacket:
+            self.economy[packet.id] = packet
+            self.leaderboards.update(packet)
+        elif cls is WelcomePacket:
+            if self.provisional and self.welcome is not None and (packet.seed, packet.map_name) != (self.welcome.seed, self.welcome.map_name):
+                # the snapshot is of another game, the polls of the resync fill the tables from scratch
+                self.clients.clear()
+                self.companies.clear()
+                self.economy.clear()
+                self.leaderboards.clear()
+                self.date = None
+                self._resyncing = False
+            self.welcome = packet
+        elif cls is ProtocolPacket:
+            self.server_protocol = packet
+        elif cls is NewGamePacket:
+            self.companies.clear()
+            self.economy.clear()
+            self.leaderboards.clear()
+            self.date = None
+            for id, client in self.clients.items():
+                self.clients[id] = _replace(client, company_id = SPECTATOR)
+
+    def begin_resync(self) -> None:
+        """Start comparing the tables with the client and company info that is polled next."""
+        self._resyncing = True
+        self._previous_clients = set(self.clients)
+        self._previous_companies = set(self.companies)
+        self._seen_clients = set()
+        self._seen_companies = set()
+
+    def end_resync(self) -> list[Packet]:
+        """Finish a resync, dropping the clients and companies that were not seen.
+
+        Returns:
+        - list[Packet]: Synthetic ClientQuitPacket, ClientJoinPacket, CompanyRemovePacket and CompanyNewPacket
+            for the changes that happened since begin_resync was called. CompanyRemovePacket uses ADMIN_CRR_END as the reason is unknown.
+        """
+        self.provisional = False
+        if not self._resyncing:
+            return []
+        self._resyncing = False
+
+        packets: list[Packet] = []
+        for id in [id for id in self.clients if id not in self._seen_clients]:
+            del self.clients[id]
+            packets.append(ClientQuitPacket(id))
+        for id in self._seen_clients - self._previous_clients:
+            packets.append(ClientJoinPacket(id))
+
+        for id in [id for id in self.companies if id not in self._seen_companies]:
+            del self.companies[id]
+            self.economy.pop(id, None)
+            self.leaderboards.remove(id)
+            packets.append(CompanyRemovePacket(id, AdminCompanyRemoveReason.ADMIN_CRR_END))
+        for id in self._seen_companies - self._previous_companies:
+            packets.append(CompanyNewPacket(id))
+
+        for packet in packets:
+            packet.synthetic = True
+        return packets
+
+    def to_dict(self) -> dict:
+        """The tables as JSON compatible data, see from_dict."""
+        return {
+            "version": SNAPSHOT_VERSION,
+            "server_protocol": _encode_packet(self.server_protocol),
+            "welcome": _encode_packet(self.welcome),
+            "date": self.date,
+            "clients": [_encode_packet(client) for client in self.clients.values()],
+            "companies": [_encode_packet(company) for company in self.companies.values()],
+            "economy": [_encode_packet(economy) for economy in self.economy.values()],
+        }
+
+    def from_dict(self, data: dict) -> None:
+        """Replace the tables with data made by to_dict, the tables are provisional until the next resync ends.
+
+        - data (dict): The snapshot data.
+        """
+        if data.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {data.get('version')}")
+
+        # decode everything before replacing anything, so a broken snapshot leaves the tables alone
+        server_protocol = _decode_packet(data["server_protocol"])
+        welcome = _decode_packet(data["welcome"])
+        clients = {client.id: client for client in map(_decode_packet, data["clients"])}
+        companies = {company.id: company for company in map(_decode_packet, data["companies"])}
+        economy = {economy.id: economy for economy in map(_decode_packet, data["economy"])}
+
+        self.server_protocol = server_protocol
+        self.welcome = welcome
+        self.date = data["date"]
+        self.clients = clients
+        self.companies = companies
+        self.economy = economy
+        self.leaderboards.rebuild(economy.values())
+        self.provisional = True
+
+    def save(self, path: str | os.PathLike) -> None:
+        """Write a snapshot of the tables to a file.
+
+        - path (str | os.PathLike): The file to write.
+        """
+        path = os.fspath(path)
+        with open(path + ".tmp", "w", encoding = 'utf-8') as f:
+            json.dump(self.to_dict(), f, separators = (",", ":"))
+        os.replace(path + ".tmp", path)
+
+    def load(self, path: str | os.PathLike) -> bool:
+        """Load a snapshot written by save, the tables are provisional until the next resync ends.
+
+        - path (str | os.PathLike): The file to read.
+
+        Returns:
+        - bool: True if the snapshot was loaded, False if it is missing or unreadable.
+        """
+        try:
+            with open(path, encoding = 'utf-8') as f:
+                data = json.load(f)
+            self.from_dict(data)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return False
+        return True
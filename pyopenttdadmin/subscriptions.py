@@ -0,0 +1,71 @@
+from typing import Iterable
+
+from .enums import *
+from .packet import *
+
+# The update type a packet is sent for, packets that are always sent are not listed.
+PACKET_UPDATE_TYPES: dict[type[Packet], AdminUpdateType] = {
+    DatePacket: AdminUpdateType.DATE,
+    ClientJoinPacket: AdminUpdateType.CLIENT_INFO,
+    ClientInfoPacket: AdminUpdateType.CLIENT_INFO,
+    ClientUpdatePacket: AdminUpdateType.CLIENT_INFO,
+    ClientQuitPacket: AdminUpdateType.CLIENT_INFO,
+    ClientErrorPacket: AdminUpdateType.CLIENT_INFO,
+    CompanyNewPacket: AdminUpdateType.COMPANY_INFO,
+    CompanyInfoPacket: AdminUpdateType.COMPANY_INFO,
+    CompanyUpdatePacket: AdminUpdateType.COMPANY_INFO,
+    CompanyRemovePacket: AdminUpdateType.COMPANY_INFO,
+    CompanyEconomyPacket: AdminUpdateType.COMPANY_ECONOMY,
+    CompanyStatsPacket: AdminUpdateType.COMPANY_STATS,
+    ChatPacket: AdminUpdateType.CHAT,
+    ConsolePacket: AdminUpdateType.CONSOLE,
+    CmdNamesPacket: AdminUpdateType.CMD_NAMES,
+    CmdLoggingPacket: AdminUpdateType.CMD_LOGGING,
+    GameScriptPacket: AdminUpdateType.GAMESCRIPT,
+}
+
+# The frequency used for a handler that does not ask for one.
+DEFAULT_UPDATE_FREQUENCIES: dict[AdminUpdateType, AdminUpdateFrequency] = {
+    AdminUpdateType.DATE: AdminUpdateFrequency.DAILY,
+    AdminUpdateType.CLIENT_INFO: AdminUpdateFrequency.AUTOMATIC,
+    AdminUpdateType.COMPANY_INFO: AdminUpdateFrequency.AUTOMATIC,
+    AdminUpdateType.COMPANY_ECONOMY: AdminUpdateFrequency.MONTHLY,
+    AdminUpdateType.COMPANY_STATS: AdminUpdateFrequency.MONTHLY,
+    AdminUpdateType.CHAT: AdminUpdateFrequency.AUTOMATIC,
+    AdminUpdateType.CONSOLE: AdminUpdateFrequency.AUTOMATIC,
+    AdminUpdateType.CMD_NAMES: AdminUpdateFrequency.POLL,
+    AdminUpdateType.CMD_LOGGING: AdminUpdateFrequency.AUTOMATIC,
+    AdminUpdateType.GAMESCRIPT: AdminUpdateFrequency.AUTOMATIC,
+}
+
+def plan_subscriptions(requests: Iterable[tuple[type[Packet], AdminUpdateFrequency | None]]) -> dict[AdminUpdateType, AdminUpdateFrequency]:
+    """Work out the subscriptions needed to receive the requested packets.
+
+    Per update type the most frequent requested frequency wins. Update types that are only requested with
+    AdminUpdateFrequency.POLL, or that can only be polled, are left out as they need no subscription.
+
+    - requests (Iterable[tuple[type[Packet], AdminUpdateFrequency | None]]): The packet classes with the frequency they are wanted at, None for the default frequency.
+
+    Returns:
+    - dict[AdminUpdateType, AdminUpdateFrequency]: The frequency to subscribe at for each update type.
+    """
+    plan: dict[AdminUpdateType, AdminUpdateFrequency] = {}
+    for packet_type, frequency in requests:
+        update_type = PACKET_UPDATE_TYPES.get(packet_type)
+        if update_type is None:
+            continue
+
+        if frequency is None:
+            frequency = DEFAULT_UPDATE_FREQUENCIES[update_type]
+        elif frequency not in AdminUpdateTypeFrequencyMatrix[update_type]:
+            raise ValueError(f"Invalid frequency ({frequency}) for {update_type}")
+
+        if frequency is AdminUpdateFrequency.POLL:
+            continue
+
+        # the periodic frequencies are ordered by value, AUTOMATIC never shares an update type with them
+        current = plan.get(update_type)
+        if current is None or frequency.value < current.value:
+            plan[update_type] = frequency
+
+    return plan
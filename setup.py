@@ -5,6 +5,7 @@ setup(
     version = '1.0.3',
     packages = ['pyopenttdadmin', 'aiopyopenttdadmin'],
     install_requires = [],  # Add any dependencies here
+    extras_require = {'orjson': ['orjson'], 'sortedcontainers': ['sortedcontainers'], 'numpy': ['numpy']},  # faster GameScript JSON, O(log n) leaderboard updates, bulk date conversion
     author = 'liki-mc',
     description = 'Python library to communicate with OpenTTD Admin port',
     long_description = open('README.md').read(),
@@ -0,0 +1,119 @@
+"""A scripted stand-in for the admin port of an OpenTTD server, and the frames it sends."""
+import socket
+import struct
+import threading
+
+from pyopenttdadmin.enums import PacketType
+
+def frame(packet_type: PacketType, payload: bytes = b"") -> bytes:
+    return struct.pack("<HB", len(payload) + 3, packet_type.value) + payload
+
+def string(text: str) -> bytes:
+    return text.encode() + b"\0"
+
+def protocol() -> bytes:
+    return frame(PacketType.SERVER_PROTOCOL, bytes([3, 0]))
+
+def shutdown() -> bytes:
+    return frame(PacketType.SERVER_SHUTDOWN)
+
+def welcome(version: str = "14.0") -> bytes:
+    return frame(
+        PacketType.SERVER_WELCOME,
+        string("server") + string(version) + b"\1" + string("map") + struct.pack("<IBIHH", 1, 0, 700000, 256, 256)
+    )
+
+def new_game() -> bytes:
+    return frame(PacketType.SERVER_NEWGAME)
+
+def date(value: int) -> bytes:
+    return frame(PacketType.SERVER_DATE, struct.pack("<I", value))
+
+def chat(message: str, client_id: int = 1) -> bytes:
+    return frame(PacketType.SERVER_CHAT, bytes([3, 0]) + struct.pack("<I", client_id) + string(message) + struct.pack("<q", 0))
+
+def client_info(client_id: int, name: str = "player", company_id: int = 255, ip: str = "127.0.0.1") -> bytes:
+    return frame(
+        PacketType.SERVER_CLIENT_INFO,
+        struct.pack("<I", client_id) + string(ip) + string(name) + bytes([0]) + struct.pack("<I", 700000) + bytes([company_id])
+    )
+
+def client_update(client_id: int, name: str = "player", company_id: int = 255) -> bytes:
+    return frame(PacketType.SERVER_CLIENT_UPDATE, struct.pack("<I", client_id) + string(name) + bytes([company_id]))
+
+def client_quit(client_id: int) -> bytes:
+    return frame(PacketType.SERVER_CLIENT_QUIT, struct.pack("<I", client_id))
+
+def company_info(company_id: int, name: str = "Company") -> bytes:
+    return frame(
+        PacketType.SERVER_COMPANY_INFO,
+        bytes([company_id]) + string(name) + string("Manager") + bytes([0, 0]) + struct.pack("<I", 1950) + bytes([0, 0])
+    )
+
+def company_update(company_id: int, name: str = "Company") -> bytes:
+    return frame(PacketType.SERVER_COMPANY_UPDATE, bytes([company_id]) + string(name) + string("Manager") + bytes([0, 0, 0]))
+
+def company_remove(company_id: int) -> bytes:
+    return frame(PacketType.SERVER_COMPANY_REMOVE, bytes([company_id, 0]))
+
+def company_economy(company_id: int, money: int) -> bytes:
+    payload = bytes([company_id]) + struct.pack("<qQqH", money, 0, 0, 0) + struct.pack("<qHH", 0, 0, 0) * 2
+    return frame(PacketType.SERVER_COMPANY_ECONOMY, payload)
+
+def console(origin: str, message: str) -> bytes:
+    return frame(PacketType.SERVER_CONSOLE, string(origin) + string(message))
+
+def gamescript(json: str) -> bytes:
+    return frame(PacketType.SERVER_GAMESCRIPT, string(json))
+
+def pong(token: int) -> bytes:
+    return frame(PacketType.SERVER_PONG, struct.pack("<I", token))
+
+def cmd_names(names: dict[int, str]) -> bytes:
+    payload = b"".join(b"\1" + struct.pack("<H", id) + string(name) for id, name in names.items())
+    return frame(PacketType.SERVER_CMD_NAMES, payload + b"\0")
+
+def cmd_logging(client_id: int, company_id: int, cmd: int, data: bytes, frame_number: int = 0) -> bytes:
+    return frame(
+        PacketType.SERVER_CMD_LOGGING,
+        struct.pack("<IBHH", client_id, company_id, cmd, len(data)) + data + struct.pack("<I", frame_number)
+    )
+
+class Server:
+    """Listens on a free local port and runs script(conn) for every connection in a thread.
+
+    The frames received from the admin are kept in received, as (packet type byte, payload).
+    """
+    def __init__(self, script):
+        self.script = script
+        self.received: list[tuple[int, bytes]] = []
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target = self._accept, daemon = True).start()
+
+    def close(self):
+        self.sock.close()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target = self._read, args = (conn,), daemon = True).start()
+            threading.Thread(target = self.script, args = (conn,), daemon = True).start()
+
+    def _read(self, conn: socket.socket):
+        buffer = b""
+        while True:
+            try:
+                data = conn.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            buffer += data
+            while len(buffer) >= 2 and len(buffer) >= int.from_bytes(buffer[:2], "little"):
+                size = int.from_bytes(buffer[:2], "little")
+                self.received.append((buffer[2], buffer[3:size]))
+                buffer = buffer[size:]
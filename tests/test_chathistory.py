@@ -0,0 +1,55 @@
+import random
+
+from pyopenttdadmin.chathistory import ChatHistory
+from pyopenttdadmin.enums import Actions
+from pyopenttdadmin.packet import ChatPacket, DatePacket, NewGamePacket
+
+def test_eviction_keeps_indexes_consistent():
+    history = ChatHistory(max_entries = 100)
+    for i in range(1000):
+        history.add(i % 7, Actions.CHAT, f"message {i} word{i % 13}", now = float(i))
+
+    assert len(history) == 100
+    assert [entry.seq for entry in history.search("word3")] == [i for i in range(900, 1000) if i % 13 == 3]
+    assert [entry.seq for entry in history.search(client_id = 2, limit = 3)] == [i for i in range(900, 1000) if i % 7 == 2][-3:]
+    assert history.search("message", since = 990.0, until = 995.0) == history.search(since = 990.0, until = 995.0)
+    # words and clients that only occurred in evicted messages are gone from the indexes
+    assert history.search("word3", client_id = 2, until = 900.0) == []
+    assert len(history._tokens) == 100 + 13 + 1
+
+def test_dates_going_back_on_new_game():
+    history = ChatHistory()
+    for date in (100, 101, 102):
+        history.listener(DatePacket(date))
+        history.listener(ChatPacket(Actions.CHAT, 0, 1, f"old {date}", 0))
+    history.listener(NewGamePacket(b""))
+    history.listener(ChatPacket(Actions.CHAT, 0, 1, "no date yet", 0))
+    for date in (10, 101):
+        history.listener(DatePacket(date))
+        history.listener(ChatPacket(Actions.CHAT, 0, 1, f"new {date}", 0))
+
+    def messages(**conditions):
+        return [entry.message for entry in history.search(**conditions)]
+
+    assert messages(date_from = 101) == ["old 101", "old 102", "new 101"]
+    assert messages(date_to = 100) == ["old 100", "no date yet", "new 10"]
+    assert messages(date_from = 50, date_to = 101) == ["old 100", "old 101", "new 101"]
+    assert messages(text = "new", date_to = 50) == ["new 10"]
+
+def test_search_matches_a_linear_scan():
+    rng = random.Random(1)
+    history = ChatHistory(max_entries = 500)
+    entries = []
+    date = 0
+    for i in range(3000):
+        # mostly forward, sometimes a new game
+        date = rng.randrange(5) if rng.random() < 0.01 else date + rng.randrange(3)
+        history.date = date
+        entries.append(history.add(rng.randrange(5), Actions.CHAT, f"w{rng.randrange(20)} w{rng.randrange(20)}", now = float(i)))
+
+    live = entries[-500:]
+    for _ in range(200):
+        date_from, date_to = sorted(rng.sample(range(40), 2))
+        word = f"w{rng.randrange(20)}"
+        expected = [entry for entry in live if date_from <= entry.date <= date_to and word in entry.tokens]
+        assert history.search(word, date_from = date_from, date_to = date_to) == expected
@@ -0,0 +1,59 @@
+import os
+
+from fakeserver import cmd_logging, cmd_names, pong, welcome
+
+from pyopenttdadmin.enums import PacketType
+from pyopenttdadmin.packet import CmdLoggingPacket, PongPacket
+from pyopenttdadmin.protocol import AdminProtocol
+
+def sent_types(protocol: AdminProtocol) -> list[int]:
+    data = protocol.data_to_send()
+    types = []
+    while data:
+        types.append(data[2])
+        data = data[int.from_bytes(data[:2], "little"):]
+    return types
+
+def ping_token(protocol: AdminProtocol) -> int:
+    return protocol._ping_token
+
+def test_names_are_polled_without_cache():
+    protocol = AdminProtocol()
+    protocol.receive_data(welcome())
+    assert sent_types(protocol) == [PacketType.ADMIN_POLL.value, PacketType.ADMIN_PING.value]
+
+    protocol.receive_data(cmd_names({0: "CmdBuildRailroadTrack", 1: "CmdGiveMoney"}) + pong(ping_token(protocol)))
+    protocol.receive_data(cmd_logging(1, 0, 1, b""))
+    packets = protocol.packets()
+    assert [packet.name for packet in packets if isinstance(packet, CmdLoggingPacket)] == ["CmdGiveMoney"]
+    assert protocol.command_names.complete
+
+def test_cache_is_written_once_complete(tmp_path):
+    protocol = AdminProtocol(cmd_names_cache = tmp_path)
+    protocol.receive_data(welcome("14.1"))
+    token = ping_token(protocol)
+    protocol.receive_data(cmd_names({0: "CmdBuildRailroadTrack"}))
+    assert os.listdir(tmp_path) == []
+
+    # the connection drops before the rest of the table arrives
+    protocol.reconnected()
+    protocol.receive_data(welcome("14.1"))
+    assert PacketType.ADMIN_POLL.value in sent_types(protocol)
+    assert ping_token(protocol) != token
+
+    protocol.receive_data(cmd_names({0: "CmdBuildRailroadTrack"}) + cmd_names({1: "CmdGiveMoney"}))
+    assert os.listdir(tmp_path) == []
+    protocol.receive_data(pong(ping_token(protocol)))
+    assert len(os.listdir(tmp_path)) == 1
+
+    cached = AdminProtocol(cmd_names_cache = tmp_path)
+    cached.receive_data(welcome("14.1"))
+    assert sent_types(cached) == []
+    assert cached.command_names.name(1) == "CmdGiveMoney"
+
+def test_pong_of_other_pings_does_not_finish_the_table():
+    protocol = AdminProtocol()
+    protocol.receive_data(welcome())
+    protocol.receive_data(cmd_names({0: "CmdBuildRailroadTrack"}) + pong(ping_token(protocol) + 1))
+    assert not protocol.command_names.complete
+    assert any(isinstance(packet, PongPacket) for packet in protocol.packets())
@@ -0,0 +1,36 @@
+import struct
+
+import pytest
+
+from fakeserver import cmd_logging, cmd_names, pong, welcome
+
+from pyopenttdadmin.cmdschemas import CommandSchema, STRING
+from pyopenttdadmin.packet import CmdLoggingPacket
+from pyopenttdadmin.protocol import AdminProtocol
+
+# ids as a 14.x server numbers them, the names are those of the command handlers
+NAMES = {0: "CmdBuildRailroadTrack", 1: "CmdRemoveRailroadTrack", 86: "CmdGiveMoney", 87: "CmdRenameCompany"}
+
+def logged(data: bytes) -> list[CmdLoggingPacket]:
+    protocol = AdminProtocol()
+    protocol.receive_data(welcome())
+    protocol.receive_data(cmd_names(NAMES) + pong(protocol._ping_token) + data)
+    return [packet for packet in protocol.packets() if isinstance(packet, CmdLoggingPacket)]
+
+def test_args_decode_with_server_names():
+    packets = logged(
+        cmd_logging(3, 0, 86, struct.pack("<qB", 50000, 2))
+        + cmd_logging(3, 0, 87, b"Transport Co\0")
+        + cmd_logging(3, 0, 1, b"\0" * 10)
+    )
+    assert [packet.name for packet in packets] == ["CmdGiveMoney", "CmdRenameCompany", "CmdRemoveRailroadTrack"]
+    assert packets[0].args == {"money": 50000, "dest_company": 2}
+    assert packets[1].args == {"text": "Transport Co"}
+    # no schema registered
+    assert packets[2].args is None
+
+def test_payload_not_matching_schema():
+    schema = CommandSchema([("tile", "I"), ("text", STRING)])
+    assert schema.decode(struct.pack("<I", 7) + b"abc\0") == {"tile": 7, "text": "abc"}
+    with pytest.raises(ValueError):
+        schema.decode(struct.pack("<I", 7) + b"abc")
@@ -0,0 +1,38 @@
+from pyopenttdadmin.coalesce import Coalescer
+from pyopenttdadmin.packet import ChatPacket, CompanyUpdatePacket
+from pyopenttdadmin.protocol import AdminProtocol
+
+def update(id: int, name: str) -> CompanyUpdatePacket:
+    return CompanyUpdatePacket(id, name, "Manager", 0, False, 0)
+
+def test_latest_packet_per_id_after_the_window():
+    coalescer = Coalescer(0.25)
+    assert coalescer.offer(update(1, "a"), 0.0)
+    assert not coalescer.offer(update(1, "b"), 0.1)
+    assert not coalescer.offer(update(1, "c"), 0.2)
+    # other ids have their own window
+    assert coalescer.offer(update(2, "x"), 0.2)
+
+    assert coalescer.next_deadline() == 0.25
+    assert coalescer.due(0.24) == []
+    assert [packet.name for packet in coalescer.due(0.25)] == ["c"]
+    assert coalescer.next_deadline() is None
+    # the window starts again at the delivery of the held back packet
+    assert not coalescer.offer(update(1, "d"), 0.4)
+    assert coalescer.next_deadline() == 0.5
+    assert [packet.name for packet in coalescer.due(0.5)] == ["d"]
+
+def test_only_coalescing_handlers_are_held_back():
+    protocol = AdminProtocol()
+    def every(admin, packet): ...
+    def debounced(admin, packet): ...
+    protocol.add_handler(every, [CompanyUpdatePacket])
+    protocol.add_handler(debounced, [CompanyUpdatePacket], coalesce = 1.0)
+
+    assert protocol.handlers_for(update(1, "a"), 0.0) == [every, debounced]
+    assert protocol.handlers_for(update(1, "b"), 0.5) == [every]
+    assert protocol.handlers_for(update(1, "c"), 0.6) == [every]
+    assert protocol.next_deadline() == 1.0
+    assert [(handler, packet.name) for handler, packet in protocol.due(1.0)] == [(debounced, "c")]
+    # packet types without handlers are not coalesced
+    assert protocol.handlers_for(ChatPacket(0, 0, 1, "hi", 0), 1.1) == []
@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from fakeserver import Server, chat, protocol, shutdown
+
+from pyopenttdadmin import Admin
+from pyopenttdadmin.commands import CommandRouter
+
+def func(*args): ...
+
+def test_deepest_command_wins():
+    router = CommandRouter(prefixes = ("!", "!!"))
+    rcon = router.add("rcon", func)
+    kick = router.add("rcon kick", func)
+
+    assert router.match("!RCON Kick 5 spam") == (kick, ["5", "spam"])
+    assert router.match("!!rcon pause") == (rcon, ["pause"])
+    assert router.match("!help") is None
+    assert router.match("rcon kick") is None
+    with pytest.raises(ValueError):
+        router.add("Rcon  kick", func)
+
+    router.remove("rcon kick")
+    assert router.match("!rcon kick 5") == (rcon, ["kick", "5"])
+    router.remove("rcon")
+    assert router._root == {} and len(router) == 0
+
+def test_cooldown_per_client():
+    router = CommandRouter()
+    router.add("help", func, cooldown = 10.0)
+    assert router.dispatch("!help", 1, 0.0) is not None
+    assert router.dispatch("!help", 1, 5.0) is None
+    assert router.dispatch("!help", 2, 5.0) is not None
+    assert router.dispatch("!help", 1, 10.0) is not None
+
+def test_admin_commands():
+    def script(conn):
+        conn.sendall(protocol() + chat("hello") + chat("!greet big world", client_id = 7) + shutdown())
+        time.sleep(1)
+
+    server = Server(script)
+    calls = []
+    try:
+        with Admin(port = server.port) as admin:
+            @admin.add_command("greet")
+            def greet(admin, packet, *args):
+                calls.append((packet.id, args))
+
+            admin.run()
+    finally:
+        server.close()
+    assert calls == [(7, ("big", "world"))]
@@ -0,0 +1,75 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+from fakeserver import Server, chat, protocol, shutdown
+
+import aiopyopenttdadmin
+from pyopenttdadmin import Admin
+from pyopenttdadmin.connection import ConnectionOptions, ReadSizer
+
+def test_read_size_follows_traffic():
+    sizer = ReadSizer(1024, 8192)
+    for expected in (2048, 4096, 8192, 8192):
+        sizer.update(sizer.size)
+        assert sizer.size == expected
+    # a read more than a quarter full keeps the size
+    sizer.update(4096)
+    assert sizer.size == 8192
+    for expected in (4096, 2048, 1024, 1024):
+        sizer.update(0)
+        assert sizer.size == expected
+
+def test_options():
+    with pytest.raises(ValueError):
+        ConnectionOptions(min_read = 4096, max_read = 1024)
+
+    options = ConnectionOptions(recv_buffer = 65536, keepalive = True, keepalive_idle = 30)
+    server = socket.create_server(("127.0.0.1", 0))
+    try:
+        with socket.create_connection(server.getsockname()) as sock:
+            options.apply(sock)
+            assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+            assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+            # Linux doubles the requested size for its bookkeeping
+            assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) >= 65536
+    finally:
+        server.close()
+
+def burst(conn):
+    # enough chat to fill several reads
+    conn.sendall(protocol() + b"".join(chat("x" * 200) for _ in range(400)) + shutdown())
+    time.sleep(1)
+
+def check_metrics(metrics):
+    assert metrics.packets == 402
+    assert metrics.bytes_received > 400 * 200
+    assert 0 < metrics.reads < metrics.packets
+    assert 1024 <= metrics.read_size <= 65536
+    assert 0 < metrics.syscalls_per_packet() < 1
+
+def test_sync_metrics():
+    server = Server(burst)
+    try:
+        with Admin(port = server.port) as admin:
+            admin.send_rcon("pause")
+            admin.run()
+            assert admin.metrics.writes == 1 and admin.metrics.bytes_sent > 0
+            check_metrics(admin.metrics)
+    finally:
+        server.close()
+
+def test_async_metrics():
+    server = Server(burst)
+
+    async def main():
+        async with aiopyopenttdadmin.Admin(port = server.port) as admin:
+            await admin.run()
+            return admin.metrics
+
+    try:
+        check_metrics(asyncio.run(main()))
+    finally:
+        server.close()
@@ -0,0 +1,63 @@
+import re
+import time
+
+from fakeserver import Server, console, protocol, shutdown
+
+from pyopenttdadmin import Admin
+from pyopenttdadmin.console import ConsoleRouter, literal_prefix
+
+def func(*args): ...
+
+def test_literal_prefix():
+    assert literal_prefix(r"^\[net\] joined") == ""
+    assert literal_prefix(r"Client (\d+) joined") == "Client "
+    assert literal_prefix(r"^Autosave (\w+)") == "Autosave "
+    assert literal_prefix(r"Games?") == "Game"
+    assert literal_prefix(r"ab|cd") == ""
+    assert literal_prefix("x" * 40) == "x" * 16
+
+def test_routes_match_in_order():
+    router = ConsoleRouter()
+    joined = router.add(r"Client (\d+) joined", func)
+    any_client = router.add(r"Client", func, origin = "net")
+    number = router.add(r"\d+ players", func)
+    ignored = router.add(re.compile(r"client", re.IGNORECASE), func)
+
+    assert [route for route, _ in router.match("net", "Client 5 joined")] == [joined, any_client, ignored]
+    assert [route for route, _ in router.match("console", "Client 5 joined")] == [joined, ignored]
+    matches = router.match("net", "12 players online")
+    assert [route for route, _ in matches] == [number]
+    assert router.match("net", "Client 5 joined")[0][1].groups() == ("5",)
+    assert router.match("net", "the server said Client") == []
+
+    router.remove(any_client)
+    router.remove(ignored)
+    assert [route for route, _ in router.match("net", "Client 5 joined")] == [joined]
+    assert [route for route, _ in router.match("net", "3 players")] == [number]
+    assert len(router) == 2
+
+def test_fallback_patterns_that_cannot_be_combined():
+    router = ConsoleRouter()
+    first = router.add(r"(?P<word>\w+) (?P=word)", func)
+    second = router.add(r"(?P<word>\d+)!", func)
+    assert router._combined is True
+    assert [route for route, _ in router.match("net", "hey hey")] == [first]
+    assert [route for route, _ in router.match("net", "42!")] == [second]
+
+def test_admin_console_handler():
+    def script(conn):
+        conn.sendall(protocol() + console("net", "Client 3 joined") + console("script", "Client 4 joined") + shutdown())
+        time.sleep(1)
+
+    server = Server(script)
+    calls = []
+    try:
+        with Admin(port = server.port) as admin:
+            @admin.add_console_handler(r"Client (\d+) joined", origin = "net")
+            def joined(admin, packet, id):
+                calls.append(int(id))
+
+            admin.run()
+    finally:
+        server.close()
+    assert calls == [3]
@@ -0,0 +1,40 @@
+import datetime
+import random
+import sys
+
+import pytest
+
+from pyopenttdadmin import dates
+
+def test_known_dates():
+    assert dates.to_ymd(0) == (0, 1, 1)
+    assert dates.to_ymd(dates.DAYS_TILL_ORIGINAL_BASE_YEAR) == (1920, 1, 1)
+    assert dates.from_ymd(1950, 3, 14) == dates.from_date(datetime.date(1950, 3, 14))
+    assert dates.to_ymd(dates.from_ymd(2000, 2, 29)) == (2000, 2, 29)
+    assert dates.to_ymd(dates.from_ymd(1900, 3, 1) - 1) == (1900, 2, 28)
+    assert dates.days_till(401) - dates.days_till(1) == dates.DAYS_IN_400_YEARS
+    assert dates.is_leap_year(0) and dates.is_leap_year(2000) and not dates.is_leap_year(1900)
+
+def test_matches_datetime():
+    rng = random.Random(11)
+    for _ in range(2000):
+        day = datetime.date.fromordinal(rng.randrange(1, datetime.date.max.toordinal()))
+        date = dates.from_date(day)
+        assert dates.to_date(date) == day
+        assert dates.to_ymd(date) == (day.year, day.month, day.day)
+        assert dates.from_ymd(day.year, day.month, day.day) == date
+
+def test_arrays_match_scalars():
+    np = pytest.importorskip("numpy")
+    values = np.random.default_rng(5).integers(0, 5_000_000, size = (50, 4))
+    years, months, days = dates.to_ymd_array(values)
+    assert years.shape == months.shape == days.shape == values.shape
+    for date, year, month, day in zip(values.flat, years.flat, months.flat, days.flat):
+        assert dates.to_ymd(int(date)) == (year, month, day)
+    assert (dates.from_ymd_array(years, months, days) == values).all()
+
+def test_arrays_need_numpy(monkeypatch):
+    # a None entry makes the import fail
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    with pytest.raises(ImportError, match = "pyOpenTTDAdmin\\[numpy\\]"):
+        dates.to_ymd_array([0])
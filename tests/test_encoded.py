@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import pytest
+
+from fakeserver import Server, protocol, shutdown
+
+import aiopyopenttdadmin
+from pyopenttdadmin import Admin
+from pyopenttdadmin.enums import PacketType
+from pyopenttdadmin.packet import AdminChatPacket, AdminRconPacket
+from pyopenttdadmin.protocol import ENCODE_CACHE_SIZE, AdminProtocol, EncodedPacket, _chat_frame, _rcon_frame
+
+def test_encoded_packet_is_sent_as_is():
+    packet = EncodedPacket(AdminChatPacket("Rules: be nice"))
+    assert packet.data == AdminProtocol.encode(AdminChatPacket("Rules: be nice"))
+    assert packet.packet_type is PacketType.ADMIN_CHAT and len(packet) == len(packet.data)
+    with pytest.raises(AttributeError):
+        packet.data = b""
+
+    first, second = AdminProtocol(), AdminProtocol()
+    first.send(packet)
+    second.send(packet)
+    second.send(packet)
+    assert first.data_to_send() == packet.data
+    assert second.data_to_send() == packet.data * 2
+
+def test_frames_of_repeated_sends_are_reused():
+    _rcon_frame.cache_clear()
+    _chat_frame.cache_clear()
+    protocol = AdminProtocol()
+    for _ in range(3):
+        protocol.rcon("pause")
+        protocol.chat("hi")
+    assert _rcon_frame.cache_info().hits == 2 and _chat_frame.cache_info().hits == 2
+    assert _rcon_frame("pause") is _rcon_frame("pause")
+
+    for i in range(ENCODE_CACHE_SIZE + 1):
+        protocol.rcon(f"say {i}")
+    assert _rcon_frame.cache_info().currsize == ENCODE_CACHE_SIZE
+    assert protocol.data_to_send().endswith(AdminProtocol.encode(AdminRconPacket(f"say {ENCODE_CACHE_SIZE}")))
+
+def encoded_server() -> Server:
+    def script(conn):
+        conn.sendall(protocol())
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and len(server.received) < 2:
+            time.sleep(0.01)
+        conn.sendall(shutdown())
+        time.sleep(1)
+
+    server = Server(script)
+    return server
+
+def test_admins_send_encoded():
+    rules = EncodedPacket(AdminChatPacket("Rules: be nice"))
+    expected = [(rules.data[2], rules.data[3:])] * 2
+
+    server = encoded_server()
+    try:
+        with Admin(port = server.port) as admin:
+            admin.send_encoded(rules)
+            admin.send_encoded(rules)
+            admin.run()
+        assert server.received == expected
+    finally:
+        server.close()
+
+    async def main():
+        async with aiopyopenttdadmin.Admin(port = server.port) as admin:
+            await admin.send_encoded(rules)
+            await admin.send_encoded(rules)
+            await admin.run()
+
+    server = encoded_server()
+    try:
+        asyncio.run(main())
+        assert server.received == expected
+    finally:
+        server.close()
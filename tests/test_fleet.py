@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+from fakeserver import Server, chat, protocol, welcome
+
+from aiopyopenttdadmin import Fleet
+from pyopenttdadmin.enums import PacketType
+from pyopenttdadmin.packet import ChatPacket
+
+def chatter(name: str):
+    def script(conn):
+        conn.sendall(protocol() + welcome())
+        for i in range(3):
+            time.sleep(0.1)
+            conn.sendall(chat(f"{name} {i}"))
+        time.sleep(3)
+    return script
+
+def chats(server: Server) -> list[bytes]:
+    return [payload for type, payload in server.received if type == PacketType.ADMIN_CHAT.value]
+
+def test_two_shards():
+    servers = {"a": Server(chatter("a")), "b": Server(chatter("b"))}
+
+    async def main(fleet: Fleet):
+        events = []
+        async def collect():
+            async for id, packet in fleet.events():
+                assert isinstance(packet, ChatPacket)
+                events.append((id, packet.message))
+
+        # metrics reports are applied while events are read
+        reader = asyncio.create_task(collect())
+        while len(events) < 6 or not all(metrics.packets >= 5 for metrics in fleet.metrics.values()):
+            await asyncio.sleep(0.05)
+        reader.cancel()
+        return events
+
+    try:
+        with Fleet([(id, "127.0.0.1", server.port, "password") for id, server in servers.items()], workers = 2, forward = [ChatPacket], report_interval = 0.1) as fleet:
+            events = asyncio.run(asyncio.wait_for(main(fleet), 10))
+            assert sorted(events) == [(id, f"{id} {i}") for id in "ab" for i in range(3)]
+
+            fleet.broadcast_global("hello all")
+            fleet.send_global("b", "hello b")
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and (len(chats(servers["a"])) < 1 or len(chats(servers["b"])) < 2):
+                time.sleep(0.05)
+        assert [b"hello all" in payload for payload in chats(servers["a"])] == [True]
+        assert [b"hello" in payload for payload in chats(servers["b"])] == [True, True]
+    finally:
+        for server in servers.values():
+            server.close()
+
+def test_unread_events_do_not_stall_the_worker():
+    def flood(conn):
+        conn.sendall(protocol() + welcome() + b"".join(chat(f"message {i}") for i in range(10000)))
+        time.sleep(5)
+
+    server = Server(flood)
+    try:
+        # the parent does not read events, the pipe fills up
+        with Fleet([("a", "127.0.0.1", server.port, "password")], workers = 1, forward = [ChatPacket]) as fleet:
+            time.sleep(0.5)
+            fleet.broadcast_rcon("pause")
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and not any(type == PacketType.ADMIN_RCON.value for type, _ in server.received):
+                time.sleep(0.05)
+        assert any(type == PacketType.ADMIN_RCON.value for type, _ in server.received)
+    finally:
+        server.close()
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from fakeserver import Server, gamescript, protocol, shutdown
+
+import aiopyopenttdadmin
+from pyopenttdadmin.enums import PacketType
+from pyopenttdadmin.gamescript import GameScriptCalls
+from pyopenttdadmin.packet import DatePacket, GameScriptPacket
+from pyopenttdadmin.protocol import AdminProtocol
+
+def test_replies_resolve_pending_calls():
+    calls = GameScriptCalls()
+    first = {"action": "score"}
+    assert calls.prepare(first) == 1 and first["id"] == 1
+    assert calls.prepare({"id": "mine"}) == "mine"
+
+    replies = []
+    calls.expect(1, replies.append)
+    with pytest.raises(ValueError):
+        calls.expect(1, replies.append)
+    calls.expect(2, replies.append)
+    calls.cancel(2)
+    calls.listener(GameScriptPacket("not json"))
+    calls.listener(GameScriptPacket('{"id": 2}'))
+    calls.listener(DatePacket(0))
+    calls.listener(GameScriptPacket('{"id": 1, "score": 5}'))
+    assert replies == [{"id": 1, "score": 5}] and not calls.pending
+
+def test_data_is_parsed_once():
+    packet = GameScriptPacket('{"a": [1, 2]}')
+    assert packet._data is None
+    assert packet.data is packet.data == {"a": [1, 2]}
+    with pytest.raises(ValueError):
+        GameScriptPacket("{").data
+
+def test_messages_are_serialised():
+    admin = AdminProtocol()
+    admin.gamescript({"a": 1})
+    admin.gamescript("raw")
+    data = admin.data_to_send()
+    assert data[2] == PacketType.ADMIN_GAMESCRIPT.value
+    assert b'{"a":1}' in data.replace(b" ", b"") and data.endswith(b"raw\0")
+
+def test_async_gamescript_call():
+    def script(conn):
+        conn.sendall(protocol())
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            messages = [payload for type, payload in server.received if type == PacketType.ADMIN_GAMESCRIPT.value]
+            if messages:
+                message = json.loads(messages[0].rstrip(b"\0"))
+                conn.sendall(gamescript(json.dumps({"id": message["id"], "score": 5})) + shutdown())
+                break
+            time.sleep(0.01)
+        time.sleep(1)
+
+    server = Server(script)
+
+    async def main():
+        async with aiopyopenttdadmin.Admin(port = server.port) as admin:
+            async def consume():
+                return [packet async for packet in admin.stream([GameScriptPacket])]
+
+            reader = asyncio.create_task(consume())
+            reply = await admin.gamescript_call({"action": "score"}, timeout = 5)
+            # the reply also reaches the stream
+            return reply, await reader
+
+    try:
+        reply, packets = asyncio.run(main())
+    finally:
+        server.close()
+    assert reply == {"id": 1, "score": 5}
+    assert [packet.data for packet in packets] == [reply]
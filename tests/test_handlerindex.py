@@ -0,0 +1,45 @@
+import pytest
+
+from pyopenttdadmin.enums import Actions, ChatDestTypes
+from pyopenttdadmin.handlerindex import HandlerIndex
+from pyopenttdadmin.packet import ChatPacket, CmdLoggingPacket, NewGamePacket
+from pyopenttdadmin.protocol import AdminProtocol
+
+def chat(action: Actions, id: int) -> ChatPacket:
+    return ChatPacket(action, ChatDestTypes.BROADCAST, id, "hi", 0)
+
+def every(admin, packet): ...
+def company(admin, packet): ...
+def client_3(admin, packet): ...
+def company_client_3(admin, packet): ...
+
+def test_only_matching_handlers():
+    index = HandlerIndex(ChatPacket)
+    index.add(every)
+    index.add(company, {"action": Actions.CHAT_COMPANY})
+    index.add(client_3, {"id": 3})
+    index.add(company_client_3, {"action": Actions.CHAT_COMPANY, "id": 3})
+
+    assert index.match(chat(Actions.CHAT, 1)) == [every]
+    assert index.match(chat(Actions.CHAT, 3)) == [every, client_3]
+    assert index.match(chat(Actions.CHAT_COMPANY, 3)) == [every, company, client_3, company_client_3]
+
+    index.remove(company)
+    assert index.match(chat(Actions.CHAT_COMPANY, 1)) == [every]
+    assert len(index) == 3
+
+def test_filters_are_checked_against_packet_attributes():
+    protocol = AdminProtocol()
+    # the name is set after the packet is parsed
+    protocol.add_handler(company, [CmdLoggingPacket], filters = {"name": "CmdGiveMoney"})
+    packet = CmdLoggingPacket(1, 0, 5, b"", 0)
+    assert protocol.handlers_for(packet, 0.0) == []
+    packet.name = "CmdGiveMoney"
+    assert protocol.handlers_for(packet, 0.0) == [company]
+
+    # the data argument of NewGamePacket is not kept
+    with pytest.raises(ValueError):
+        protocol.add_handler(every, [NewGamePacket], filters = {"data": b""})
+    with pytest.raises(ValueError):
+        protocol.add_handler(every, [ChatPacket], filters = {"company_id": 1})
+    assert NewGamePacket not in protocol.handlers
@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from fakeserver import client_info, client_quit, client_update, company_economy, company_info, company_remove, date, new_game
+
+from pyopenttdadmin.history import StateHistory
+from pyopenttdadmin.packet import ClientInfoPacket, ClientUpdatePacket
+from pyopenttdadmin.protocol import AdminProtocol
+
+def tables(state) -> dict:
+    data = state.to_dict()
+    return {name: data[name] for name in ("clients", "companies", "economy")}
+
+def random_event(rng: random.Random) -> bytes:
+    id = rng.randrange(6)
+    return rng.choice([
+        lambda: client_info(id, f"player {rng.randrange(100)}", rng.choice([0, 1, 255])),
+        lambda: client_update(id, f"renamed {rng.randrange(100)}", rng.choice([0, 1, 255])),
+        lambda: client_quit(id),
+        lambda: company_info(id % 3, f"Company {rng.randrange(100)}"),
+        lambda: company_economy(id % 3, rng.randrange(-1000, 100000)),
+        lambda: company_remove(id % 3),
+    ])()
+
+def test_state_at_matches_the_live_state():
+    rng = random.Random(2)
+    admin = AdminProtocol()
+    history = StateHistory(snapshot_interval = 16)
+    admin.add_listener(history.listener(admin.state))
+
+    expected = {}
+    for day in range(300):
+        admin.receive_data(date(day))
+        for _ in range(rng.randrange(4)):
+            admin.receive_data(random_event(rng))
+        if day == 150:
+            admin.receive_data(new_game())
+        expected[day] = tables(admin.state)
+        admin.packets()
+
+    assert len(history._snapshots) > 10
+    for day in range(300):
+        past = history.state_at(day)
+        assert tables(past) == expected[day] and past.date == day
+
+def test_events_are_the_packets_as_received():
+    admin = AdminProtocol()
+    history = StateHistory(snapshot_interval = 2)
+    admin.add_listener(history.listener(admin.state))
+    admin.receive_data(date(10) + client_info(1, "alice", 0) + date(11) + client_update(1, "bob", 1) + date(12) + new_game())
+
+    assert [(day, type(packet)) for day, packet in history.events(11, 11)] == [(11, ClientUpdatePacket)]
+    first = history.events(date_to = 10)[0][1]
+    assert type(first) is ClientInfoPacket and (first.name, first.company_id) == ("alice", 0)
+    assert history.state_at(10).clients[1].name == "alice"
+    assert history.state_at(11).clients[1].company_id == 1
+    assert history.state_at(12).clients[1].company_id == 255
+    # replaying doesn't change the recorded events
+    assert (first.name, first.company_id) == ("alice", 0)
+
+def test_old_events_are_dropped_per_interval():
+    with pytest.raises(ValueError):
+        StateHistory(snapshot_interval = 10, max_events = 5)
+
+    admin = AdminProtocol()
+    history = StateHistory(snapshot_interval = 10, max_events = 30)
+    admin.add_listener(history.listener(admin.state))
+    for day in range(100):
+        admin.receive_data(date(day) + company_economy(0, day))
+
+    assert 30 <= len(history) <= 40
+    oldest = history.events()[0][0]
+    # the first kept snapshot holds the tables at the end of the day before
+    assert history.state_at(oldest - 1).economy[0].money == oldest - 1
+    assert history.state_at(oldest - 2) is None
+    assert history.state_at(99).economy[0].money == 99
+    assert history.state_at(oldest).economy[0].money == oldest
@@ -0,0 +1,139 @@
+import asyncio
+import ipaddress
+import random
+import time
+
+from fakeserver import Server, client_info, protocol, shutdown
+
+import aiopyopenttdadmin
+from pyopenttdadmin import Admin
+from pyopenttdadmin.enums import AdminUpdateFrequency, AdminUpdateType, PacketType
+from pyopenttdadmin.ipacl import AccessAction, IPAccessList
+from pyopenttdadmin.packet import AdminPollPacket, AdminSubscribePacket
+from pyopenttdadmin.polls import POLL_ALL
+from pyopenttdadmin.protocol import AdminProtocol
+
+def brute_force(entries: dict, address: str) -> AccessAction | None:
+    address = ipaddress.ip_address(address)
+    matches = [(network.prefixlen, action) for network, action in entries.items() if network.version == address.version and address in network]
+    return max(matches, key = lambda match: match[0])[1] if matches else None
+
+def test_most_specific_entry_decides():
+    acl = IPAccessList()
+    acl.add("203.0.113.0/24")
+    acl.add("203.0.113.7", AccessAction.ALLOW)
+    acl.add("2001:db8::/32", AccessAction.KICK)
+
+    assert acl.lookup("203.0.113.8") is AccessAction.BAN
+    assert acl.lookup("203.0.113.7") is AccessAction.ALLOW
+    assert acl.lookup("::ffff:203.0.113.8") is AccessAction.BAN
+    assert acl.lookup("2001:db8:1::1") is AccessAction.KICK
+    assert acl.lookup("198.51.100.1") is None
+    assert acl.lookup("not an address") is None
+
+    assert acl.remove("203.0.113.0/24")
+    assert not acl.remove("203.0.113.0/24")
+    assert acl.lookup("203.0.113.8") is None
+    assert len(acl) == 2
+
+def test_paths_are_compressed():
+    acl = IPAccessList()
+    acl.add("2001:db8::1")
+    trie = acl._tries[6]
+    # the root and one node for the /128, not one node per bit
+    assert trie.root.children.count(None) == 1
+    child = next(child for child in trie.root.children if child is not None)
+    assert child.length == 128 and child.children == [None, None]
+
+def test_matches_brute_force():
+    rng = random.Random(7)
+    acl = IPAccessList()
+    entries = {}
+    prefixes = ["10.0.0.0", "10.1.0.0", "192.168.0.0", "0.0.0.0", "2001:db8::", "2001:db8:ff00::"]
+    for _ in range(3000):
+        base = ipaddress.ip_address(rng.choice(prefixes))
+        bits = base.max_prefixlen
+        address = ipaddress.ip_address(int(base) | rng.getrandbits(bits - 8 if bits == 32 else 80))
+        network = ipaddress.ip_network((address, rng.randrange(bits + 1)), strict = False)
+        if network in entries and rng.random() < 0.5:
+            assert acl.remove(network)
+            del entries[network]
+        else:
+            action = rng.choice(list(AccessAction))
+            acl.add(network, action)
+            entries[network] = action
+
+        probe = ipaddress.ip_address(int(base) | rng.getrandbits(bits - 8 if bits == 32 else 80))
+        assert acl.lookup(probe) is brute_force(entries, str(probe))
+
+    assert len(acl) == len(entries)
+    for network in list(entries):
+        assert acl.remove(network)
+    assert len(acl) == 0
+    assert acl._tries[4].root.children == [None, None] and acl._tries[6].root.children == [None, None]
+
+def client_server() -> Server:
+    def script(conn):
+        conn.sendall(protocol())
+        # the clients arrive once the admin polled them
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not any(type == PacketType.ADMIN_POLL.value for type, _ in server.received):
+            time.sleep(0.01)
+        conn.sendall(client_info(3, ip = "198.51.100.1") + client_info(4, ip = "203.0.113.9") + client_info(5, ip = "203.0.113.7") + shutdown())
+        time.sleep(1)
+
+    server = Server(script)
+    return server
+
+def rcons(server: Server, timeout: float = 5) -> list[bytes]:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and not any(type == PacketType.ADMIN_RCON.value for type, _ in server.received):
+        time.sleep(0.01)
+    return [payload for type, payload in server.received if type == PacketType.ADMIN_RCON.value]
+
+def banned_range() -> IPAccessList:
+    acl = IPAccessList(reason = 'no "griefers"')
+    acl.add("203.0.113.0/24")
+    acl.add("203.0.113.7", AccessAction.ALLOW)
+    return acl
+
+def test_admin_bans_listed_clients():
+    server = client_server()
+    actions = []
+    try:
+        with Admin(port = server.port) as admin:
+            admin.set_ip_acl(banned_range(), lambda packet, action: actions.append((packet.id, action)))
+            admin.run()
+        assert rcons(server) == [b'ban 4 "no \'griefers\'"\0']
+    finally:
+        server.close()
+    assert actions == [(4, AccessAction.BAN)]
+    subscribe = AdminProtocol.encode(AdminSubscribePacket(AdminUpdateType.CLIENT_INFO, AdminUpdateFrequency.AUTOMATIC))
+    assert (subscribe[2], subscribe[3:]) in server.received
+
+def test_async_admin_bans_listed_clients():
+    server = client_server()
+
+    async def main():
+        async with aiopyopenttdadmin.Admin(port = server.port) as admin:
+            await admin.set_ip_acl(banned_range())
+            await admin.run()
+
+    try:
+        asyncio.run(main())
+        assert rcons(server) == [b'ban 4 "no \'griefers\'"\0']
+    finally:
+        server.close()
+
+def test_removed_acl_stops_checking():
+    server = client_server()
+    try:
+        with Admin(port = server.port) as admin:
+            admin.set_ip_acl(banned_range())
+            admin.set_ip_acl(None)
+            admin.send_rcon("say polled")
+            admin.protocol.send(AdminPollPacket(AdminUpdateType.CLIENT_INFO, POLL_ALL))
+            admin.run()
+        assert rcons(server, timeout = 0.5) == [b"say polled\0"]
+    finally:
+        server.close()
@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from fakeserver import company_economy, company_remove, new_game
+
+from pyopenttdadmin import leaderboard
+from pyopenttdadmin.leaderboard import Leaderboard, _BisectList
+from pyopenttdadmin.protocol import AdminProtocol
+
+@pytest.fixture(params = ["sortedcontainers", "bisect"])
+def backend(request, monkeypatch):
+    if request.param == "sortedcontainers":
+        pytest.importorskip("sortedcontainers")
+        monkeypatch.setattr(leaderboard, "_SortedList", None)
+    else:
+        monkeypatch.setattr(leaderboard, "_SortedList", _BisectList)
+    return request.param
+
+def test_matches_sorting(backend):
+    rng = random.Random(3)
+    board = Leaderboard()
+    assert isinstance(board._sorted, _BisectList) == (backend == "bisect")
+    values = {}
+    for _ in range(2000):
+        id = rng.randrange(15)
+        if rng.random() < 0.2:
+            board.remove(id)
+            values.pop(id, None)
+        else:
+            values[id] = rng.randrange(-5, 5)
+            board.update(id, values[id])
+
+        expected = sorted(values.items(), key = lambda item: (-item[1], item[0]))
+        assert board.top(5) == expected[:5]
+        assert len(board) == len(values)
+        for rank, (id, value) in enumerate(expected, 1):
+            assert board.rank(id) == rank and board.value(id) == value
+
+    board.clear()
+    assert board.top(3) == [] and board.rank(0) is None and 0 not in board
+
+def test_state_keeps_leaderboards(backend):
+    admin = AdminProtocol()
+    admin.receive_data(company_economy(0, 500) + company_economy(1, 2000) + company_economy(2, 800))
+    money = admin.state.leaderboards["money"]
+    assert money.top(2) == [(1, 2000), (2, 800)]
+
+    admin.receive_data(company_economy(1, 100) + company_remove(2))
+    assert money.top(3) == [(0, 500), (1, 100)]
+    assert money.rank(1) == 2 and 2 not in money
+
+    admin.receive_data(new_game())
+    assert len(money) == 0
@@ -0,0 +1,39 @@
+import time
+
+from fakeserver import Server, chat, date
+
+from pyopenttdadmin import Admin
+from pyopenttdadmin.packet import ChatPacket, DatePacket
+from pyopenttdadmin.packetqueue import PacketQueue
+
+def test_newest_drop_oldest_packet_is_kept():
+    queue = PacketQueue(maxsize = 2)
+    queue.put(DatePacket(1))
+    queue.put(DatePacket(2))
+    for i in range(3):
+        queue.put(ChatPacket(0, 0, 1, str(i), 0))
+
+    packets = queue.clear()
+    assert [packet.date for packet in packets if isinstance(packet, DatePacket)] == [2]
+    assert len([packet for packet in packets if isinstance(packet, ChatPacket)]) == 3
+
+def test_recv_applies_overflow_policies():
+    def script(conn):
+        # one write, so the admin reads everything at once
+        conn.sendall(b"".join(date(d) for d in range(1, 11)) + b"".join(chat(f"message {i}") for i in range(6)))
+        time.sleep(1)
+        conn.close()
+
+    server = Server(script)
+    try:
+        with Admin(port = server.port, max_queue = 4) as admin:
+            packets = []
+            while sum(isinstance(packet, ChatPacket) for packet in packets) < 6:
+                packets += admin.recv()
+
+            dates = [packet.date for packet in packets if isinstance(packet, DatePacket)]
+            assert len(dates) < 10 and dates[-1] == 10
+            assert admin.queue.dropped.get(DatePacket, 0) == 10 - len(dates)
+            assert [packet.message for packet in packets if isinstance(packet, ChatPacket)] == [f"message {i}" for i in range(6)]
+    finally:
+        server.close()
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from fakeserver import Server, protocol, shutdown, welcome
+
+import aiopyopenttdadmin
+from aiopyopenttdadmin import admin as async_admin
+from pyopenttdadmin import Admin
+from pyopenttdadmin.enums import AdminUpdateType, PacketType
+from pyopenttdadmin.polls import PollScheduler
+
+def test_invalid_budget():
+    with pytest.raises(ValueError):
+        PollScheduler(rate = 0)
+    with pytest.raises(ValueError):
+        PollScheduler(burst = 0)
+
+def test_polls_are_spread_within_the_budget():
+    scheduler = PollScheduler(rate = 10, burst = 5)
+    for target in range(100):
+        scheduler.add(target, AdminUpdateType.COMPANY_ECONOMY, 10.0, 0.0)
+
+    per_second = [0] * 30
+    now = 0.0
+    while now < 30:
+        per_second[int(now)] += len(scheduler.due(now))
+        now += 0.01
+    # 100 polls per 10 seconds are wanted, the budget allows 10 per second plus a burst of 5
+    assert max(per_second[1:]) <= 15
+    assert sum(per_second) >= 280
+
+def test_stalest_first_when_over_budget():
+    scheduler = PollScheduler(rate = 1, burst = 1, jitter = 0)
+    old = scheduler.add("old", AdminUpdateType.DATE, 1.0, 0.0)
+    new = scheduler.add("new", AdminUpdateType.DATE, 1.0, 0.0)
+    old.fresh, new.fresh = -100.0, -1.0
+    assert scheduler.due(2.0) == [old]
+
+def test_targets_only_take_their_own_tasks():
+    scheduler = PollScheduler(rate = 100, burst = 10)
+    scheduler.add("a", AdminUpdateType.DATE, 1.0, 0.0)
+    scheduler.add("b", AdminUpdateType.DATE, 1.0, 0.0)
+
+    assert [task.target for task in scheduler.due(1.5, "a")] == ["a"]
+    assert scheduler.next_deadline("b") == float("-inf")
+    assert [task.target for task in scheduler.due(1.5, "b")] == ["b"]
+    assert scheduler.due(1.5, "b") == []
+
+    # a target that does not take its polls keeps at most one waiting
+    for now in (3.0, 5.0, 7.0):
+        scheduler.due(now, "a")
+    assert len(scheduler.due(8.0, "b")) == 1
+
+def serve(seconds: float):
+    def script(conn):
+        conn.sendall(protocol() + welcome())
+        time.sleep(seconds)
+        conn.sendall(shutdown())
+    return Server(script)
+
+def date_polls(server: Server) -> int:
+    return sum(1 for type, payload in server.received if type == PacketType.ADMIN_POLL.value and payload[0] == AdminUpdateType.DATE.value)
+
+def test_sync_admins_in_threads_share_a_scheduler():
+    scheduler = PollScheduler(rate = 50)
+    servers = [serve(1.0) for _ in range(4)]
+
+    def run(server: Server):
+        with Admin(port = server.port, polls = scheduler) as admin:
+            admin.login("test", "password")
+            admin.add_poll(AdminUpdateType.DATE, 0.1)
+            admin.run()
+
+    threads = [threading.Thread(target = run, args = (server,)) for server in servers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    for server in servers:
+        server.close()
+        assert date_polls(server) >= 5
+
+def test_async_admins_share_one_driver():
+    scheduler = PollScheduler(rate = 50)
+    servers = [serve(1.0) for _ in range(3)]
+
+    async def main():
+        admins = []
+        for server in servers:
+            admin = aiopyopenttdadmin.Admin(port = server.port, polls = scheduler)
+            await admin.login("test", "password")
+            admin.add_poll(AdminUpdateType.DATE, 0.1)
+            admins.append(admin)
+        runs = [asyncio.create_task(admin.run()) for admin in admins]
+        await asyncio.sleep(0.5)
+        driver = async_admin._poll_drivers[scheduler]
+        assert driver.admins == set(admins)
+        await asyncio.wait_for(asyncio.gather(*runs), 5)
+        assert driver._task is None
+
+    asyncio.run(main())
+    for server in servers:
+        server.close()
+        assert date_polls(server) >= 5
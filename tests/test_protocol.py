@@ -0,0 +1,43 @@
+from fakeserver import chat, date, protocol as server_protocol, welcome
+
+from pyopenttdadmin.enums import Actions, ChatDestTypes, PacketType
+from pyopenttdadmin.packet import AdminChatPacket, AdminRconPacket, ChatPacket, DatePacket, ProtocolPacket, WelcomePacket
+from pyopenttdadmin.protocol import AdminProtocol
+
+def test_frames_split_across_reads():
+    protocol = AdminProtocol()
+    data = server_protocol() + welcome() + chat("hello") + date(1)
+    for i in range(len(data)):
+        protocol.receive_data(data[i:i + 1])
+
+    packets = protocol.packets()
+    assert [type(packet) for packet in packets] == [ProtocolPacket, WelcomePacket, ChatPacket, DatePacket]
+    assert packets[2].message == "hello" and packets[3].date == 1
+    assert protocol.frames_received == 4
+    assert protocol.packets() == []
+
+def test_listeners_see_packets_before_they_are_queued():
+    protocol = AdminProtocol()
+    seen = []
+    def listener(packet):
+        seen.append((type(packet), len(protocol.queue)))
+    protocol.add_listener(listener)
+    protocol.receive_data(date(1) + date(2))
+    assert seen == [(DatePacket, 0), (DatePacket, 1)]
+
+    protocol.remove_listener(listener)
+    protocol.receive_data(date(3))
+    assert len(seen) == 2
+
+def test_outgoing_bytes():
+    protocol = AdminProtocol()
+    assert protocol.data_to_send() == b""
+
+    protocol.rcon("pause")
+    protocol.chat("hi", Actions.CHAT_CLIENT, ChatDestTypes.CLIENT, 4)
+    expected = AdminProtocol.encode(AdminRconPacket("pause")) + AdminProtocol.encode(AdminChatPacket("hi", Actions.CHAT_CLIENT, ChatDestTypes.CLIENT, 4))
+    assert protocol.data_to_send() == expected
+    assert protocol.data_to_send() == b""
+
+    frame = AdminProtocol.encode(AdminRconPacket("pause"))
+    assert int.from_bytes(frame[:2], "little") == len(frame) and frame[2] == PacketType.ADMIN_RCON.value
@@ -0,0 +1,75 @@
+import pytest
+
+from fakeserver import cmd_logging, cmd_names
+
+from pyopenttdadmin.packet import CmdLoggingPacket
+from pyopenttdadmin.protocol import AdminProtocol
+from pyopenttdadmin.ratetracker import CommandRateTracker, RateCounter, RateScope
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def command(client_id: int, company_id: int = 0, cmd: int = 1) -> CmdLoggingPacket:
+    return CmdLoggingPacket(client_id, company_id, cmd, b"", 0)
+
+def test_counter_slides_per_bucket():
+    counter = RateCounter(10, buckets = 10)
+    assert counter.add(0.5) == 1
+    assert counter.add(5.5, 2) == 3
+    assert counter.count(9.9) == 3
+    # the bucket of the first event expired
+    assert counter.count(10.0) == 2
+    assert counter.count(15.9) == 0
+    counter.add(16.0)
+    assert counter.count(100.0) == 0
+
+def test_counts_per_scope_and_window():
+    clock = Clock()
+    tracker = CommandRateTracker(windows = (60, 10), clock = clock)
+    assert tracker.windows == (10, 60)
+    for cmd in (1, 1, 2):
+        tracker.listener(command(5, 3, cmd))
+    clock.now = 30.0
+    tracker.listener(command(6, 3))
+
+    assert tracker.count(RateScope.CLIENT, 5, 60) == 3
+    assert tracker.count(RateScope.CLIENT, 5, 10) == 0
+    assert tracker.count(RateScope.COMPANY, 3, 60) == 4
+    assert tracker.count(RateScope.CLIENT_COMMAND, (5, 1), 60) == 2
+    assert tracker.count(RateScope.CLIENT, 7, 60) == 0
+    assert tracker.rate(RateScope.COMPANY, 3, 60) == pytest.approx(4 / 60)
+    with pytest.raises(ValueError):
+        tracker.add_threshold(RateScope.CLIENT, 30, 1, print)
+
+def test_thresholds_fire_once_per_crossing():
+    clock = Clock()
+    tracker = CommandRateTracker(windows = (10,), clock = clock)
+    crossed = []
+    tracker.add_threshold(RateScope.CLIENT, 10, 2, lambda key, count, packet: crossed.append((key, count)))
+    for _ in range(5):
+        tracker.listener(command(5))
+    assert crossed == [(5, 3)]
+
+    # a command that leaves the count at the limit arms the threshold again
+    clock.now = 20.0
+    tracker.listener(command(5))
+    for _ in range(2):
+        tracker.listener(command(5))
+    assert crossed == [(5, 3), (5, 3)]
+
+def test_threshold_on_a_command_by_name():
+    protocol = AdminProtocol()
+    tracker = CommandRateTracker(windows = (10,))
+    protocol.add_listener(tracker.listener)
+    crossed = []
+    tracker.add_threshold(RateScope.COMPANY, 10, 1, lambda key, count, packet: crossed.append((key, packet.name)), cmd = "CmdGiveMoney")
+
+    protocol.receive_data(cmd_names({0: "CmdBuildRailroadTrack", 1: "CmdGiveMoney"}))
+    protocol.receive_data(b"".join(cmd_logging(5, 2, 0, b"") for _ in range(3)))
+    assert crossed == []
+    protocol.receive_data(cmd_logging(5, 2, 1, b"") + cmd_logging(6, 2, 1, b""))
+    assert crossed == [(2, "CmdGiveMoney")]
@@ -0,0 +1,96 @@
+import multiprocessing
+import threading
+import time
+
+from fakeserver import client_info, client_update, company_economy, company_info
+
+from pyopenttdadmin.protocol import AdminProtocol
+from pyopenttdadmin.sharedstate import SharedStateReader, SharedStateWriter, _CLIENT, _HEADER, _SEQ
+
+def published():
+    protocol = AdminProtocol()
+    writer = SharedStateWriter(max_clients = 4, max_companies = 4)
+    writer.publish(protocol.state)
+    protocol.add_listener(writer.listener(protocol.state))
+    return protocol, writer
+
+def test_round_trip():
+    protocol, writer = published()
+    with writer, SharedStateReader(writer.name) as reader:
+        protocol.receive_data(client_info(3, "alice", company_id = 1) + client_info(9, "bob") + company_info(1, "Alice & Co") + company_economy(1, 5000))
+        assert {client.id: client.name for client in reader.clients()} == {3: "alice", 9: "bob"}
+        company = reader.company(1)
+        assert (company.name, company.money) == ("Alice & Co", 5000)
+        assert reader.company(2) is None
+
+        # only the changed record is written
+        changes = reader.changes
+        protocol.receive_data(client_update(9, "bobby", company_id = 1))
+        assert reader.changes == changes + 1
+        assert (reader.client(9).name, reader.client(9).company_id) == ("bobby", 1)
+
+        protocol.state.clients.pop(3)
+        writer.write_client(protocol.state, 3)
+        assert reader.client(3) is None
+        # the freed slot is reused, and the reader finds the client in it
+        protocol.receive_data(client_info(12, "carol"))
+        assert reader.client(12).name == "carol"
+        assert [client.id for client in reader.clients()] == [12, 9]
+
+def test_reader_retries_a_record_being_written():
+    protocol, writer = published()
+    with writer, SharedStateReader(writer.name) as reader:
+        protocol.receive_data(client_info(3, "alice"))
+        buf = writer.memory.buf
+        offset = _HEADER.size
+        seq = _SEQ.unpack_from(buf, offset)[0]
+
+        # the writer stops halfway through a write
+        _SEQ.pack_into(buf, offset, seq + 1)
+        _CLIENT.pack_into(buf, offset, seq + 1, True, 3, 0, 255, 0, b"ali")
+        found = []
+        thread = threading.Thread(target = lambda: found.append(reader.client(3)))
+        thread.start()
+        time.sleep(0.1)
+        assert found == []
+
+        _CLIENT.pack_into(buf, offset, seq + 1, True, 3, 0, 255, 0, b"alicia")
+        _SEQ.pack_into(buf, offset, seq + 2)
+        thread.join(5)
+        assert found[0].name == "alicia"
+
+def test_concurrent_writes_are_never_torn():
+    protocol, writer = published()
+    with writer, SharedStateReader(writer.name) as reader:
+        protocol.receive_data(client_info(3, "name 0", company_id = 0))
+        done = threading.Event()
+
+        def write():
+            for i in range(1, 3000):
+                protocol.receive_data(client_update(3, f"name {i % 200}", company_id = i % 200))
+            done.set()
+
+        thread = threading.Thread(target = write)
+        thread.start()
+        while not done.is_set():
+            client = reader.client(3)
+            assert client.name == f"name {client.company_id}"
+        thread.join()
+
+def read_names(name: str, names):
+    with SharedStateReader(name) as reader:
+        names.put([client.name for client in reader.clients()])
+
+def test_reader_in_another_process():
+    protocol, writer = published()
+    with writer:
+        protocol.receive_data(client_info(3, "alice"))
+        context = multiprocessing.get_context("spawn")
+        names = context.Queue()
+        for _ in range(2):
+            # the segment outlives the reader processes
+            process = context.Process(target = read_names, args = (writer.name, names))
+            process.start()
+            assert names.get(timeout = 30) == ["alice"]
+            process.join(30)
+            assert process.exitcode == 0
@@ -0,0 +1,64 @@
+from fakeserver import client_info, client_update, company_economy, company_info, company_update, new_game, pong, welcome
+
+from pyopenttdadmin.enums import PacketType
+from pyopenttdadmin.packet import ClientInfoPacket, ClientJoinPacket, ClientQuitPacket, CompanyInfoPacket, NewGamePacket
+from pyopenttdadmin.protocol import AdminProtocol
+from pyopenttdadmin.state import GameState, SPECTATOR
+
+def started() -> AdminProtocol:
+    protocol = AdminProtocol()
+    protocol.receive_data(welcome() + pong(protocol._ping_token + 1))
+    protocol.receive_data(company_info(0) + company_economy(0, 1000) + client_info(1) + client_info(5, company_id = 0))
+    protocol.packets()
+    protocol.data_to_send()
+    return protocol
+
+def test_new_game_clears_companies_and_moves_clients_to_spectators():
+    state = started().state
+    state.apply(NewGamePacket(b""))
+
+    assert state.companies == {} and state.economy == {}
+    assert state.leaderboards["money"].top(1) == []
+    assert state.date is None
+    assert {id: client.company_id for id, client in state.clients.items()} == {1: SPECTATOR, 5: SPECTATOR}
+
+def test_new_game_is_resynced_when_welcomed():
+    protocol = started()
+    protocol.receive_data(new_game())
+    assert protocol.data_to_send() == b""
+
+    protocol.receive_data(welcome())
+    sent = protocol.data_to_send()
+    assert sent.count(bytes([PacketType.ADMIN_POLL.value])) >= 2
+    resync_token = protocol._ping_token
+
+    # client 5 did not rejoin the new game, client 7 is new
+    protocol.receive_data(client_info(1) + client_info(7, company_id = 0) + company_info(0, "New Co") + pong(resync_token))
+    packets = protocol.packets()
+    synthetic = [packet for packet in packets if getattr(packet, "synthetic", False)]
+    assert {(type(packet), packet.id) for packet in synthetic} >= {(ClientQuitPacket, 5), (ClientJoinPacket, 7)}
+    assert set(protocol.state.clients) == {1, 7}
+    assert protocol.state.companies[0].name == "New Co"
+
+def test_delivered_packets_do_not_change():
+    protocol = AdminProtocol()
+    protocol.receive_data(client_info(3, "old", company_id = 1) + company_info(1, "Old Co"))
+    client, company = protocol.packets()
+    assert type(client) is ClientInfoPacket and type(company) is CompanyInfoPacket
+
+    protocol.receive_data(client_update(3, "new", company_id = 2) + company_update(1, "New Co"))
+    assert (client.name, client.company_id, company.name) == ("old", 1, "Old Co")
+    assert (protocol.state.clients[3].name, protocol.state.clients[3].company_id) == ("new", 2)
+    assert protocol.state.companies[1].name == "New Co"
+
+    updated = protocol.state.clients[3]
+    protocol.receive_data(new_game())
+    assert client.company_id == 1 and updated.company_id == 2
+    assert protocol.state.clients[3].company_id == SPECTATOR
+
+def test_snapshot_round_trip():
+    state = started().state
+    restored = GameState()
+    restored.from_dict(state.to_dict())
+    assert set(restored.clients) == {1, 5}
+    assert restored.leaderboards["money"].top(1) == [(0, 1000)]
@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+from fakeserver import Server, chat, date, protocol, shutdown
+
+import aiopyopenttdadmin
+from pyopenttdadmin import Admin
+from pyopenttdadmin.packet import ChatPacket, DatePacket
+from pyopenttdadmin.protocol import AdminProtocol
+
+def chatter(conn):
+    conn.sendall(protocol() + chat("one") + date(1) + chat("two"))
+    time.sleep(0.1)
+    conn.sendall(chat("three") + shutdown())
+    time.sleep(1)
+
+def test_sync_stream_filters_types():
+    server = Server(chatter)
+    try:
+        with Admin(port = server.port) as admin:
+            assert [packet.message for packet in admin.stream([ChatPacket])] == ["one", "two", "three"]
+    finally:
+        server.close()
+
+def test_async_stream_filters_types():
+    server = Server(chatter)
+
+    async def main():
+        async with aiopyopenttdadmin.Admin(port = server.port) as admin:
+            return [packet.message async for packet in admin.stream([ChatPacket])]
+
+    try:
+        assert asyncio.run(main()) == ["one", "two", "three"]
+    finally:
+        server.close()
+
+def test_full_queue_pauses_reading():
+    admin = AdminProtocol(max_queue = 2, overflow_policies = {})
+    admin.receive_data(b"".join(chat(str(i)) for i in range(5)))
+    # the packets that do not fit stay in the buffer, undecoded
+    assert len(admin.queue) == 2 and not admin.wants_data
+
+    messages = []
+    while (packet := admin.next_packet()) is not None:
+        messages.append(packet.message)
+        assert len(admin.queue) <= 2
+    assert messages == ["0", "1", "2", "3", "4"]
+    assert admin.wants_data
+
+def test_dropped_packets_do_not_block():
+    admin = AdminProtocol(max_queue = 2)
+    admin.receive_data(b"".join(date(d) for d in range(10)))
+    assert admin.wants_data
+    assert [packet.date for packet in admin.packets() if isinstance(packet, DatePacket)][-1] == 9
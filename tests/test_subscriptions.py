@@ -0,0 +1,58 @@
+import pytest
+
+from pyopenttdadmin.enums import AdminUpdateFrequency, AdminUpdateType, PacketType
+from pyopenttdadmin.packet import ChatPacket, CompanyEconomyPacket, DatePacket, ShutdownPacket
+from pyopenttdadmin.protocol import AdminProtocol
+from pyopenttdadmin.subscriptions import plan_subscriptions
+
+def subscriptions_sent(protocol: AdminProtocol) -> list[tuple[AdminUpdateType, AdminUpdateFrequency]]:
+    data = protocol.data_to_send()
+    sent = []
+    while data:
+        size = int.from_bytes(data[:2], "little")
+        if data[2] == PacketType.FREQUENCY.value:
+            sent.append((AdminUpdateType(int.from_bytes(data[3:5], "little")), AdminUpdateFrequency(int.from_bytes(data[5:7], "little"))))
+        data = data[size:]
+    return sent
+
+def handler(admin, packet): ...
+def other(admin, packet): ...
+
+def test_plan():
+    plan = plan_subscriptions([
+        (DatePacket, AdminUpdateFrequency.MONTHLY),
+        (DatePacket, AdminUpdateFrequency.WEEKLY),
+        (CompanyEconomyPacket, AdminUpdateFrequency.POLL),
+        (ChatPacket, None),
+        (ShutdownPacket, None),
+    ])
+    assert plan == {AdminUpdateType.DATE: AdminUpdateFrequency.WEEKLY, AdminUpdateType.CHAT: AdminUpdateFrequency.AUTOMATIC}
+
+    with pytest.raises(ValueError):
+        plan_subscriptions([(ChatPacket, AdminUpdateFrequency.DAILY)])
+
+def test_subscriptions_follow_handlers():
+    protocol = AdminProtocol(auto_subscribe = True)
+    protocol.add_handler(handler, [DatePacket])
+    protocol.login("admin", "password")
+    assert subscriptions_sent(protocol) == [(AdminUpdateType.DATE, AdminUpdateFrequency.DAILY)]
+
+    protocol.add_handler(other, [DatePacket], frequency = AdminUpdateFrequency.WEEKLY)
+    assert subscriptions_sent(protocol) == []
+    protocol.remove_handler(handler)
+    assert subscriptions_sent(protocol) == [(AdminUpdateType.DATE, AdminUpdateFrequency.WEEKLY)]
+    protocol.remove_handler(other)
+    assert subscriptions_sent(protocol) == [(AdminUpdateType.DATE, AdminUpdateFrequency.POLL)]
+
+def test_dropped_subscription_is_not_replayed():
+    protocol = AdminProtocol(auto_subscribe = True)
+    protocol.add_handler(handler, [ChatPacket])
+    protocol.subscribe(AdminUpdateType.CONSOLE)
+    protocol.login("admin", "password")
+    protocol.remove_handler(handler)
+    # chat can't be polled, so nothing is sent, but the subscription is forgotten
+    assert AdminUpdateType.CHAT not in protocol.subscriptions
+    protocol.data_to_send()
+
+    protocol.reconnected()
+    assert subscriptions_sent(protocol) == [(AdminUpdateType.CONSOLE, AdminUpdateFrequency.AUTOMATIC)]